@@ -1 +1 @@
-python3 src/main.py "/static-site-generator/"
+python3 src/main.py "/static-site-generator/" --site-url https://fongfox.github.io
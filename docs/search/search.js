@@ -0,0 +1,86 @@
+// Client-side search over the index written by search_index.py.
+// Usage: <script src="/search/search.js"></script>
+//        ssgSearch("balrog wizard").then(results => ...)  // [{url, title}]
+(function () {
+  var base = new URL(".", document.currentScript.src);
+  var index = null;
+  var shards = {};
+
+  function fetchIndex() {
+    if (!index) {
+      index = fetch(new URL("index.json", base)).then(function (r) {
+        return r.json();
+      });
+    }
+    return index;
+  }
+
+  function shardName(term, prefixLength) {
+    var prefix = Array.from(term).slice(0, prefixLength).join("");
+    return Array.from(new TextEncoder().encode(prefix), function (b) {
+      return b.toString(16).padStart(2, "0");
+    }).join("");
+  }
+
+  function readVarint(bytes, state) {
+    var value = 0, shift = 0, b;
+    do {
+      b = bytes[state.pos++];
+      value += (b & 0x7f) * Math.pow(2, shift);
+      shift += 7;
+    } while (b & 0x80);
+    return value;
+  }
+
+  function decodeShard(buffer) {
+    var bytes = new Uint8Array(buffer), state = {pos: 0};
+    var decoder = new TextDecoder(), terms = {};
+    while (state.pos < bytes.length) {
+      var length = readVarint(bytes, state);
+      var term = decoder.decode(bytes.subarray(state.pos, state.pos + length));
+      state.pos += length;
+      var count = readVarint(bytes, state), doc = 0, postings = new Map();
+      for (var i = 0; i < count; i++) {
+        doc += readVarint(bytes, state);
+        postings.set(doc, readVarint(bytes, state));
+      }
+      terms[term] = postings;
+    }
+    return terms;
+  }
+
+  function loadShard(name) {
+    if (!shards[name]) {
+      shards[name] = fetch(new URL(name + ".bin", base))
+        .then(function (r) { return r.ok ? r.arrayBuffer() : new ArrayBuffer(0); })
+        .then(decodeShard);
+    }
+    return shards[name];
+  }
+
+  window.ssgSearch = function (query) {
+    var terms = (query.toLowerCase().match(/[\p{L}\p{N}_]+/gu) || []);
+    return fetchIndex().then(function (idx) {
+      if (!terms.length) return [];
+      return Promise.all(terms.map(function (term) {
+        var name = shardName(term, idx.prefix);
+        if (idx.shards.indexOf(name) < 0) return new Map();
+        return loadShard(name).then(function (t) { return t[term] || new Map(); });
+      })).then(function (lists) {
+        var scores = new Map(lists[0]);
+        lists.slice(1).forEach(function (postings) {
+          scores.forEach(function (score, doc) {
+            if (postings.has(doc)) scores.set(doc, score + postings.get(doc));
+            else scores.delete(doc);
+          });
+        });
+        return Array.from(scores)
+          .sort(function (a, b) { return b[1] - a[1] || a[0] - b[0]; })
+          .map(function (entry) {
+            var doc = idx.docs[entry[0]];
+            return {url: doc[0], title: doc[1]};
+          });
+      });
+    });
+  };
+})();
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+
+from manifest import hash_file
+
+ASSET_MANIFEST_NAME = "asset-manifest.json"
+FINGERPRINT_LENGTH = 8
+
+# Files that are only ever loaded through a URL in a page or template. Other
+# static files (robots.txt, CNAME, favicon.ico, ...) are fetched by well
+# known names and keep them.
+FINGERPRINT_EXTENSIONS = {
+    ".css",
+    ".js",
+    ".mjs",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".svg",
+    ".webp",
+    ".avif",
+    ".woff",
+    ".woff2",
+    ".ttf",
+    ".otf",
+}
+
+
+class AssetTable(dict):
+    """
+    Asset table of a build: root-relative URL -> asset entry.
+
+    A dict that remembers a digest of its contents (see digest()) until it
+    is modified. Every page's urls.UrlRewriter carries the table and the
+    render cache and block memo key on that digest, so hashing the table
+    once per build instead of once per page keeps large asset tables cheap.
+    Entries must be replaced, not modified in place, for the digest to
+    follow them (watch mode does so when a static file changes).
+    """
+
+    _digest = None
+
+    def digest(self):
+        """Returns a short hash of the table ("" if it is empty)."""
+        if self._digest is None:
+            if not self:
+                self._digest = ""
+            else:
+                table = json.dumps(self, sort_keys=True).encode()
+                self._digest = hashlib.sha256(table).hexdigest()[:16]
+        return self._digest
+
+    def __setitem__(self, key, value):
+        self._digest = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._digest = None
+        super().__delitem__(key)
+
+    def pop(self, *args):
+        self._digest = None
+        return super().pop(*args)
+
+    def popitem(self):
+        self._digest = None
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self._digest = None
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self._digest = None
+        super().update(*args, **kwargs)
+
+    def clear(self):
+        self._digest = None
+        super().clear()
+
+    def __ior__(self, other):
+        self._digest = None
+        return super().__ior__(other)
+
+
+def should_fingerprint(path):
+    return os.path.splitext(path)[1].lower() in FINGERPRINT_EXTENSIONS
+
+
+def fingerprinted_path(path, digest):
+    """
+    Inserts the first FINGERPRINT_LENGTH characters of a content hash into
+    a file name.
+
+    Example:
+        >>> fingerprinted_path("images/tom.png", "3f2a9c1b7d...")
+        'images/tom.3f2a9c1b.png'
+    """
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def static_asset(src_path, rel_path, fingerprint=False):
+    """
+    Returns where a static file that is not an image goes.
+
+    Returns:
+        tuple[str, dict | None, str]: (root-relative URL, asset entry or
+        None if the file keeps its name, relative output path)
+    """
+    rel_path = rel_path.replace(os.sep, "/")
+    url = "/" + rel_path
+    if not (fingerprint and should_fingerprint(rel_path)):
+        return url, None, rel_path
+    output = fingerprinted_path(rel_path, hash_file(src_path))
+    return url, {"source": src_path, "url": "/" + output}, output
+
+
+def describe_static(source_dir, images=None, fingerprint=False):
+    """
+    Returns the asset table of a static directory without writing anything.
+
+    Gives the same table as sync_directory_contents(...)["assets"]; used
+    where pages are rendered without syncing static/ (sharded builds,
+    watch mode).
+
+    Args:
+        source_dir (str): Static directory
+        images (images.ImagePipeline, optional): Describes the images
+        fingerprint (bool): Give fingerprinted files their hashed URL
+
+    Returns:
+        AssetTable: The asset table
+    """
+    assets = AssetTable()
+    for dir_path, _, names in os.walk(source_dir):
+        for name in names:
+            src_path = os.path.join(dir_path, name)
+            rel_path = os.path.relpath(src_path, source_dir)
+            if images is not None and images.handles(rel_path):
+                url, entry, _ = images.describe(src_path, rel_path, fingerprint)
+            else:
+                url, entry, _ = static_asset(src_path, rel_path, fingerprint)
+            if entry is not None:
+                assets[url] = entry
+    return assets
+
+
+def write_asset_manifest(assets, dest_dir):
+    """
+    Writes ASSET_MANIFEST_NAME: original URL -> fingerprinted URL.
+
+    Image variants are listed under their unfingerprinted names. Other
+    tools (a CDN upload script, a service worker) can use the file to find
+    the current name of an asset.
+
+    Returns:
+        str: Path of the manifest
+    """
+    urls = {}
+    for url, entry in assets.items():
+        if "url" not in entry:
+            continue
+        urls[url] = entry["url"]
+        for variant, width in entry.get("srcset", [])[:-1]:
+            stem, ext = os.path.splitext(url)
+            urls[f"{stem}-{width}w{ext}"] = variant
+    path = os.path.join(dest_dir, ASSET_MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(urls, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,340 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from inline_markdown import text_to_textnodes
+from markdown_blocks import (
+    block_to_block_type,
+    markdown_to_blocks,
+    markdown_to_html_node,
+)
+
+WORDS = (
+    "the ring of power was forged in the fires of mount doom by sauron "
+    "who sought dominion over all free peoples of middle earth while elves "
+    "dwarves and men each received rings of their own"
+).split()
+
+DEFAULT_CORPUS = {
+    "pages": 50,
+    "blocks": 40,
+    "link_density": 0.05,
+    "image_density": 0.01,
+    "list_length": 5,
+    "code_share": 0.1,
+    "seed": 1,
+}
+
+
+def _sentence(rng, words, link_density, image_density, markup=True):
+    parts = []
+    for _ in range(words):
+        roll = rng.random()
+        word = rng.choice(WORDS)
+        if not markup:
+            parts.append(word)
+        elif roll < image_density:
+            parts.append(f"![{word}](/images/{word}.png)")
+        elif roll < image_density + link_density:
+            parts.append(f"[{word}](/blog/{word})")
+        elif roll < image_density + link_density + 0.03:
+            parts.append(f"**{word}**")
+        elif roll < image_density + link_density + 0.05:
+            parts.append(f"_{word}_")
+        elif roll < image_density + link_density + 0.06:
+            parts.append(f"`{word}`")
+        else:
+            parts.append(word)
+    return " ".join(parts)
+
+
+def generate_page_markdown(
+    rng, blocks, link_density, image_density, list_length, code_share
+):
+    """
+    Generates one synthetic markdown page.
+
+    Args:
+        rng (random.Random): Source of randomness
+        blocks (int): Number of blocks after the H1 title (page size)
+        link_density (float): Share of words that become [links](...)
+        image_density (float): Share of words that become ![images](...)
+        list_length (int): Items per list block
+        code_share (float): Share of blocks that are fenced code
+
+    Returns:
+        str: Markdown document
+    """
+    out = [f"# {_sentence(rng, 4, 0, 0)}"]
+    for _ in range(blocks):
+        roll = rng.random()
+        if roll < code_share:
+            code = "\n".join(_sentence(rng, 6, 0, 0) for _ in range(4))
+            out.append(f"```\n{code}\n```")
+        elif roll < code_share + 0.1:
+            level = rng.randint(2, 4)
+            out.append("#" * level + " " + _sentence(rng, 5, 0, 0))
+        elif roll < code_share + 0.15:
+            out.append("> " + _sentence(rng, 20, link_density, 0))
+        elif roll < code_share + 0.25:
+            items = (
+                _sentence(rng, 8, link_density, image_density)
+                for _ in range(list_length)
+            )
+            out.append("\n".join(f"- {item}" for item in items))
+        elif roll < code_share + 0.3:
+            items = (
+                _sentence(rng, 8, link_density, image_density)
+                for _ in range(list_length)
+            )
+            out.append(
+                "\n".join(f"{i}. {item}" for i, item in enumerate(items, start=1))
+            )
+        else:
+            lines = (_sentence(rng, 15, link_density, image_density) for _ in range(3))
+            out.append("\n".join(lines))
+    return "\n\n".join(out) + "\n"
+
+
+def generate_corpus(
+    pages=50,
+    blocks=40,
+    link_density=0.05,
+    image_density=0.01,
+    list_length=5,
+    code_share=0.1,
+    seed=1,
+):
+    """
+    Generates a deterministic synthetic markdown corpus.
+
+    The same arguments always produce the same documents, so timings from
+    different commits are comparable.
+
+    Returns:
+        list[str]: One markdown document per page
+    """
+    rng = random.Random(seed)
+    return [
+        generate_page_markdown(
+            rng, blocks, link_density, image_density, list_length, code_share
+        )
+        for _ in range(pages)
+    ]
+
+
+def generate_prose_corpus(pages=50, blocks=40, list_share=0.2, seed=1):
+    """
+    Generates plain-prose pages: paragraphs and lists without inline markup.
+
+    Most real pages are like this, so this corpus measures the cost of the
+    inline parser on text that contains nothing for it to find.
+
+    Returns:
+        list[str]: One markdown document per page
+    """
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(pages):
+        out = [f"# {_sentence(rng, 4, 0, 0, markup=False)}"]
+        for index in range(blocks):
+            if rng.random() < list_share:
+                items = (_sentence(rng, 8, 0, 0, markup=False) for _ in range(5))
+                if index % 2:
+                    out.append("\n".join(f"- {item}" for item in items))
+                else:
+                    out.append(
+                        "\n".join(
+                            f"{i}. {item}" for i, item in enumerate(items, start=1)
+                        )
+                    )
+            else:
+                lines = (_sentence(rng, 15, 0, 0, markup=False) for _ in range(3))
+                out.append("\n".join(lines))
+        documents.append("\n\n".join(out) + "\n")
+    return documents
+
+
+def write_site(root, documents):
+    """
+    Lays out a buildable site (content/, static/, template.html) under root.
+
+    Pages are spread over nested directories like a real content tree.
+    """
+    for index, markdown in enumerate(documents):
+        page_dir = os.path.join(root, "content", f"section{index % 10}", f"page{index}")
+        os.makedirs(page_dir, exist_ok=True)
+        with open(os.path.join(page_dir, "index.md"), "w") as f:
+            f.write(markdown)
+
+    os.makedirs(os.path.join(root, "static"), exist_ok=True)
+    with open(os.path.join(root, "static", "index.css"), "w") as f:
+        f.write("body { margin: 0 }\n")
+    with open(os.path.join(root, "template.html"), "w") as f:
+        f.write(
+            "<html><head><title>{{ Title }}</title>"
+            '<link href="/index.css" rel="stylesheet" /></head>'
+            "<body><article>{{ Content }}</article></body></html>\n"
+        )
+
+
+def _best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_benchmarks(corpus_options=None, repeat=3):
+    """
+    Times each stage of the markdown pipeline on a synthetic corpus.
+
+    Stages:
+        markdown_to_blocks: splitting every page into blocks
+        block_to_block_type: classifying every block
+        text_to_textnodes: inline parsing of every paragraph block
+        to_html: markdown_to_html_node(...).to_html() for every page
+        prose_text_to_textnodes: inline parsing of plain-prose paragraphs
+        prose_to_html: to_html for plain-prose pages (generate_prose_corpus)
+        build: a full main.main() build in a temporary directory
+
+    Args:
+        corpus_options (dict, optional): Overrides for DEFAULT_CORPUS
+        repeat (int): Runs per stage; the fastest is reported
+
+    Returns:
+        dict: {"corpus": options used, "results": stage -> seconds}
+    """
+    options = dict(DEFAULT_CORPUS)
+    options.update(corpus_options or {})
+    documents = generate_corpus(**options)
+
+    all_blocks = [block for doc in documents for block in markdown_to_blocks(doc)]
+    paragraphs = [
+        block.replace("\n", " ")
+        for block in all_blocks
+        if block_to_block_type(block).value == "paragraph"
+    ]
+
+    results = {}
+    results["markdown_to_blocks"] = _best_of(
+        repeat, lambda: [markdown_to_blocks(doc) for doc in documents]
+    )
+    results["block_to_block_type"] = _best_of(
+        repeat, lambda: [block_to_block_type(block) for block in all_blocks]
+    )
+    results["text_to_textnodes"] = _best_of(
+        repeat, lambda: [text_to_textnodes(text) for text in paragraphs]
+    )
+    results["to_html"] = _best_of(
+        repeat, lambda: [markdown_to_html_node(doc).to_html() for doc in documents]
+    )
+
+    prose = generate_prose_corpus(
+        options["pages"], options["blocks"], seed=options["seed"]
+    )
+    prose_paragraphs = [
+        block.replace("\n", " ")
+        for doc in prose
+        for block in markdown_to_blocks(doc)
+        if block_to_block_type(block).value == "paragraph"
+    ]
+    results["prose_text_to_textnodes"] = _best_of(
+        repeat, lambda: [text_to_textnodes(text) for text in prose_paragraphs]
+    )
+    results["prose_to_html"] = _best_of(
+        repeat, lambda: [markdown_to_html_node(doc).to_html() for doc in prose]
+    )
+    results["build"] = _time_build(documents, repeat)
+
+    return {"corpus": options, "results": results}
+
+
+def _time_build(documents, repeat):
+    import main
+
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix="ssg-bench-")
+    try:
+        write_site(root, documents)
+        os.chdir(root)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return _best_of(repeat, lambda: main.main("/"))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root)
+
+
+def compare_to_baseline(results, baseline, threshold=0.1):
+    """
+    Finds stages that got slower than a saved baseline.
+
+    Args:
+        results (dict): Output of run_benchmarks()
+        baseline (dict): A previously saved output of run_benchmarks()
+        threshold (float): Allowed slowdown ratio (0.1 = 10%)
+
+    Returns:
+        list[tuple[str, float, float]]: (stage, baseline seconds, current
+        seconds) for every regressed stage
+    """
+    regressions = []
+    for stage, seconds in results["results"].items():
+        previous = baseline["results"].get(stage)
+        if previous is not None and seconds > previous * (1 + threshold):
+            regressions.append((stage, previous, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the markdown pipeline")
+    for name, default in DEFAULT_CORPUS.items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=type(default), default=default
+        )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", metavar="PATH", help="write results as JSON")
+    parser.add_argument(
+        "--compare", metavar="PATH", help="fail if slower than this baseline"
+    )
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    options = {name: getattr(args, name) for name in DEFAULT_CORPUS}
+    report = run_benchmarks(options, args.repeat)
+    for stage, seconds in report["results"].items():
+        print(f"{stage:<22} {seconds * 1000:10.2f} ms")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("corpus") != report["corpus"]:
+            print("Baseline was recorded with a different corpus")
+            return 2
+        regressions = compare_to_baseline(report, baseline, args.threshold)
+        for stage, previous, seconds in regressions:
+            print(
+                f"REGRESSION {stage}: {previous * 1000:.2f} ms -> {seconds * 1000:.2f} ms"
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+
+from htmlnode import LeafNode
+
+DEFAULT_MEMO_ENTRIES = 4096
+
+_process_memos = {}
+
+
+class BlockMemo:
+    """
+    In-memory LRU of rendered markdown blocks, shared by every page that a
+    process renders.
+
+    Navigation snippets, disclaimers, "see also" lists and the like repeat
+    verbatim within a page and across many pages. The first occurrence is
+    rendered as usual; later ones get the same raw-HTML LeafNode (and the
+    block's summary for the site index) back without cleaning, inline
+    parsing or serializing the block again. The node is shared, so callers
+    must not modify it.
+
+    Keys are (URL rewriter, block type, heading level, block text): link
+    and image URLs in the HTML depend on the rewriter, whose repr includes
+    the base path and a digest of the asset table. Nothing is kept between
+    processes or builds, so the memo can never serve a stale fragment to an
+    incremental build; pool workers each fill their own (see for_process).
+    A lock makes one instance safe to share between threads.
+
+    Args:
+        max_entries (int): Blocks kept; the least recently used are dropped
+
+    Example:
+        >>> memo = BlockMemo()
+        >>> markdown_to_html_node(md, rewrite_url, memo=memo)
+        >>> memo.hits, memo.misses
+    """
+
+    def __init__(self, max_entries=DEFAULT_MEMO_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._nodes = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_process(cls, max_entries=DEFAULT_MEMO_ENTRIES):
+        """Returns this process's memo of `max_entries` blocks."""
+        memo = _process_memos.get(max_entries)
+        if memo is None:
+            memo = cls(max_entries)
+            _process_memos[max_entries] = memo
+        return memo
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    @staticmethod
+    def key(block, rewrite_url=None):
+        """Returns the memo key of a scanned Block."""
+        return (repr(rewrite_url), block.block_type, block.level, block.text)
+
+    def render_block(self, block, rewrite_url, render):
+        """
+        Returns the block's HTML as a shared LeafNode, rendering it on a miss.
+
+        Args:
+            block (Block): Block from scan_blocks()
+            rewrite_url (callable): URL rewriter used for the block
+            render (callable): Called with no arguments on a miss; must
+                return the block's (HTMLNode, summary), as
+                markdown_blocks.convert_block does
+
+        Returns:
+            tuple[LeafNode, tuple | None]: Raw HTML node (no tag) holding
+            the fragment, and the block's summary
+        """
+        key = BlockMemo.key(block, rewrite_url)
+        with self._lock:
+            entry = self._nodes.get(key)
+            if entry is not None:
+                self._nodes.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        node, summary = render()
+        entry = (LeafNode(None, node.to_html()), summary)
+        if self.max_entries > 0:
+            with self._lock:
+                self._nodes[key] = entry
+                while len(self._nodes) > self.max_entries:
+                    self._nodes.popitem(last=False)
+        return entry
+
+    def hit_rate(self):
+        """Returns hits / lookups as a percentage (0 with no lookups)."""
+        lookups = self.hits + self.misses
+        return 100.0 * self.hits / lookups if lookups else 0.0
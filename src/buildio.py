@@ -0,0 +1,231 @@
+import hashlib
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import hash_file
+
+DEFAULT_IO_WORKERS = 8
+DEFAULT_MAX_PENDING = 64
+
+
+def read_text(path):
+    """Returns the contents of a text file."""
+    with open(path, "r") as f:
+        return f.read()
+
+
+def _output_fingerprint(path, digest):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+
+
+def _unchanged(path, digest, previous):
+    """
+    Checks whether `path` already holds content with hash `digest`.
+
+    When the file still has the size and mtime recorded when it was last
+    written, a stat() is enough; otherwise the existing file is hashed.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    if (
+        previous is not None
+        and previous["size"] == st.st_size
+        and previous["mtime_ns"] == st.st_mtime_ns
+    ):
+        return previous["sha256"] == digest
+    return hash_file(path) == digest
+
+
+def write_if_changed(path, data, previous=None):
+    """
+    Writes `data` to `path` unless the file already holds exactly that.
+
+    Unchanged files keep their mtime, so rsync, CDN syncs and the next
+    build's stat() checks see them as untouched. Changed files are written
+    to a temporary file first and renamed over `path`, so a half-written
+    file is never served.
+
+    Args:
+        path (str): Output file; its directory must exist
+        data (str | bytes): New content (str is encoded as UTF-8)
+        previous (dict, optional): Fingerprint returned for `path` by the
+            last build, as recorded in the build manifest
+
+    Returns:
+        tuple[bool, dict]: (whether the file was written, its fingerprint
+        {"size", "mtime_ns", "sha256"})
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    digest = hashlib.sha256(data).hexdigest()
+    if _unchanged(path, digest, previous):
+        return False, _output_fingerprint(path, digest)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True, _output_fingerprint(path, digest)
+
+
+def replace_if_changed(tmp_path, path, previous=None):
+    """
+    Like write_if_changed, for content already written to `tmp_path`.
+
+    `tmp_path` is renamed over `path` if the content differs and removed
+    otherwise.
+    """
+    digest = hash_file(tmp_path)
+    if _unchanged(path, digest, previous):
+        os.remove(tmp_path)
+        return False, _output_fingerprint(path, digest)
+    os.replace(tmp_path, path)
+    return True, _output_fingerprint(path, digest)
+
+
+@contextmanager
+def output_file(path, encoding="utf-8"):
+    """
+    Opens a text file to stream an output into, like open(path, "w").
+
+    The content goes to a temporary file that replace_if_changed() moves
+    over `path` when the block ends, so `path` keeps its mtime if nothing
+    changed and is never seen half written. On error `path` is left alone.
+
+    Example:
+        >>> with output_file("docs/blog/rss.xml") as f:
+        ...     f.write(feed)
+    """
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding=encoding) as f:
+            yield f
+        replace_if_changed(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class BuildIO:
+    """
+    Thread pool that reads build inputs ahead and writes outputs behind.
+
+    File system calls release the GIL, so while the main thread renders one
+    page, worker threads read the next sources and write the previous
+    outputs. Both directions are bounded: at most `max_pending` reads are
+    in flight ahead of the consumer and `write` blocks once `max_pending`
+    writes are queued, so memory stays flat on large sites.
+
+    Output directories are created once per build, however many pages
+    they hold. Outputs are written with write_if_changed; the result for
+    every path is kept in `outputs` once flush() returns.
+
+    Args:
+        workers (int): Number of I/O threads
+        max_pending (int): Maximum number of queued reads and of queued writes
+
+    Example:
+        >>> with BuildIO() as io:
+        ...     for path, future in io.prefetch(sources):
+        ...         io.write(dest_for(path), render(future.result()))
+        ...     failures = io.flush()
+    """
+
+    def __init__(self, workers=DEFAULT_IO_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        self.max_pending = max(1, max_pending)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="build-io"
+        )
+        self._write_slots = threading.BoundedSemaphore(self.max_pending)
+        self._writes = []
+        self.outputs = {}
+        self._dirs = set()
+        self._dirs_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def prefetch(self, paths, reader=read_text):
+        """
+        Reads files in the background and yields them in order.
+
+        Args:
+            paths (iterable[str]): Files to read
+            reader (callable): Called with each path in a worker thread
+
+        Yields:
+            tuple[str, Future]: Each path with the future of its reader
+            result; future.result() re-raises the reader's exception
+        """
+        window = deque()
+        for path in paths:
+            window.append((path, self._pool.submit(reader, path)))
+            if len(window) >= self.max_pending:
+                yield window.popleft()
+        while window:
+            yield window.popleft()
+
+    def makedirs(self, dir_path):
+        """Creates `dir_path` unless this instance already did."""
+        if not dir_path:
+            return
+        with self._dirs_lock:
+            if dir_path in self._dirs:
+                return
+            os.makedirs(dir_path, exist_ok=True)
+            self._dirs.add(dir_path)
+
+    def _write(self, path, text, previous):
+        try:
+            self.makedirs(os.path.dirname(path))
+            return write_if_changed(path, text, previous)
+        finally:
+            self._write_slots.release()
+
+    def write(self, path, text, previous=None):
+        """
+        Queues `text` to be written to `path`, creating its directory.
+
+        Blocks while `max_pending` writes are already queued.
+
+        Args:
+            previous (dict, optional): Fingerprint of the last build's
+                output, see write_if_changed
+        """
+        self._write_slots.acquire()
+        try:
+            future = self._pool.submit(self._write, path, text, previous)
+        except BaseException:
+            self._write_slots.release()
+            raise
+        self._writes.append((path, future))
+
+    def flush(self):
+        """
+        Waits for every queued write.
+
+        Returns:
+            list[tuple[str, Exception]]: Paths whose write failed, in the
+            order they were queued
+        """
+        failures = []
+        for path, future in self._writes:
+            error = future.exception()
+            if error is not None:
+                failures.append((path, error))
+            else:
+                self.outputs[path] = future.result()
+        self._writes = []
+        return failures
+
+    def close(self):
+        """Waits for pending work and stops the worker threads."""
+        self._pool.shutdown(wait=True)
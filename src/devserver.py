@@ -0,0 +1,491 @@
+import functools
+import os
+import shutil
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from assets import static_asset
+from block_memo import BlockMemo
+from gencontent import (
+    TEMPLATE_NAME,
+    asset_sources,
+    find_template,
+    generate_page,
+    generate_pages_recursive,
+)
+from search_index import build_search_index, search_state_path
+from site_index import PageMetadata
+from template import load_template
+
+
+def snapshot_tree(*paths):
+    """
+    Records the mtime and size of every file under the given paths.
+
+    Args:
+        *paths (str): Files or directories to scan (missing ones are skipped)
+
+    Returns:
+        dict: file path -> (mtime_ns, size)
+    """
+    result = {}
+    pending = list(paths)
+    while pending:
+        path = pending.pop()
+        if os.path.isfile(path):
+            st = os.stat(path)
+            result[path] = (st.st_mtime_ns, st.st_size)
+            continue
+        if not os.path.isdir(path):
+            continue
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                elif entry.is_file():
+                    st = entry.stat()
+                    result[entry.path] = (st.st_mtime_ns, st.st_size)
+    return result
+
+
+def diff_snapshots(old, new):
+    """
+    Compares two results of snapshot_tree().
+
+    Returns:
+        tuple[list[str], list[str]]: (added or modified paths, removed paths),
+        both sorted
+    """
+    changed = sorted(path for path, stamp in new.items() if old.get(path) != stamp)
+    removed = sorted(path for path in old if path not in new)
+    return changed, removed
+
+
+def _mirror_path(path, src_dir, dest_dir):
+    return os.path.join(dest_dir, os.path.relpath(path, src_dir))
+
+
+def _is_within(path, directory):
+    return os.path.commonpath([path, directory]) == directory
+
+
+def rebuild_changed(
+    changed,
+    removed,
+    base_path,
+    manifest,
+    content_dir="content",
+    static_dir="static",
+    template_path="template.html",
+    dest_dir="docs",
+    site_index=None,
+    images=None,
+    assets=None,
+    fingerprint=False,
+    minify=False,
+):
+    """
+    Brings `dest_dir` up to date after the given files changed.
+
+    - A changed template regenerates the pages that depend on it according
+      to the manifest's dependency graph. Adding or removing a template
+      changes which template pages resolve to, so it falls back to a walk
+      of the content tree (still skipping pages that are fresh).
+    - Changed markdown files are regenerated one by one; removed ones have
+      their output deleted.
+    - Changed static files are copied; removed ones are deleted. Images
+      go through `images` instead. Either way their entry in `assets` and
+      the manifest's list of static outputs are updated, and the pages
+      that depend on the file are regenerated.
+
+    Args:
+        changed (list[str]): Added or modified paths (see diff_snapshots)
+        removed (list[str]): Removed paths
+        base_path (str): Base URL path forwarded to generate_page
+        manifest (BuildManifest): Build manifest, updated and saved
+        site_index (SiteIndex, optional): Site index, updated and saved
+            together with the search index; only the records and search
+            postings of the pages that changed are encoded again
+        images (images.ImagePipeline, optional): Optimizes changed images
+        assets (dict, optional): Asset table pages are rendered with,
+            updated in place
+        fingerprint (bool): Place static files under fingerprinted names,
+            as the build did (see assets.static_asset)
+        minify (bool): Render pages minified, as the build did
+
+    Returns:
+        int: Number of output files written or deleted
+    """
+    count = 0
+    manifest.invalidate(changed)
+
+    def is_template(path):
+        return path == template_path or (
+            _is_within(path, content_dir) and os.path.basename(path) == TEMPLATE_NAME
+        )
+
+    templates = [path for path in changed if is_template(path)]
+    structural = any(is_template(path) for path in removed) or any(
+        not manifest.dependents(path) for path in templates
+    )
+
+    # Static files go first, so pages rendered below see the new asset table.
+    static_changes = {}
+    files = set(manifest.assets)
+    for path in changed:
+        if not _is_within(path, static_dir):
+            continue
+        rel_path = os.path.relpath(path, static_dir)
+        url = "/" + rel_path.replace(os.sep, "/")
+        previous = assets.get(url) if assets is not None else None
+        if images is not None and images.handles(rel_path):
+            os.makedirs(
+                os.path.join(dest_dir, os.path.dirname(rel_path)), exist_ok=True
+            )
+            url, entry, outputs, written = images.place(
+                path, dest_dir, rel_path, fingerprint
+            )
+            outputs = [os.path.normpath(output) for output in outputs]
+            count += written
+        else:
+            url, entry, output = static_asset(path, rel_path, fingerprint)
+            outputs = [os.path.normpath(output)]
+            dest_path = os.path.join(dest_dir, output)
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            shutil.copy2(path, dest_path)
+            count += 1
+        for output in _asset_outputs(previous, rel_path):
+            if output not in outputs:
+                files.discard(output)
+                count += _remove(os.path.join(dest_dir, output))
+        files.update(outputs)
+        if assets is not None:
+            if entry is not None:
+                assets[url] = entry
+            else:
+                assets.pop(url, None)
+        table_changed = assets is not None and (previous is None) != (entry is None)
+        static_changes[path] = _asset_pages(
+            path, url, table_changed, manifest, site_index
+        )
+
+    for path in removed:
+        if not _is_within(path, static_dir):
+            continue
+        rel_path = os.path.relpath(path, static_dir)
+        url = "/" + rel_path.replace(os.sep, "/")
+        previous = assets.pop(url, None) if assets is not None else None
+        for output in _asset_outputs(previous, rel_path):
+            files.discard(output)
+            count += _remove(os.path.join(dest_dir, output))
+        static_changes[path] = _asset_pages(
+            path, url, previous is not None, manifest, site_index
+        )
+    manifest.assets = sorted(files)
+
+    rebuilt = set()
+    if structural:
+        before = dict(manifest.outputs)
+        generate_pages_recursive(
+            content_dir,
+            template_path,
+            dest_dir,
+            base_path,
+            manifest,
+            site_index=site_index,
+            assets=assets,
+            minify=minify,
+            block_memo=BlockMemo.for_process(),
+        )
+        count += sum(
+            1 for dest, entry in manifest.outputs.items() if before.get(dest) != entry
+        )
+        rebuilt.update(manifest.outputs)
+    else:
+        for path in templates:
+            for dest_path in manifest.dependents(path):
+                entry = manifest.outputs[dest_path]
+                _regenerate(
+                    entry["source"],
+                    entry["template"],
+                    dest_path,
+                    base_path,
+                    manifest,
+                    site_index,
+                    assets,
+                    minify,
+                )
+                rebuilt.add(dest_path)
+                count += 1
+
+    for path in changed:
+        if not (_is_within(path, content_dir) and path.endswith(".md")):
+            continue
+        dest_path = _mirror_path(path, content_dir, dest_dir)[:-3] + ".html"
+        if dest_path in rebuilt:
+            continue
+        page_template = find_template(path, content_dir, template_path)
+        _regenerate(
+            path,
+            page_template,
+            dest_path,
+            base_path,
+            manifest,
+            site_index,
+            assets,
+            minify,
+        )
+        rebuilt.add(dest_path)
+        count += 1
+
+    for path in removed:
+        if not (_is_within(path, content_dir) and path.endswith(".md")):
+            continue
+        dest_path = _mirror_path(path, content_dir, dest_dir)[:-3] + ".html"
+        manifest.forget(dest_path)
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+            count += 1
+
+    for path in static_changes:
+        for dest_path in static_changes[path]:
+            if dest_path in rebuilt:
+                continue
+            entry = manifest.outputs.get(dest_path)
+            if entry is None:
+                continue
+            _regenerate(
+                entry["source"],
+                entry["template"],
+                dest_path,
+                base_path,
+                manifest,
+                site_index,
+                assets,
+                minify,
+            )
+            rebuilt.add(dest_path)
+            count += 1
+    if images is not None:
+        images.save()
+
+    manifest.save()
+    if site_index is not None:
+        site_index.prune(manifest.outputs)
+        site_index.save()
+        build_search_index(
+            site_index,
+            dest_dir,
+            state_path=search_state_path(manifest.path),
+            pages=site_index.changed,
+        )
+        site_index.changed.clear()
+    return count
+
+
+def _asset_outputs(entry, rel_path):
+    """Returns the files in the output directory of one static asset."""
+    if entry is not None and entry.get("srcset"):
+        return [os.path.normpath(variant.lstrip("/")) for variant, _ in entry["srcset"]]
+    if entry is not None and "url" in entry:
+        return [os.path.normpath(entry["url"].lstrip("/"))]
+    return [os.path.normpath(rel_path)]
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+        return 1
+    return 0
+
+
+def _asset_pages(path, url, added_or_removed, manifest, site_index):
+    """
+    Returns the pages to regenerate after the static file `path` changed.
+
+    Pages that inlined the asset depend on it in the manifest. When the
+    asset gains or loses its entry in the asset table, pages that link to
+    it could not record that dependency, so they are found through the
+    links and images in the site index and the URLs of their template.
+    """
+    pages = set(manifest.dependents(path))
+    if added_or_removed:
+        if site_index is not None:
+            for dest_path, record in site_index.records.items():
+                if url in record["links"] or any(
+                    src == url for _, src in record["images"]
+                ):
+                    pages.add(dest_path)
+        for dest_path, entry in manifest.outputs.items():
+            if url in load_template(entry["template"]).urls:
+                pages.add(dest_path)
+    return sorted(pages)
+
+
+def _regenerate(
+    source_path,
+    template_path,
+    dest_path,
+    base_path,
+    manifest,
+    site_index,
+    assets,
+    minify=False,
+):
+    """
+    Regenerates one page and records it in the manifest and site index.
+
+    The server's block memo lives as long as the process, so blocks that
+    did not change between saves are not rendered again.
+    """
+    metadata = PageMetadata()
+    changed, output = generate_page(
+        source_path,
+        template_path,
+        dest_path,
+        base_path,
+        metadata=metadata,
+        assets=assets,
+        minify=minify,
+        previous_output=manifest.previous_output(dest_path),
+        block_memo=BlockMemo.for_process(),
+    )
+    if site_index is not None:
+        site_index.add(dest_path, source_path, metadata)
+    manifest.record(
+        dest_path,
+        source_path,
+        template_path,
+        base_path,
+        assets=asset_sources(metadata, assets, template_path),
+        output=output,
+        changed=changed,
+    )
+
+
+class _BasePathHandler(SimpleHTTPRequestHandler):
+    """
+    Serves the output directory under the site's base path, as GitHub
+    Pages does: with base path "/repo/", /repo/blog/ maps to blog/ in the
+    directory. "/" redirects to the base path; other URLs are not found.
+    """
+
+    def __init__(self, *args, base_path="/", **kwargs):
+        self.base_path = base_path
+        super().__init__(*args, **kwargs)
+
+    def send_head(self):
+        path = self.path.split("?", 1)[0].split("#", 1)[0]
+        if not path.startswith(self.base_path):
+            if path in ("/", self.base_path.rstrip("/")):
+                self.send_response(301)
+                self.send_header("Location", self.base_path)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                self.send_error(404, "File not found")
+            return None
+        return super().send_head()
+
+    def translate_path(self, path):
+        path = path.split("?", 1)[0].split("#", 1)[0]
+        if path.startswith(self.base_path):
+            path = "/" + path[len(self.base_path) :]
+        return super().translate_path(path)
+
+
+def serve_directory(directory, port=8888, base_path="/"):
+    """
+    Serves a directory over HTTP from a background thread.
+
+    Args:
+        directory (str): Directory to serve
+        port (int): Port to listen on (0 picks a free port)
+        base_path (str): URL path the directory is mounted at, so that
+            links rendered for that base path resolve
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it
+    """
+    if not base_path.endswith("/"):
+        base_path += "/"
+    handler = functools.partial(
+        _BasePathHandler, directory=directory, base_path=base_path
+    )
+    server = ThreadingHTTPServer(("", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def watch(
+    base_path,
+    manifest,
+    interval=0.05,
+    content_dir="content",
+    static_dir="static",
+    template_path="template.html",
+    dest_dir="docs",
+    site_index=None,
+    images=None,
+    assets=None,
+    fingerprint=False,
+    minify=False,
+):
+    """
+    Polls the content, static and template inputs and rebuilds on change.
+
+    Runs until interrupted. Each poll is a stat() of every input file; a
+    single edited page is regenerated within one polling interval. When a
+    rebuild fails, the inputs it covered stay pending and are rebuilt
+    together with the next change.
+
+    Args:
+        base_path (str): Base URL path forwarded to generate_page
+        manifest (BuildManifest): Manifest of the initial build
+        interval (float): Seconds between polls
+        site_index (SiteIndex, optional): Kept up to date with every rebuild
+        images (images.ImagePipeline, optional): Optimizes changed images
+        assets (dict, optional): Asset table, kept up to date
+        fingerprint (bool): Forwarded to rebuild_changed
+        minify (bool): Forwarded to rebuild_changed
+    """
+    previous = snapshot_tree(content_dir, static_dir, template_path)
+    failed = None
+    while True:
+        time.sleep(interval)
+        current = snapshot_tree(content_dir, static_dir, template_path)
+        if current == failed:
+            continue
+        changed, removed = diff_snapshots(previous, current)
+        if not changed and not removed:
+            continue
+
+        start = time.perf_counter()
+        try:
+            count = rebuild_changed(
+                changed,
+                removed,
+                base_path,
+                manifest,
+                content_dir,
+                static_dir,
+                template_path,
+                dest_dir,
+                site_index,
+                images,
+                assets,
+                fingerprint,
+                minify,
+            )
+        except Exception as e:
+            # Keep `previous`, so the failed inputs are retried with the
+            # next change instead of being forgotten.
+            print(f"Rebuild failed: {e}")
+            failed = current
+            continue
+        previous = current
+        failed = None
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"Rebuilt {count} file(s) in {elapsed:.1f} ms")
@@ -0,0 +1,458 @@
+import codecs
+import glob
+import json
+import os
+import subprocess
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import XMLGenerator
+
+from buildio import output_file
+from gencontent import find_template
+from markdown_blocks import iter_markdown_html
+from template import load_template
+from urls import UrlRewriter
+
+SITEMAP_NAME = "sitemap.xml"
+MAX_SITEMAP_URLS = 50_000
+DEFAULT_FEED_SECTIONS = ("blog",)
+FEED_ENTRIES = 20
+PUBLISHED_DATES_NAME = "published.json"
+
+_SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+_ATOM_NS = "http://www.w3.org/2005/Atom"
+
+
+def absolute_url(site_url, url):
+    """
+    Joins the site's origin and a root-relative URL.
+
+    Example:
+        >>> absolute_url("https://fongfox.github.io/", "/repo/blog/tom/")
+        'https://fongfox.github.io/repo/blog/tom/'
+    """
+    return site_url.rstrip("/") + url
+
+
+class _XMLWriter:
+    """
+    Thin streaming XML writer over xml.sax.saxutils.XMLGenerator.
+
+    Elements go straight to the underlying file as they are written, so
+    memory does not grow with the number of entries.
+    """
+
+    def __init__(self, f) -> None:
+        self._gen = XMLGenerator(f, encoding="utf-8", short_empty_elements=True)
+        self._gen.startDocument()
+
+    def start(self, name, attrs=None):
+        self._gen.startElement(name, attrs or {})
+
+    def end(self, name):
+        self._gen.endElement(name)
+
+    def text(self, content):
+        self._gen.characters(content)
+
+    def element(self, name, content=None, attrs=None):
+        self.start(name, attrs)
+        if content is not None:
+            self.text(content)
+        self.end(name)
+
+
+def _write_urlset(path, site_url, records):
+    with output_file(path) as f:
+        xml = _XMLWriter(f)
+        xml.start("urlset", {"xmlns": _SITEMAP_NS})
+        for record in records:
+            xml.start("url")
+            xml.element("loc", absolute_url(site_url, record["url"]))
+            xml.end("url")
+        xml.end("urlset")
+        f.write("\n")
+
+
+def write_sitemaps(site_index, dest_dir, site_url, max_urls=MAX_SITEMAP_URLS):
+    """
+    Writes sitemap.xml for every page in the site index.
+
+    Past `max_urls` pages, the URLs are split into sitemap-1.xml,
+    sitemap-2.xml, ... and sitemap.xml becomes a sitemap index that lists
+    them, as the sitemap protocol requires. Sitemap files left over from a
+    larger previous build are removed.
+
+    Args:
+        site_index (SiteIndex): Metadata of every page
+        dest_dir (str): Output directory of the site
+        site_url (str): Origin the site is served from, e.g.
+            "https://fongfox.github.io"
+        max_urls (int): URLs per sitemap file
+
+    Returns:
+        list[str]: Paths of the files written
+    """
+    sitemap_path = os.path.join(dest_dir, SITEMAP_NAME)
+    count = len(site_index.records)
+    written = []
+
+    if count <= max_urls:
+        _write_urlset(sitemap_path, site_url, site_index)
+        written.append(sitemap_path)
+    else:
+        records = iter(site_index)
+        parts = (count + max_urls - 1) // max_urls
+        for number in range(1, parts + 1):
+            path = os.path.join(dest_dir, f"sitemap-{number}.xml")
+            chunk = (record for _, record in zip(range(max_urls), records))
+            _write_urlset(path, site_url, chunk)
+            written.append(path)
+
+        base_url = site_index.base_path or "/"
+        with output_file(sitemap_path) as f:
+            xml = _XMLWriter(f)
+            xml.start("sitemapindex", {"xmlns": _SITEMAP_NS})
+            for path in written:
+                url = base_url.rstrip("/") + "/" + os.path.basename(path)
+                xml.start("sitemap")
+                xml.element("loc", absolute_url(site_url, url))
+                xml.end("sitemap")
+            xml.end("sitemapindex")
+            f.write("\n")
+        written.append(sitemap_path)
+
+    for path in glob.glob(os.path.join(dest_dir, "sitemap-*.xml")):
+        if path not in written:
+            os.remove(path)
+    return written
+
+
+def _iter_between(path, before, after, chunk_size=1 << 16):
+    """
+    Streams the text of a file between a known prefix and suffix.
+
+    Returns None (before yielding anything) if the file does not start with
+    `before` and end with `after`.
+    """
+    before = before.encode("utf-8")
+    after = after.encode("utf-8")
+    f = open(path, "rb")
+    size = os.fstat(f.fileno()).st_size
+    if size < len(before) + len(after) or f.read(len(before)) != before:
+        f.close()
+        return None
+    f.seek(size - len(after))
+    if f.read() != after:
+        f.close()
+        return None
+
+    def chunks():
+        with f:
+            f.seek(len(before))
+            remaining = size - len(before) - len(after)
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            while remaining > 0:
+                data = f.read(min(chunk_size, remaining))
+                remaining -= len(data)
+                yield decoder.decode(data, final=remaining <= 0)
+
+    return chunks()
+
+
+def page_content(
+    record,
+    dest_dir,
+    base_path,
+    content_dir,
+    template_path,
+    assets=None,
+    minify=False,
+):
+    """
+    Returns the rendered content HTML of a page as string fragments.
+
+    The HTML is read back from the page that was already written. The
+    template (minified if the pages were rendered with `minify`) is
+    rendered around its Content slot with the page's title and that prefix
+    and suffix are cut off. If the page on disk does not match (e.g. the
+    template changed since), the content is rendered from the markdown
+    again, with the asset table `assets`.
+    """
+    rewrite_url = UrlRewriter(base_path, assets)
+    template = load_template(
+        find_template(record["source"], content_dir, template_path), minify
+    )
+    around = template.render_around("Content", {"Title": record["title"]}, rewrite_url)
+    if around is not None:
+        chunks = _iter_between(
+            os.path.join(dest_dir, record["path"]), around[0], around[1]
+        )
+        if chunks is not None:
+            return chunks
+
+    with open(record["source"], "r") as f:
+        return list(iter_markdown_html(f, rewrite_url))
+
+
+def git_published_times(content_dir):
+    """
+    Returns {markdown source: unix time of the commit that added it} for the
+    files under `content_dir` that git tracks.
+
+    One `git log` covers the whole directory. This is a best-effort guess:
+    in a shallow clone every file looks added by the oldest fetched commit,
+    so the result is empty there, as it is outside a git work tree (or
+    without git).
+
+    Example:
+        >>> git_published_times("content")["content/blog/tom/index.md"]
+        1718000000
+    """
+    try:
+        shallow = subprocess.run(
+            ["git", "-C", content_dir, "rev-parse", "--is-shallow-repository"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        if shallow.strip() != "false":
+            return {}
+        log = subprocess.run(
+            ["git", "-c", "core.quotePath=false", "-C", content_dir, "log"]
+            + ["--diff-filter=A", "--format=%x00%at", "--name-only", "--relative"]
+            + ["--", "."],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+
+    times = {}
+    # Newest commit first, so a file that was removed and added again is
+    # dated by its latest addition.
+    for commit in log.split("\0")[1:]:
+        lines = commit.strip().split("\n")
+        for name in lines[1:]:
+            if name:
+                times.setdefault(os.path.join(content_dir, name), int(lines[0]))
+    return times
+
+
+def _parse_date(value, path, key):
+    try:
+        when = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise Exception(f"{path}: invalid date {value!r} for {key}")
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return int(when.timestamp())
+
+
+def update_published_dates(path, sources, fallback=None):
+    """
+    Returns the publication times of `sources` from a tracked dates file.
+
+    The file maps markdown sources, relative to its own directory, to
+    ISO 8601 dates or times (UTC unless they say otherwise):
+        {"blog/tom/index.md": "2024-06-10T12:00:00+00:00"}
+    It is committed with the content, so every checkout, shallow or not,
+    dates pages the same way, and a date can be corrected by hand. Sources
+    it does not list yet are dated by `fallback`, or else by the current
+    time, and added to the file.
+
+    Args:
+        path (str): The dates file, e.g. "content/published.json"
+        sources (iterable[str]): Markdown sources to date
+        fallback (callable, optional): Returns {source: unix time} to date
+            new sources with; only called if there are any
+
+    Returns:
+        tuple[dict[str, int], list[str]]: ({source: unix time}, sources
+        added to the file)
+
+    Raises:
+        Exception: If the file is not a JSON object of valid dates
+    """
+    base = os.path.dirname(path)
+    try:
+        with open(path) as f:
+            dates = json.load(f)
+    except FileNotFoundError:
+        dates = {}
+    except ValueError as error:
+        raise Exception(f"{path}: {error}")
+    if not isinstance(dates, dict):
+        raise Exception(f"{path}: expected an object of source -> date")
+
+    times = {}
+    added = []
+    guesses = None
+    for source in sources:
+        key = os.path.relpath(source, base).replace(os.sep, "/")
+        if key not in dates:
+            if guesses is None:
+                guesses = fallback() if fallback is not None else {}
+            when = guesses.get(source)
+            if when is None:
+                when = time.time()
+            stamp = datetime.fromtimestamp(int(when), timezone.utc)
+            dates[key] = stamp.isoformat()
+            added.append(source)
+        times[source] = _parse_date(dates[key], path, key)
+
+    if added:
+        with output_file(path) as f:
+            json.dump(dates, f, indent=2, sort_keys=True)
+            f.write("\n")
+    return times, added
+
+
+def section_pages(site_index, section):
+    """
+    Returns the records of a section: its index page (or None) and the
+    other pages under it, sorted by output path.
+    """
+    prefix = section.strip("/") + "/"
+    section_index = None
+    pages = []
+    for record in site_index:
+        if record["path"] == prefix + "index.html":
+            section_index = record
+        elif record["path"].startswith(prefix):
+            pages.append(record)
+    return section_index, pages
+
+
+def _entry_time(record, published):
+    when = published.get(record["source"]) if published else None
+    if when is None:
+        when = os.stat(record["source"]).st_mtime
+    return datetime.fromtimestamp(when, timezone.utc)
+
+
+def write_feeds(
+    site_index,
+    dest_dir,
+    site_url,
+    section,
+    content_dir="content",
+    template_path="template.html",
+    limit=FEED_ENTRIES,
+    assets=None,
+    minify=False,
+    published=None,
+):
+    """
+    Writes an RSS 2.0 and an Atom feed for one section of the site.
+
+    Entries are the section's pages (its own index page excluded), newest
+    first, at most `limit` of them. Pages are dated by `published` (see
+    update_published_dates), so the feeds do not depend on when a checkout
+    was made; only pages missing from it fall back to their source's mtime. Their full HTML content is taken from the
+    already rendered pages (see page_content) and streamed into the feed.
+    The feeds of a section without pages are removed.
+
+    Args:
+        site_index (SiteIndex): Metadata of every page
+        dest_dir (str): Output directory of the site
+        site_url (str): Origin the site is served from
+        section (str): Section directory, e.g. "blog"
+        content_dir (str): Content directory, to resolve page templates
+        template_path (str): Root template
+        limit (int): Maximum number of entries
+        assets (dict, optional): Asset table the pages were rendered with
+        minify (bool): Whether the pages were rendered minified
+        published (dict, optional): Markdown source -> unix time
+
+    Returns:
+        list[str]: Paths of the feeds written, [] if the section has no pages
+    """
+    section = section.strip("/")
+    prefix = section + "/"
+    section_index, pages = section_pages(site_index, section)
+    entries = [(_entry_time(record, published), record) for record in pages]
+    section_dir = os.path.join(dest_dir, section)
+    rss_path = os.path.join(section_dir, "rss.xml")
+    atom_path = os.path.join(section_dir, "atom.xml")
+    if not entries:
+        for path in (rss_path, atom_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return []
+    entries.sort(key=lambda entry: (-entry[0].timestamp(), entry[1]["path"]))
+    entries = entries[:limit]
+
+    base_path = site_index.base_path
+    rewrite_url = UrlRewriter(base_path)
+    feed_title = section_index["title"] if section_index else section
+    feed_url = absolute_url(site_url, rewrite_url(f"/{prefix}"))
+    updated = entries[0][0]
+    os.makedirs(section_dir, exist_ok=True)
+
+    with output_file(rss_path) as f:
+        xml = _XMLWriter(f)
+        xml.start("rss", {"version": "2.0"})
+        xml.start("channel")
+        xml.element("title", feed_title)
+        xml.element("link", feed_url)
+        xml.element("description", feed_title)
+        xml.element("lastBuildDate", format_datetime(updated))
+        for when, record in entries:
+            url = absolute_url(site_url, record["url"])
+            xml.start("item")
+            xml.element("title", record["title"])
+            xml.element("link", url)
+            xml.element("guid", url)
+            xml.element("pubDate", format_datetime(when))
+            xml.start("description")
+            for chunk in page_content(
+                record,
+                dest_dir,
+                base_path,
+                content_dir,
+                template_path,
+                assets,
+                minify,
+            ):
+                xml.text(chunk)
+            xml.end("description")
+            xml.end("item")
+        xml.end("channel")
+        xml.end("rss")
+        f.write("\n")
+
+    with output_file(atom_path) as f:
+        xml = _XMLWriter(f)
+        xml.start("feed", {"xmlns": _ATOM_NS})
+        xml.element("title", feed_title)
+        xml.element("id", feed_url)
+        xml.element("link", attrs={"href": feed_url})
+        xml.element("link", attrs={"rel": "self", "href": feed_url + "atom.xml"})
+        xml.element("updated", updated.isoformat())
+        for when, record in entries:
+            url = absolute_url(site_url, record["url"])
+            xml.start("entry")
+            xml.element("title", record["title"])
+            xml.element("id", url)
+            xml.element("link", attrs={"href": url})
+            xml.element("updated", when.isoformat())
+            xml.start("content", {"type": "html"})
+            for chunk in page_content(
+                record,
+                dest_dir,
+                base_path,
+                content_dir,
+                template_path,
+                assets,
+                minify,
+            ):
+                xml.text(chunk)
+            xml.end("content")
+            xml.end("entry")
+        xml.end("feed")
+        f.write("\n")
+
+    return [rss_path, atom_path]
@@ -1,7 +1,24 @@
+import functools
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 
-from markdown_blocks import markdown_to_html_node
+from assets import AssetTable, static_asset
+from block_memo import BlockMemo
+from buildio import (
+    DEFAULT_IO_WORKERS,
+    BuildIO,
+    read_text,
+    replace_if_changed,
+    write_if_changed,
+)
+from manifest import hash_file
+from markdown_blocks import iter_markdown_html, markdown_to_html_node
+from profiler import PageProfile, no_phase
+from render_cache import RenderCache
+from site_index import PageMetadata
+from template import load_template
+from urls import UrlRewriter
 
 
 def copy_directory_contents(source_dir, dest_dir):
@@ -62,6 +79,161 @@ def copy_directory_contents(source_dir, dest_dir):
             copy_directory_contents(cur_path, new_des_dir_path)
 
 
+FICLONE = 0x40049409
+
+
+def _reflink_file(src_path, dest_path):
+    """Clones a file with the Linux FICLONE ioctl (copy-on-write filesystems)."""
+    import fcntl
+
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+        fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+    shutil.copystat(src_path, dest_path)
+
+
+def _place_file(src_path, dest_path, method):
+    """
+    Puts a copy of `src_path` at `dest_path` using the requested method.
+
+    "hardlink" and "reflink" fall back to a regular copy when the
+    filesystem does not support them (e.g. across devices).
+    """
+    if os.path.lexists(dest_path):
+        os.remove(dest_path)
+
+    if method == "hardlink":
+        try:
+            os.link(src_path, dest_path)
+            return
+        except OSError:
+            pass
+    elif method == "reflink":
+        try:
+            _reflink_file(src_path, dest_path)
+            return
+        except (OSError, ImportError):
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+
+    shutil.copy2(src_path, dest_path)
+
+
+def sync_directory_contents(
+    source_dir,
+    dest_dir,
+    previous=None,
+    use_hash=False,
+    method="copy",
+    images=None,
+    fingerprint=False,
+):
+    """
+    Incrementally mirrors a source directory into a destination directory.
+
+    Unlike copy_directory_contents, the destination is not deleted: files
+    whose size and mtime already match are left alone, so an unchanged
+    static/ tree costs one stat() per file.
+
+    Args:
+        source_dir (str): Path of the source directory
+        dest_dir (str): Path of the destination directory
+        previous (iterable[str], optional): Relative paths synced by the
+            previous run. Those no longer in source_dir are deleted from
+            dest_dir. Other files in dest_dir (e.g. generated pages) are
+            never touched.
+        use_hash (bool): When size matches but mtime differs, compare file
+            contents instead of copying right away.
+        method (str): "copy", "hardlink" or "reflink".
+        images (images.ImagePipeline, optional): Files it handles() are
+            optimized and written with their scaled-down variants by the
+            pipeline instead of being copied.
+        fingerprint (bool): Write the files assets.should_fingerprint()
+            accepts under a name with a hash of their content
+            (index.3f2a9c1b.css), so they can be served as immutable.
+
+    Returns:
+        dict: {"files": sorted relative paths now in sync,
+               "copied": int, "unchanged": int, "removed": int,
+               "assets": AssetTable {root-relative URL: asset entry} of
+               the images and fingerprinted files}
+
+    Raises:
+        Exception: If the source directory does not exist
+    """
+    if not os.path.isdir(source_dir):
+        raise Exception("Folder path not existed!")
+
+    files = []
+    copied = 0
+    unchanged = 0
+    assets = AssetTable()
+
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        os.makedirs(os.path.join(dest_dir, rel_dir), exist_ok=True)
+
+        with os.scandir(os.path.join(source_dir, rel_dir)) as entries:
+            for entry in entries:
+                rel_path = os.path.join(rel_dir, entry.name)
+                if entry.is_dir():
+                    pending.append(rel_path)
+                    continue
+
+                if images is not None and images.handles(rel_path):
+                    url, asset, outputs, written = images.place(
+                        entry.path, dest_dir, rel_path, fingerprint
+                    )
+                    assets[url] = asset
+                    files.extend(os.path.normpath(output) for output in outputs)
+                    copied += written
+                    unchanged += len(outputs) - written
+                    continue
+
+                url, asset, output = static_asset(entry.path, rel_path, fingerprint)
+                if asset is not None:
+                    assets[url] = asset
+                    rel_path = os.path.normpath(output)
+                files.append(rel_path)
+                dest_path = os.path.join(dest_dir, rel_path)
+                src_stat = entry.stat()
+                try:
+                    dest_stat = os.stat(dest_path)
+                except FileNotFoundError:
+                    dest_stat = None
+
+                if dest_stat is not None and dest_stat.st_size == src_stat.st_size:
+                    if dest_stat.st_mtime_ns == src_stat.st_mtime_ns:
+                        unchanged += 1
+                        continue
+                    if use_hash and hash_file(entry.path) == hash_file(dest_path):
+                        shutil.copystat(entry.path, dest_path)
+                        unchanged += 1
+                        continue
+
+                _place_file(entry.path, dest_path, method)
+                copied += 1
+
+    files.sort()
+    removed = 0
+    current = set(files)
+    for rel_path in previous or ():
+        if rel_path in current:
+            continue
+        dest_path = os.path.join(dest_dir, rel_path)
+        if os.path.isfile(dest_path):
+            os.remove(dest_path)
+            removed += 1
+
+    return {
+        "files": files,
+        "copied": copied,
+        "unchanged": unchanged,
+        "removed": removed,
+        "assets": assets,
+    }
+
+
 def extract_title(markdown: str) -> str:
     """
     Extract the first H1 title from a markdown string.
@@ -80,7 +252,19 @@ def extract_title(markdown: str) -> str:
     Raises:
         Exception: If no H1 heading is found in the markdown.
     """
-    lines = markdown.split("\n")
+    return extract_title_from_lines(markdown.split("\n"))
+
+
+def extract_title_from_lines(lines) -> str:
+    """
+    Extract the first H1 title from an iterable of markdown lines.
+
+    Same rules as extract_title(), but stops reading at the title, so it
+    can scan an open file without loading it.
+
+    Raises:
+        Exception: If no H1 heading is found in the markdown.
+    """
     for line in lines:
         temp = line.lstrip()
         if temp.startswith("# "):
@@ -91,58 +275,287 @@ def extract_title(markdown: str) -> str:
     raise Exception("No h1 title found in markdown")
 
 
-def generate_page(from_path, template_path, dest_path, base_path=None):
+STREAM_THRESHOLD = 8 * 1024 * 1024
+
+
+def render_page(
+    markdown,
+    template,
+    base_path=None,
+    profile=None,
+    render_cache=None,
+    metadata=None,
+    assets=None,
+    block_memo=None,
+):
+    """
+    Renders markdown into a complete HTML page string.
+
+    Args:
+        markdown (str): Markdown source of the page
+        template (template.Template): Parsed page template
+        base_path (str, optional): Base URL path for root-relative URLs
+        profile (PageProfile, optional): Receives per-phase timings
+        render_cache (RenderCache, optional): Reuses rendered blocks
+        metadata (site_index.PageMetadata, optional): Filled with the page's
+            title, headings, links and word count while it is parsed
+        assets (dict, optional): Asset table for urls.UrlRewriter; images
+            in it get their size and srcset
+        block_memo (BlockMemo, optional): Shares the HTML of blocks that
+            repeat within and across pages
+
+    Returns:
+        str: The filled template
+
+    Raises:
+        Exception: If `extract_title` cannot find an H1 title in the markdown.
+    """
+    phase = profile.phase if profile is not None else no_phase
+    rewrite_url = UrlRewriter(base_path, assets)
+    if metadata is None:
+        metadata = PageMetadata(title_only=True)
+
+    root = markdown_to_html_node(
+        markdown, rewrite_url, profile, render_cache, metadata, block_memo
+    )
+    with phase("serialization"):
+        html_content = root.to_html()
+
+    with phase("template fill"):
+        # Same title as extract_title(markdown), found while parsing.
+        title = metadata.title
+        if title is None:
+            raise Exception("No h1 title found in markdown")
+        return template.render({"Title": title, "Content": html_content}, rewrite_url)
+
+
+def generate_page(
+    from_path,
+    template_path,
+    dest_path,
+    base_path=None,
+    verbose=True,
+    profile=None,
+    stream=None,
+    render_cache=None,
+    metadata=None,
+    assets=None,
+    minify=False,
+    previous_output=None,
+    block_memo=None,
+):
     """
     Generate a full HTML page from a markdown file and an HTML template.
 
     This function:
       * reads markdown content from `from_path`
-      * reads an HTML template from `template_path`
-      * converts the markdown to an HTML string using `markdown_to_html_node().to_html()`
+      * loads the parsed HTML template for `template_path` (cached per process)
+      * converts the markdown to an HTML string using `markdown_to_html_node().to_html()`,
+        rewriting link and image URLs for `base_path`
       * extracts the page title from the markdown using `extract_title()`
-      * replaces the `{{ Title }}` and `{{ Content }}` placeholders in the template
-      * writes the final HTML page to `dest_path`, creating parent directories if needed.
+      * fills the `{{ Title }}` and `{{ Content }}` slots of the template and
+        rewrites its root-relative href/src URLs for `base_path`
+      * writes the final HTML page to `dest_path`, creating parent directories if needed,
+        unless the file already holds exactly that page (see buildio.write_if_changed).
 
     Args:
         from_path: Path to the source markdown file.
         template_path: Path to the HTML template file.
         dest_path: Path where the generated HTML file should be written.
+        base_path: Base URL path prefixed to root-relative href/src attributes.
+        verbose: Print a progress line for the page (disabled in pool workers,
+            where the parent process reports progress in a stable order).
+        profile: Optional profiler.PageProfile that receives per-phase timings.
+        stream: Convert the markdown block by block and write each block's
+            HTML straight into the page instead of building the whole page
+            in memory. None (default) streams files of STREAM_THRESHOLD
+            bytes or more. The output is identical either way.
+        render_cache: Optional render_cache.RenderCache; blocks rendered by
+            a previous build are reused instead of parsed again.
+        metadata: Optional site_index.PageMetadata, filled while the page
+            is parsed.
+        assets: Optional asset table (see urls.UrlRewriter) giving images
+            their intrinsic size and srcset.
+        minify: Render with the minified template (see load_template).
+        previous_output: Fingerprint of the page recorded by the last build
+            (BuildManifest.previous_output), so an unchanged page is
+            detected with a stat() instead of reading it back.
+        block_memo: Optional block_memo.BlockMemo; blocks already rendered
+            by this process, on this page or an earlier one, are reused.
+
+    Returns:
+        tuple[bool, dict]: Whether the page was written and its output
+        fingerprint, for BuildManifest.record
 
     Raises:
         Exception: If `extract_title` cannot find an H1 title in the markdown.
         OSError: If there is an error reading or writing files.
     """
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    if verbose:
+        print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+
+    phase = profile.phase if profile is not None else no_phase
+
+    if stream is None:
+        stream = os.path.getsize(from_path) >= STREAM_THRESHOLD
+    if stream:
+        return _generate_page_streaming(
+            from_path,
+            template_path,
+            dest_path,
+            base_path,
+            profile,
+            render_cache,
+            metadata,
+            assets,
+            minify,
+            previous_output,
+            block_memo,
+        )
+
+    with phase("read"):
+        with open(from_path, "r") as f:
+            markdown = f.read()
 
-    with open(from_path, "r") as f:
-        markdown = f.read()
+        template = load_template(template_path, minify)
 
-    with open(template_path, "r") as f:
-        template = f.read()
+    page = render_page(
+        markdown,
+        template,
+        base_path,
+        profile,
+        render_cache,
+        metadata,
+        assets,
+        block_memo,
+    )
 
-    root = markdown_to_html_node(markdown)
-    html_content = root.to_html()
-    title = extract_title(markdown)
+    with phase("write"):
+        dir_path = os.path.dirname(dest_path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
 
-    page = template.replace("{{ Title }}", title)
-    page = page.replace("{{ Content }}", html_content)
+        return write_if_changed(dest_path, page, previous_output)
 
-    if base_path is None:
-        base_path = "/"
 
-    page = page.replace('href="/', f'href="{base_path}')
-    page = page.replace('src="/', f'src="{base_path}')
+def _generate_page_streaming(
+    from_path,
+    template_path,
+    dest_path,
+    base_path=None,
+    profile=None,
+    render_cache=None,
+    metadata=None,
+    assets=None,
+    minify=False,
+    previous_output=None,
+    block_memo=None,
+):
+    """
+    Streaming variant of generate_page: memory stays flat with document size.
+
+    The markdown is read twice from disk: once up to its H1 title (needed
+    before the content in most templates) and once block by block while
+    the HTML is written between the template's pre- and post-content
+    chunks. The page goes to a temporary file that replaces `dest_path`
+    only when complete and different, so a failure never leaves a
+    half-written page.
+    """
+    phase = profile.phase if profile is not None else no_phase
+
+    with phase("read"):
+        with open(from_path, "r") as f:
+            title = extract_title_from_lines(f)
+        template = load_template(template_path, minify)
+    rewrite_url = UrlRewriter(base_path, assets)
 
     dir_path = os.path.dirname(dest_path)
     if dir_path:
         os.makedirs(dir_path, exist_ok=True)
 
-    with open(dest_path, "w") as f:
-        f.write(page)
+    tmp_path = dest_path + ".tmp"
+    try:
+        with open(from_path, "r") as src, open(tmp_path, "w") as out:
+            content = iter_markdown_html(
+                src, rewrite_url, profile, render_cache, metadata, block_memo
+            )
+            out.writelines(
+                template.iter_render({"Title": title, "Content": content}, rewrite_url)
+            )
+        return replace_if_changed(tmp_path, dest_path, previous_output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def asset_sources(metadata, assets, template_path=None):
+    """
+    Returns the static files behind the assets a page refers to.
+
+    Covers the page's images and links and the URLs of its template. These
+    are recorded as the page's assets in the build manifest, so that
+    changing an image (its size) or a fingerprinted file (its URL)
+    re-renders the pages that inline it.
+    """
+    if not assets:
+        return []
+    urls = [src for _, src in metadata.images] + metadata.links
+    if template_path is not None:
+        urls += load_template(template_path).urls
+    return sorted({assets[url]["source"] for url in urls if url in assets})
+
+
+TEMPLATE_NAME = "template.html"
+
+
+def local_template(dir_path_content, template_path):
+    """
+    Returns the template for pages in a content directory.
+
+    A TEMPLATE_NAME file in the directory overrides the inherited template.
+    """
+    candidate = os.path.join(dir_path_content, TEMPLATE_NAME)
+    if os.path.isfile(candidate):
+        return candidate
+    return template_path
+
+
+def find_template(src_path, dir_path_content, template_path):
+    """
+    Resolves the template of a single page without walking the whole tree.
+
+    Checks the page's directory and its parents up to `dir_path_content`
+    for a TEMPLATE_NAME file; falls back to `template_path`.
+
+    Example:
+        >>> find_template("content/blog/tom/index.md", "content", "template.html")
+        'content/blog/template.html'  # if that file exists
+    """
+    dir_path = os.path.dirname(src_path)
+    root = os.path.normpath(dir_path_content)
+    while True:
+        candidate = os.path.join(dir_path, TEMPLATE_NAME)
+        if os.path.isfile(candidate):
+            return candidate
+        if os.path.normpath(dir_path) == root or not dir_path:
+            return template_path
+        dir_path = os.path.dirname(dir_path)
 
 
 def generate_pages_recursive(
-    dir_path_content, template_path, dest_dir_path, base_path=None
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    base_path=None,
+    manifest=None,
+    *,
+    profiler=None,
+    render_cache=None,
+    site_index=None,
+    assets=None,
+    minify=False,
+    precompress=None,
+    block_memo=None,
 ):
     """
     Recursively generate HTML files from all markdown files in a content directory.
@@ -151,9 +564,27 @@ def generate_pages_recursive(
         dir_path_content (str): Path to the source content directory that contains
             markdown files and/or subdirectories.
         template_path (str): Path to the HTML template file used to wrap the
-            generated HTML content.
+            generated HTML content. A TEMPLATE_NAME file inside a content
+            directory replaces it for that directory and its subdirectories.
         dest_dir_path (str): Path to the destination directory where the generated
             HTML files (and mirrored directory structure) will be written.
+        base_path (str, optional): Base URL path forwarded to generate_page.
+        manifest (BuildManifest, optional): When given, pages whose source,
+            template and base_path are unchanged since the recorded build are
+            skipped, and every generated page is recorded in the manifest's
+            dependency graph.
+        profiler (BuildProfiler, optional): Receives a PageProfile for every
+            generated page.
+        render_cache (RenderCache, optional): Block cache forwarded to
+            generate_page, flushed after every page.
+        site_index (SiteIndex, optional): Receives the metadata of every
+            generated page.
+        assets (dict, optional): Asset table forwarded to generate_page.
+        minify (bool): Forwarded to generate_page.
+        precompress (precompress.Precompressor, optional): Compresses every
+            generated page in the background.
+        block_memo (BlockMemo, optional): In-process block memo forwarded
+            to generate_page.
 
     Behavior:
         - Walks through every entry in dir_path_content.
@@ -163,6 +594,7 @@ def generate_pages_recursive(
           corresponding ".html" file in dest_dir_path using generate_page,
           preserving the directory structure of the content tree.
     """
+    template_path = local_template(dir_path_content, template_path)
     entries = os.listdir(dir_path_content)
 
     for name in entries:
@@ -171,12 +603,465 @@ def generate_pages_recursive(
             new_dest_dir = os.path.join(dest_dir_path, name)
             if not os.path.exists(new_dest_dir):
                 os.mkdir(new_dest_dir)
-            generate_pages_recursive(src_path, template_path, new_dest_dir, base_path)
+            generate_pages_recursive(
+                src_path,
+                template_path,
+                new_dest_dir,
+                base_path,
+                manifest,
+                profiler=profiler,
+                render_cache=render_cache,
+                site_index=site_index,
+                assets=assets,
+                minify=minify,
+                precompress=precompress,
+                block_memo=block_memo,
+            )
         else:
             if name.endswith(".md"):
                 new_name = name.replace(".md", ".html")
                 new_dest_path = os.path.join(dest_dir_path, new_name)
-                generate_page(src_path, template_path, new_dest_path, base_path)
+                if manifest is not None and manifest.is_fresh(
+                    new_dest_path, src_path, template_path, base_path
+                ):
+                    continue
+                profile = profiler.page(src_path) if profiler is not None else None
+                metadata = PageMetadata(title_only=site_index is None and not assets)
+                changed, output = generate_page(
+                    src_path,
+                    template_path,
+                    new_dest_path,
+                    base_path,
+                    profile=profile,
+                    render_cache=render_cache,
+                    metadata=metadata,
+                    assets=assets,
+                    minify=minify,
+                    previous_output=(
+                        manifest.previous_output(new_dest_path)
+                        if manifest is not None
+                        else None
+                    ),
+                    block_memo=block_memo,
+                )
+                if render_cache is not None:
+                    render_cache.flush()
+                if precompress is not None:
+                    precompress.submit(new_dest_path)
+                if site_index is not None:
+                    site_index.add(new_dest_path, src_path, metadata)
+                if manifest is not None:
+                    manifest.record(
+                        new_dest_path,
+                        src_path,
+                        template_path,
+                        base_path,
+                        assets=asset_sources(metadata, assets, template_path),
+                        output=output,
+                        changed=changed,
+                    )
+
+
+def collect_pages(dir_path_content, dest_dir_path):
+    """
+    Lists every markdown page in a content tree with its output path.
+
+    Args:
+        dir_path_content (str): Path to the source content directory.
+        dest_dir_path (str): Path to the destination directory.
+
+    Returns:
+        list[tuple[str, str]]: (markdown path, html path) pairs, sorted by
+        markdown path so that builds are reproducible.
+    """
+    return [
+        (src_path, dest_path)
+        for src_path, dest_path, _ in collect_page_jobs(
+            dir_path_content, dest_dir_path, None
+        )
+    ]
+
+
+def collect_page_jobs(dir_path_content, dest_dir_path, template_path):
+    """
+    Like collect_pages, but also resolves each page's template.
+
+    Returns:
+        list[tuple[str, str, str]]: (markdown path, html path, template
+        path) triples, sorted by markdown path
+    """
+    template_path = local_template(dir_path_content, template_path)
+    pages = []
+    for name in sorted(os.listdir(dir_path_content)):
+        src_path = os.path.join(dir_path_content, name)
+        if not os.path.isfile(src_path):
+            pages.extend(
+                collect_page_jobs(
+                    src_path, os.path.join(dest_dir_path, name), template_path
+                )
+            )
+        elif name.endswith(".md"):
+            new_name = name.replace(".md", ".html")
+            pages.append(
+                (src_path, os.path.join(dest_dir_path, new_name), template_path)
+            )
+    return pages
+
+
+def _generate_page_job(
+    job,
+    base_path,
+    profiling=False,
+    render_cache_path=None,
+    assets=None,
+    minify=False,
+    block_memo_size=None,
+    title_only=False,
+):
+    """
+    Process pool worker: renders one page.
+
+    Exceptions are returned as a string instead of raised so that one broken
+    page does not abort the pool and every error can be reported in page
+    order.
+
+    Args:
+        job (tuple[str, str, str, dict | None]): (markdown path, html path,
+            template path, fingerprint of the previous output)
+        block_memo_size (int, optional): Size of the worker's block memo
+            (BlockMemo.for_process); None renders without one
+        title_only (bool): Collect only the page title (PageMetadata)
+
+    Returns:
+        tuple: (error message or None, PageProfile or None,
+        (cache hits, cache misses), PageMetadata or None,
+        (written, output fingerprint) or None, (memo hits, memo misses))
+    """
+    src_path, dest_path, template_path, previous_output = job
+    profile = PageProfile(src_path) if profiling else None
+    cache = None
+    hits = misses = 0
+    if render_cache_path is not None:
+        cache = RenderCache.for_process(render_cache_path)
+        hits, misses = cache.hits, cache.misses
+    memo = None
+    memo_hits = memo_misses = 0
+    if block_memo_size is not None:
+        memo = BlockMemo.for_process(block_memo_size)
+        memo_hits, memo_misses = memo.hits, memo.misses
+    metadata = PageMetadata(title_only=title_only)
+    try:
+        output = generate_page(
+            src_path,
+            template_path,
+            dest_path,
+            base_path,
+            verbose=False,
+            profile=profile,
+            render_cache=cache,
+            metadata=metadata,
+            assets=assets,
+            minify=minify,
+            previous_output=previous_output,
+            block_memo=memo,
+        )
+        if cache is not None:
+            cache.flush()
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", None, (0, 0), None, None, (0, 0)
+    if cache is not None:
+        hits, misses = cache.hits - hits, cache.misses - misses
+    if memo is not None:
+        memo_hits, memo_misses = memo.hits - memo_hits, memo.misses - memo_misses
+    return None, profile, (hits, misses), metadata, output, (memo_hits, memo_misses)
+
+
+def generate_pages_parallel(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    base_path=None,
+    manifest=None,
+    *,
+    jobs=None,
+    profiler=None,
+    render_cache=None,
+    pages=None,
+    site_index=None,
+    assets=None,
+    minify=False,
+    precompress=None,
+    block_memo=None,
+):
+    """
+    Generate HTML files for a content tree using a pool of worker processes.
+
+    Produces the same files as generate_pages_recursive. Every markdown file
+    is collected up front, then rendered by a concurrent.futures process
+    pool. Progress lines and errors are reported in sorted page order, no
+    matter which worker finishes first.
+
+    Args:
+        dir_path_content (str): Path to the source content directory.
+        template_path (str): Path to the HTML template file.
+        dest_dir_path (str): Path to the destination directory.
+        base_path (str, optional): Base URL path forwarded to generate_page.
+        manifest (BuildManifest, optional): Skip pages that are up to date
+            and record the pages that were generated.
+        jobs (int, optional): Number of worker processes. Defaults to
+            os.cpu_count().
+        profiler (BuildProfiler, optional): Receives the PageProfile that
+            each worker recorded.
+        render_cache (RenderCache, optional): Each worker opens the same
+            cache file; hit and miss counts are added to this instance.
+        pages (list[tuple[str, str, str]], optional): Build only these
+            (markdown, html, template) jobs instead of every page from
+            collect_page_jobs (used by sharded builds).
+        site_index (SiteIndex, optional): Receives the metadata that each
+            worker collected.
+        assets (dict, optional): Asset table forwarded to generate_page.
+        minify (bool): Forwarded to generate_page.
+        precompress (precompress.Precompressor, optional): Compresses each
+            finished page while the workers render the next ones.
+        block_memo (BlockMemo, optional): Each worker keeps its own memo of
+            the same size; hit and miss counts are added to this instance.
+
+    Raises:
+        Exception: If any page failed. All failures are printed first; pages
+            that succeeded are still written and recorded.
+    """
+    if pages is None:
+        pages = collect_page_jobs(dir_path_content, dest_dir_path, template_path)
+
+    pending = []
+    for src_path, dest_path, page_template in pages:
+        previous_output = None
+        if manifest is not None:
+            if manifest.is_fresh(dest_path, src_path, page_template, base_path):
+                continue
+            previous_output = manifest.previous_output(dest_path)
+        pending.append((src_path, dest_path, page_template, previous_output))
+
+    if not pending:
+        return
+
+    workers = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(pending) // (workers * 8))
+    if isinstance(assets, AssetTable):
+        # Hashed once here; the digest is pickled along with the table.
+        assets.digest()
+
+    failures = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        job = functools.partial(
+            _generate_page_job,
+            base_path=base_path,
+            profiling=profiler is not None,
+            render_cache_path=render_cache.path if render_cache else None,
+            assets=assets,
+            minify=minify,
+            block_memo_size=(
+                block_memo.max_entries if block_memo is not None else None
+            ),
+            title_only=site_index is None and not assets,
+        )
+        results = pool.map(job, pending, chunksize=chunksize)
+        for (src_path, dest_path, page_template, _), result in zip(pending, results):
+            error, profile, cache_stats, metadata, output, memo_stats = result
+            if render_cache is not None:
+                render_cache.hits += cache_stats[0]
+                render_cache.misses += cache_stats[1]
+            if block_memo is not None:
+                block_memo.hits += memo_stats[0]
+                block_memo.misses += memo_stats[1]
+            if error is not None:
+                failures.append((src_path, error))
+                continue
+            print(
+                f"Generating page from {src_path} to {dest_path} using {page_template}"
+            )
+            if profile is not None:
+                profiler.add(profile)
+            if precompress is not None:
+                precompress.submit(dest_path)
+            if site_index is not None:
+                site_index.add(dest_path, src_path, metadata)
+            if manifest is not None:
+                manifest.record(
+                    dest_path,
+                    src_path,
+                    page_template,
+                    base_path,
+                    assets=asset_sources(metadata, assets, page_template),
+                    output=output[1],
+                    changed=output[0],
+                )
+
+    for src_path, error in failures:
+        print(f"Failed to generate page from {src_path}: {error}")
+    if failures:
+        raise Exception(f"{len(failures)} page(s) failed to generate")
+
+
+def _read_source(path):
+    """Reads a markdown source, or returns None if it should be streamed."""
+    if os.path.getsize(path) >= STREAM_THRESHOLD:
+        return None
+    return read_text(path)
+
+
+def generate_pages_buffered(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    base_path=None,
+    manifest=None,
+    *,
+    profiler=None,
+    render_cache=None,
+    io_workers=DEFAULT_IO_WORKERS,
+    pages=None,
+    site_index=None,
+    assets=None,
+    minify=False,
+    precompress=None,
+    block_memo=None,
+):
+    """
+    Generate HTML files for a content tree, overlapping rendering with I/O.
+
+    Produces the same files as generate_pages_recursive. Pages are rendered
+    one by one in this process while a buildio.BuildIO thread pool reads the
+    upcoming markdown sources and writes finished pages in the background,
+    which hides per-file latency on slow (e.g. network mounted) volumes.
+    Sources of STREAM_THRESHOLD bytes or more are streamed by generate_page
+    as usual.
+
+    Args:
+        dir_path_content (str): Path to the source content directory.
+        template_path (str): Path to the HTML template file.
+        dest_dir_path (str): Path to the destination directory.
+        base_path (str, optional): Base URL path forwarded to render_page.
+        manifest (BuildManifest, optional): Skip pages that are up to date
+            and record the pages that were written.
+        profiler (BuildProfiler, optional): Collects per-page timings.
+        render_cache (RenderCache, optional): Reuses rendered blocks; new
+            fragments are flushed after every page.
+        io_workers (int): Number of I/O threads.
+        pages (list[tuple[str, str, str]], optional): Build only these
+            (markdown, html, template) jobs, as in generate_pages_parallel.
+        site_index (SiteIndex, optional): Receives the metadata of every
+            page that was written.
+        assets (dict, optional): Asset table forwarded to render_page.
+        minify (bool): Render with the minified template.
+        precompress (precompress.Precompressor, optional): Compresses each
+            page from memory while it is being written.
+        block_memo (BlockMemo, optional): Shares repeated blocks between
+            pages.
+
+    Raises:
+        Exception: If any page failed. All failures are printed first; pages
+            that succeeded are still written and recorded.
+    """
+    if pages is None:
+        pages = collect_page_jobs(dir_path_content, dest_dir_path, template_path)
+
+    pending = {}
+    for src_path, dest_path, page_template in pages:
+        if manifest is not None and manifest.is_fresh(
+            dest_path, src_path, page_template, base_path
+        ):
+            continue
+        pending[src_path] = (dest_path, page_template)
+
+    if not pending:
+        return
+
+    failures = []
+    written = []
+    with BuildIO(io_workers) as io:
+        for src_path, source in io.prefetch(pending, _read_source):
+            dest_path, page_template = pending[src_path]
+            print(
+                f"Generating page from {src_path} to {dest_path} using {page_template}"
+            )
+            profile = PageProfile(src_path) if profiler is not None else None
+            phase = profile.phase if profile is not None else no_phase
+            metadata = PageMetadata(title_only=site_index is None and not assets)
+            previous_output = (
+                manifest.previous_output(dest_path) if manifest is not None else None
+            )
+            try:
+                with phase("read"):
+                    markdown = source.result()
+                    template = load_template(page_template, minify)
+                if markdown is None:
+                    io.outputs[dest_path] = generate_page(
+                        src_path,
+                        page_template,
+                        dest_path,
+                        base_path,
+                        verbose=False,
+                        profile=profile,
+                        stream=True,
+                        render_cache=render_cache,
+                        metadata=metadata,
+                        assets=assets,
+                        minify=minify,
+                        previous_output=previous_output,
+                        block_memo=block_memo,
+                    )
+                    if precompress is not None:
+                        precompress.submit(dest_path)
+                else:
+                    page = render_page(
+                        markdown,
+                        template,
+                        base_path,
+                        profile,
+                        render_cache,
+                        metadata,
+                        assets,
+                        block_memo,
+                    )
+                    with phase("write"):
+                        io.write(dest_path, page, previous_output)
+                    if precompress is not None:
+                        precompress.submit(dest_path, page)
+            except Exception as e:
+                failures.append((src_path, e))
+                continue
+            finally:
+                if render_cache is not None:
+                    render_cache.flush()
+            if profile is not None:
+                profiler.add(profile)
+            written.append((src_path, dest_path, page_template, metadata))
+
+        failed_writes = dict(io.flush())
+
+    for src_path, dest_path, page_template, metadata in written:
+        if dest_path in failed_writes:
+            failures.append((src_path, failed_writes[dest_path]))
+            continue
+        if site_index is not None:
+            site_index.add(dest_path, src_path, metadata)
+        if manifest is not None:
+            changed, output = io.outputs[dest_path]
+            manifest.record(
+                dest_path,
+                src_path,
+                page_template,
+                base_path,
+                assets=asset_sources(metadata, assets, page_template),
+                output=output,
+                changed=changed,
+            )
+
+    for src_path, error in failures:
+        print(f"Failed to generate page from {src_path}: {error}")
+    if failures:
+        raise Exception(f"{len(failures)} page(s) failed to generate")
 
 
 # if __name__ == "__main__":
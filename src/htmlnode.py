@@ -9,8 +9,14 @@ class HTMLNode:
         value (str): Text value
         children (list): Child nodes
         props (dict): HTML attributes
+
+    Note:
+        HTMLNode and its subclasses use __slots__ so that big trees do not
+        carry a __dict__ per node.
     """
 
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None) -> None:
         self.tag = tag
         self.value = value
@@ -21,6 +27,60 @@ class HTMLNode:
         """Must be overridden by subclasses."""
         raise NotImplementedError("Subclasses of HTMLNode must implement to_html()")
 
+    def html_parts(self):
+        """
+        Splits this node into the pieces needed to serialize it.
+
+        Returns:
+            tuple: (opening, children, closing) where opening and closing are
+            strings and children is a list of child nodes (empty for leaves).
+
+        Must be overridden by subclasses.
+        """
+        raise NotImplementedError("Subclasses of HTMLNode must implement html_parts()")
+
+    def iter_html(self):
+        """
+        Yields the HTML of this node and its descendants as string fragments.
+
+        Walks the tree with an explicit stack instead of recursion, so deep
+        trees cannot hit the recursion limit and no intermediate string is
+        built per subtree. "".join(node.iter_html()) equals node.to_html().
+
+        Yields:
+            str: Consecutive fragments of the HTML output
+
+        Raises:
+            ValueError: If a node in the tree is invalid (see to_html)
+        """
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                yield item
+                continue
+
+            opening, children, closing = item.html_parts()
+            yield opening
+            if children:
+                stack.append(closing)
+                stack.extend(reversed(children))
+            elif closing:
+                yield closing
+
+    def write_html(self, fp):
+        """
+        Streams the HTML of this node and its descendants into a file.
+
+        Args:
+            fp: Text file object (anything with writelines())
+
+        Example:
+            >>> with open("page.html", "w") as f:
+            ...     root.write_html(f)
+        """
+        fp.writelines(self.iter_html())
+
     def props_to_html(self) -> str:
         """
         Converts props dict to HTML attributes string.
@@ -60,6 +120,8 @@ class LeafNode(HTMLNode):
         'Text'
     """
 
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None) -> None:
         super().__init__(tag=tag, value=value, children=None, props=props)
 
@@ -85,6 +147,10 @@ class LeafNode(HTMLNode):
 
         return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
 
+    def html_parts(self):
+        """Returns the whole leaf as the opening part; leaves have no children."""
+        return self.to_html(), (), ""
+
 
 class ParentNode(HTMLNode):
     """
@@ -101,6 +167,8 @@ class ParentNode(HTMLNode):
         '<div><p>Text</p></div>'
     """
 
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None) -> None:
         super().__init__(tag=tag, value=None, children=children, props=props)
 
@@ -115,7 +183,17 @@ class ParentNode(HTMLNode):
             ValueError: If tag or children are missing
 
         Note:
-            Recursively calls to_html() on all children.
+            Joins the fragments produced by iter_html(), which walks the
+            tree iteratively.
+        """
+        return "".join(self.iter_html())
+
+    def html_parts(self):
+        """
+        Returns the opening tag, children and closing tag of this node.
+
+        Raises:
+            ValueError: If tag or children are missing
         """
         if not self.tag or self.tag == "":
             raise ValueError("Must have tag")
@@ -123,10 +201,5 @@ class ParentNode(HTMLNode):
         if not self.children:
             raise ValueError("Must have children value")
 
-        children_html = ""
-        for child in self.children:
-            child_html = child.to_html()
-            children_html += child_html
         prop_str = self.props_to_html()
-
-        return f"<{self.tag}{prop_str}>{children_html}</{self.tag}>"
+        return f"<{self.tag}{prop_str}>", self.children, f"</{self.tag}>"
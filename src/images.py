@@ -0,0 +1,673 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate, pairwise
+from operator import add, floordiv, itemgetter, sub
+
+from assets import fingerprinted_path
+from manifest import hash_file
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+IMAGE_CACHE_DIR = os.path.join(".ssg-cache", "images")
+IMAGE_WIDTHS = (480, 960)
+PIPELINE_VERSION = 1
+
+# Ancillary chunks that change how the image looks. Everything else (text,
+# timestamps, physical size, EXIF, ...) is stripped. sBIT, bKGD and hIST
+# depend on the color type, which optimize_png may change, so they go too.
+_KEPT_CHUNKS = {b"gAMA", b"cHRM", b"sRGB", b"iCCP"}
+
+_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+_COLOR_TYPES = {1: 0, 3: 2, 2: 4, 4: 6}
+
+# Distance of a filtered byte from 0, read as a signed value: the usual
+# "minimum sum of absolute differences" filter heuristic.
+_ABS = bytes(min(b, 256 - b) for b in range(256))
+
+_STRATEGIES = (0, 1, 2, "adaptive")
+
+# <key>.png, <key>-<width>w.png and <key>.json in the cache directory.
+_CACHED_NAME = re.compile(r"^([0-9a-f]{64})(?:-\d+w)?\.(?:png|json)$")
+
+
+def read_chunks(data):
+    """
+    Splits a PNG file into its chunks.
+
+    Returns:
+        list[tuple[bytes, bytes]]: (chunk type, payload) pairs in file order
+
+    Raises:
+        Exception: If `data` is not a complete PNG file
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        raise Exception("Not a PNG image")
+    chunks = []
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack(">I4s", data[pos : pos + 8])
+        end = pos + 8 + length
+        if end + 4 > len(data):
+            break
+        chunks.append((chunk_type, data[pos + 8 : end]))
+        pos = end + 4
+        if chunk_type == b"IEND":
+            return chunks
+    raise Exception("Truncated PNG image")
+
+
+def png_size(data):
+    """
+    Returns the intrinsic (width, height) of a PNG image.
+
+    Example:
+        >>> png_size(open("static/images/tom.png", "rb").read())
+        (928, 468)
+    """
+    chunk_type, payload = read_chunks(data)[0]
+    if chunk_type != b"IHDR":
+        raise Exception("PNG image does not start with IHDR")
+    return struct.unpack(">II", payload[:8])
+
+
+def _chunk(chunk_type, payload):
+    return (
+        struct.pack(">I", len(payload))
+        + chunk_type
+        + payload
+        + struct.pack(">I", zlib.crc32(chunk_type + payload))
+    )
+
+
+def _assemble(ihdr, chunks, idat):
+    parts = [PNG_SIGNATURE, _chunk(b"IHDR", ihdr)]
+    parts.extend(_chunk(chunk_type, payload) for chunk_type, payload in chunks)
+    parts.append(_chunk(b"IDAT", idat))
+    parts.append(_chunk(b"IEND", b""))
+    return b"".join(parts)
+
+
+# Filtering works on whole rows at once: a row is read as one big integer
+# and the bytewise additions and subtractions of the PNG filters are done
+# with SIMD-within-a-register arithmetic, carrying nothing across bytes.
+# Only Average and Paeth, whose predictor depends on the byte just
+# reconstructed, fall back to a Python loop.
+
+
+def _masks(length):
+    return int.from_bytes(b"\x7f" * length, "big"), int.from_bytes(
+        b"\x80" * length, "big"
+    )
+
+
+def _add_bytes(a, b, low, high):
+    return ((a & low) + (b & low)) ^ ((a ^ b) & high)
+
+
+def _sub_bytes(a, b, low, high):
+    return ((a | high) - (b & low)) ^ ((a ^ ~b) & high)
+
+
+def _unfilter(raw, width, height, bpp):
+    """Reverses the per-row filters of decompressed 8-bit image data."""
+    stride = width * bpp
+    low, high = _masks(stride)
+    rows = []
+    prev = bytes(stride)
+    pos = 0
+    for _ in range(height):
+        filter_type = raw[pos]
+        line = raw[pos + 1 : pos + 1 + stride]
+        pos += stride + 1
+        if filter_type == 0:
+            row = line
+        elif filter_type == 1:
+            # Prefix sum per channel in log2(width) steps.
+            value = int.from_bytes(line, "big")
+            shift = 8 * bpp
+            while shift < 8 * stride:
+                value = _add_bytes(value, value >> shift, low, high)
+                shift *= 2
+            row = value.to_bytes(stride, "big")
+        elif filter_type == 2:
+            value = _add_bytes(
+                int.from_bytes(line, "big"), int.from_bytes(prev, "big"), low, high
+            )
+            row = value.to_bytes(stride, "big")
+        elif filter_type in (3, 4):
+            out = bytearray(line)
+            for i in range(stride):
+                left = out[i - bpp] if i >= bpp else 0
+                up = prev[i]
+                if filter_type == 3:
+                    out[i] = (out[i] + ((left + up) >> 1)) & 0xFF
+                    continue
+                up_left = prev[i - bpp] if i >= bpp else 0
+                p = left + up - up_left
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - up_left)
+                if pa <= pb and pa <= pc:
+                    predictor = left
+                elif pb <= pc:
+                    predictor = up
+                else:
+                    predictor = up_left
+                out[i] = (out[i] + predictor) & 0xFF
+            row = bytes(out)
+        else:
+            raise Exception(f"Invalid PNG filter type {filter_type}")
+        rows.append(row)
+        prev = row
+    return rows
+
+
+def _filter(rows, bpp, strategy):
+    """
+    Filters rows for compression.
+
+    `strategy` is a PNG filter type applied to every row (0 None, 1 Sub,
+    2 Up) or "adaptive", which picks per row the filter with the smallest
+    sum of absolute values.
+    """
+    stride = len(rows[0])
+    low, high = _masks(stride)
+    prev = 0
+    out = []
+    for row in rows:
+        value = int.from_bytes(row, "big")
+        candidates = []
+        if strategy in (0, "adaptive"):
+            candidates.append((0, row))
+        if strategy in (1, "adaptive"):
+            sub = _sub_bytes(value, value >> (8 * bpp), low, high)
+            candidates.append((1, sub.to_bytes(stride, "big")))
+        if strategy in (2, "adaptive"):
+            candidates.append(
+                (2, _sub_bytes(value, prev, low, high).to_bytes(stride, "big"))
+            )
+        filter_type, filtered = min(
+            candidates, key=lambda candidate: sum(candidate[1].translate(_ABS))
+        )
+        out.append(bytes((filter_type,)))
+        out.append(filtered)
+        prev = value
+    return b"".join(out)
+
+
+def _compress(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9)
+    return compressor.compress(data) + compressor.flush()
+
+
+class PngImage:
+    """
+    Decoded 8-bit image: `channels` bytes per pixel (1 gray, 2 gray+alpha,
+    3 RGB, 4 RGBA), one bytes object per row.
+    """
+
+    __slots__ = ("width", "height", "channels", "rows")
+
+    def __init__(self, width, height, channels, rows) -> None:
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.rows = rows
+
+
+def decode_png(data, chunks=None):
+    """
+    Decodes a non-interlaced PNG with 8 bits per sample.
+
+    Palette images are expanded to RGB or RGBA.
+
+    Returns:
+        PngImage | None: None for formats this module does not decode
+        (other bit depths, interlacing, color-key transparency)
+    """
+    if chunks is None:
+        chunks = read_chunks(data)
+    ihdr = chunks[0][1]
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack(
+        ">IIBBBBB", ihdr
+    )
+    found = {chunk_type: payload for chunk_type, payload in chunks}
+    if bit_depth != 8 or interlace or color_type not in (0, 2, 3, 4, 6):
+        return None
+    if b"tRNS" in found and color_type != 3:
+        return None
+
+    raw = zlib.decompress(
+        b"".join(payload for chunk_type, payload in chunks if chunk_type == b"IDAT")
+    )
+    bpp = 1 if color_type == 3 else _CHANNELS[color_type]
+    rows = _unfilter(raw, width, height, bpp)
+    if color_type != 3:
+        return PngImage(width, height, bpp, rows)
+
+    palette = found[b"PLTE"]
+    alphas = found.get(b"tRNS", b"")
+    channels = 4 if alphas else 3
+    colors = []
+    for index in range(256):
+        color = palette[3 * index : 3 * index + 3].ljust(3, b"\0")
+        if alphas:
+            color += alphas[index : index + 1] or b"\xff"
+        colors.append(color)
+    rows = [b"".join(map(colors.__getitem__, row)) for row in rows]
+    return PngImage(width, height, channels, rows)
+
+
+def _drop_opaque_alpha(image):
+    """Returns `image` without its alpha channel if every pixel is opaque."""
+    if image.channels not in (2, 4):
+        return image
+    step = image.channels
+    for row in image.rows:
+        if row[step - 1 :: step].count(255) != image.width:
+            return image
+    rows = []
+    for row in image.rows:
+        row = bytearray(row)
+        del row[step - 1 :: step]
+        rows.append(bytes(row))
+    return PngImage(image.width, image.height, step - 1, rows)
+
+
+def _palette_colors(image):
+    """Returns the colors of an RGB or RGBA image if it has at most 256."""
+    step = image.channels
+    if step not in (3, 4):
+        return None
+    colors = set()
+    for row in image.rows:
+        colors.update(row[i : i + step] for i in range(0, len(row), step))
+        if len(colors) > 256:
+            return None
+    return colors
+
+
+def _to_palette(image):
+    """
+    Converts an RGB or RGBA image with at most 256 colors to palette form.
+
+    Returns:
+        tuple | None: (index rows, PLTE payload, tRNS payload) or None
+    """
+    colors = _palette_colors(image)
+    if colors is None:
+        return None
+    step = image.channels
+
+    # Translucent colors first, so tRNS can stop at the last of them.
+    ordered = sorted(
+        colors, key=lambda color: (color[3:] == b"\xff"[: step - 3], color)
+    )
+    index = {color: i for i, color in enumerate(ordered)}
+    rows = [
+        bytes(index[row[i : i + step]] for i in range(0, len(row), step))
+        for row in image.rows
+    ]
+    palette = b"".join(color[:3] for color in ordered)
+    alphas = b"".join(color[3:] for color in ordered).rstrip(b"\xff")
+    return rows, palette, alphas
+
+
+def encode_png(image, chunks=()):
+    """
+    Encodes a PngImage as small as this module can, losslessly.
+
+    An all-opaque alpha channel is dropped, images with at most 256 colors
+    are stored as a palette, and the rows are compressed with each filter
+    strategy of _filter at zlib level 9, keeping the smallest result.
+
+    Args:
+        image (PngImage): Image to encode
+        chunks (iterable[tuple[bytes, bytes]]): Ancillary chunks to keep,
+            written before the image data
+
+    Returns:
+        bytes: The PNG file
+    """
+    image = _drop_opaque_alpha(image)
+    chunks = list(chunks)
+    rows = image.rows
+    bpp = image.channels
+    color_type = _COLOR_TYPES[bpp]
+    palette = _to_palette(image)
+    if palette is not None:
+        rows, plte, alphas = palette
+        bpp = 1
+        color_type = 3
+        chunks.append((b"PLTE", plte))
+        if alphas:
+            chunks.append((b"tRNS", alphas))
+
+    # zlib releases the GIL, so the strategies compress in parallel.
+    with ThreadPoolExecutor(len(_STRATEGIES)) as pool:
+        filtered = [_filter(rows, bpp, strategy) for strategy in _STRATEGIES]
+        idat = min(pool.map(_compress, filtered), key=len)
+    ihdr = struct.pack(">IIBBBBB", image.width, image.height, 8, color_type, 0, 0, 0)
+    return _assemble(ihdr, chunks, idat)
+
+
+def resize_image(image, width, smooth=True):
+    """
+    Scales an image down to `width` pixels, keeping its aspect ratio.
+
+    With `smooth`, every output pixel is the average of the source pixels
+    it covers (a box filter), computed from per-row prefix sums. Otherwise
+    the pixel at the center of that area is taken, which keeps the image's
+    colors, so a palette image stays one.
+    """
+    height = max(1, round(image.height * width / image.width))
+    step = image.channels
+    xs = [x * image.width // width for x in range(width + 1)]
+    ys = [y * image.height // height for y in range(height + 1)]
+    if not smooth:
+        pick = itemgetter(
+            *(
+                (x0 + x1) // 2 * step + channel
+                for x0, x1 in pairwise(xs)
+                for channel in range(step)
+            )
+        )
+        rows = [bytes(pick(image.rows[(y0 + y1) // 2])) for y0, y1 in pairwise(ys)]
+        return PngImage(width, height, step, rows)
+
+    starts = itemgetter(*xs[:-1])
+    ends = itemgetter(*xs[1:])
+    spans = [x1 - x0 for x0, x1 in pairwise(xs) for _ in range(step)]
+
+    sums = []
+    for row in image.rows:
+        out = [0] * (width * step)
+        for channel in range(step):
+            prefix = [0, *accumulate(row[channel::step])]
+            out[channel::step] = map(sub, ends(prefix), starts(prefix))
+        sums.append(out)
+
+    rows = []
+    areas = {}
+    for y0, y1 in pairwise(ys):
+        if y1 - y0 not in areas:
+            area = [span * (y1 - y0) for span in spans]
+            areas[y1 - y0] = (area, [a // 2 for a in area])
+        area, rounding = areas[y1 - y0]
+        total = sums[y0]
+        for row in sums[y0 + 1 : y1]:
+            total = map(add, total, row)
+        rows.append(bytes(map(floordiv, map(add, total, rounding), area)))
+    return PngImage(width, height, step, rows)
+
+
+def optimize_png(data, widths=(), decode=True):
+    """
+    Re-encodes a PNG losslessly and makes scaled-down copies of it.
+
+    Metadata chunks are stripped (see _KEPT_CHUNKS) and the image data is
+    recompressed by encode_png. The original file is kept if nothing
+    comes out smaller. Formats that decode_png does not handle only have
+    their chunks stripped and their data recompressed as is, and get no
+    variants.
+
+    Args:
+        data (bytes): PNG file
+        widths (iterable[int]): Widths of the variants to make. Widths not
+            smaller than the image, and variants whose file would not be
+            smaller than the optimized image, are skipped. Images with at
+            most 256 colors are scaled without smoothing so their variants
+            keep the palette.
+        decode (bool): Decode the image to re-encode and resize it. Without
+            it, only the chunks are stripped and the data recompressed as
+            is, which takes a fraction of the time, and there are no
+            variants.
+
+    Returns:
+        tuple[bytes, int, int, dict[int, bytes]]: (optimized PNG, width,
+        height, {variant width: PNG})
+    """
+    chunks = read_chunks(data)
+    ihdr = chunks[0][1]
+    width, height = struct.unpack(">II", ihdr[:8])
+    kept = [chunk for chunk in chunks if chunk[0] in _KEPT_CHUNKS]
+
+    raw = b"".join(payload for chunk_type, payload in chunks if chunk_type == b"IDAT")
+    critical = [chunk for chunk in chunks if chunk[0] in (b"PLTE", b"tRNS")]
+    candidates = [
+        data,
+        _assemble(ihdr, kept + critical, _compress(zlib.decompress(raw))),
+    ]
+
+    variants = {}
+    image = decode_png(data, chunks) if decode else None
+    if image is not None:
+        candidates.append(encode_png(image, kept))
+    optimized = min(candidates, key=len)
+
+    if image is not None:
+        image = _drop_opaque_alpha(image)
+        smooth = _palette_colors(image) is None
+        for variant_width in sorted(set(widths)):
+            if variant_width >= width:
+                continue
+            variant = encode_png(resize_image(image, variant_width, smooth), kept)
+            if len(variant) < len(optimized):
+                variants[variant_width] = variant
+    return optimized, width, height, variants
+
+
+def _variant_path(path, width):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}-{width}w{ext}"
+
+
+class ImagePipeline:
+    """
+    Optimizes the PNG files of static/ on their way into the output directory.
+
+    sync_directory_contents hands every file that handles() accepts to
+    place() instead of copying it. By default the image only has its
+    metadata stripped and its data recompressed (optimize_png without
+    decoding). With `optimize`, it is decoded and re-encoded, and
+    scaled-down variants are written next to it as NAME-<width>w.png.
+    Either way its asset entry (intrinsic size and srcset) is returned for
+    urls.UrlRewriter, which adds width, height, srcset and loading="lazy"
+    to the <img> tags of pages.
+
+    Results are cached in `cache_dir` by a hash of the file's content and
+    the pipeline settings, so an image is only ever processed once. An
+    index of source size, mtime and content hash avoids even hashing
+    unchanged files.
+    save() evicts the cached files of sources that no longer exist or
+    have changed since.
+
+    Args:
+        cache_dir (str): Cache directory
+        widths (iterable[int]): Widths of the srcset variants
+        optimize (bool): Decode, re-encode and resize images (slow: the
+            filters and scaling run in pure Python)
+    """
+
+    def __init__(
+        self, cache_dir=IMAGE_CACHE_DIR, widths=IMAGE_WIDTHS, optimize=False
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.optimize = optimize
+        self.widths = tuple(sorted(set(widths))) if optimize else ()
+        self.processed = 0
+        self.reused = 0
+        self._index_path = os.path.join(cache_dir, "index.json")
+        try:
+            with open(self._index_path) as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+
+    def handles(self, path):
+        return path.lower().endswith(".png")
+
+    def _key(self, src_path, st):
+        entry = self._index.get(src_path)
+        if (
+            entry is None
+            or "hash" not in entry
+            or entry["size"] != st.st_size
+            or entry["mtime_ns"] != st.st_mtime_ns
+        ):
+            entry = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "hash": hash_file(src_path),
+            }
+        settings = f"png\0{PIPELINE_VERSION}\0{self.optimize}\0{self.widths}\0"
+        entry["key"] = hashlib.sha256((settings + entry["hash"]).encode()).hexdigest()
+        self._index[src_path] = entry
+        return entry["key"]
+
+    def process(self, src_path):
+        """
+        Optimizes one image, or loads the result of an earlier build.
+
+        Returns:
+            dict: {"key", "width", "height", "variants": [widths]}; the
+            files are <key>.png and <key>-<width>w.png in the cache
+        """
+        key = self._key(src_path, os.stat(src_path))
+        info_path = os.path.join(self.cache_dir, key + ".json")
+        try:
+            with open(info_path) as f:
+                info = json.load(f)
+            self.reused += 1
+            return info
+        except (OSError, ValueError):
+            pass
+
+        with open(src_path, "rb") as f:
+            data, width, height, variants = optimize_png(
+                f.read(), self.widths, self.optimize
+            )
+        os.makedirs(self.cache_dir, exist_ok=True)
+        files = {os.path.join(self.cache_dir, key + ".png"): data}
+        for variant_width, variant in variants.items():
+            path = os.path.join(self.cache_dir, f"{key}-{variant_width}w.png")
+            files[path] = variant
+        for path, content in files.items():
+            with open(path, "wb") as f:
+                f.write(content)
+
+        info = {
+            "key": key,
+            "width": width,
+            "height": height,
+            "variants": sorted(variants),
+        }
+        tmp_path = f"{info_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(info, f)
+        os.replace(tmp_path, info_path)
+        self.processed += 1
+        return info
+
+    def describe(self, src_path, rel_path, fingerprint=False):
+        """
+        Returns the asset entry of an image without writing it anywhere.
+
+        With `fingerprint`, every output is named after a hash of its
+        content (see assets.fingerprinted_path) and the entry gets the
+        hashed "url" of the image.
+
+        Returns:
+            tuple[str, dict, list[str]]: (root-relative URL, entry, relative
+            output paths)
+        """
+        info = self.process(src_path)
+        return self._describe(info, src_path, rel_path, fingerprint)
+
+    def _cached_names(self, info):
+        key = info["key"]
+        return [key + ".png"] + [f"{key}-{width}w.png" for width in info["variants"]]
+
+    def _describe(self, info, src_path, rel_path, fingerprint=False):
+        rel_path = rel_path.replace(os.sep, "/")
+        url = "/" + rel_path
+        outputs = [rel_path]
+        outputs += [_variant_path(rel_path, width) for width in info["variants"]]
+        if fingerprint:
+            outputs = [
+                fingerprinted_path(
+                    output, hash_file(os.path.join(self.cache_dir, name))
+                )
+                for output, name in zip(outputs, self._cached_names(info))
+            ]
+        srcset = [
+            ["/" + output, width]
+            for output, width in zip(outputs[1:], info["variants"])
+        ]
+        srcset.append(["/" + outputs[0], info["width"]])
+        entry = {
+            "source": src_path,
+            "width": info["width"],
+            "height": info["height"],
+            "srcset": srcset,
+        }
+        if fingerprint:
+            entry["url"] = "/" + outputs[0]
+        return url, entry, outputs
+
+    def place(self, src_path, dest_dir, rel_path, fingerprint=False):
+        """
+        Writes an optimized image and its variants into `dest_dir`.
+
+        Outputs whose size and mtime already match the cached files are
+        left alone.
+
+        Returns:
+            tuple[str, dict, list[str], int]: describe()'s result and the
+            number of files written
+        """
+        info = self.process(src_path)
+        url, entry, outputs = self._describe(info, src_path, rel_path, fingerprint)
+        written = 0
+        for output, name in zip(outputs, self._cached_names(info)):
+            cache_path = os.path.join(self.cache_dir, name)
+            dest_path = os.path.join(dest_dir, output)
+            cache_stat = os.stat(cache_path)
+            try:
+                dest_stat = os.stat(dest_path)
+                if (
+                    dest_stat.st_size == cache_stat.st_size
+                    and dest_stat.st_mtime_ns == cache_stat.st_mtime_ns
+                ):
+                    continue
+            except FileNotFoundError:
+                pass
+            if os.path.lexists(dest_path):
+                os.remove(dest_path)
+            shutil.copy2(cache_path, dest_path)
+            written += 1
+        return url, entry, outputs, written
+
+    def save(self):
+        """
+        Writes the size/mtime index of processed sources and evicts the
+        cached files no indexed source refers to anymore.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index = {
+            src_path: entry
+            for src_path, entry in self._index.items()
+            if os.path.exists(src_path)
+        }
+        keys = {entry["key"] for entry in self._index.values()}
+        for name in os.listdir(self.cache_dir):
+            key = _CACHED_NAME.match(name)
+            if key is not None and key.group(1) not in keys:
+                os.remove(os.path.join(self.cache_dir, name))
+        tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f, sort_keys=True)
+        os.replace(tmp_path, self._index_path)
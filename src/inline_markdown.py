@@ -3,13 +3,20 @@ import re
 from htmlnode import LeafNode
 from textnode import TextNode, TextType
 
+_IMAGE_PATTERN = re.compile(r"!\[([^]]+)\]\(([^)]+)\)")
+_LINK_PATTERN = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
 
-def text_node_to_html_node(text_node):
+
+def text_node_to_html_node(text_node, rewrite_url=None):
     """
     Converts TextNode to HTMLNode (LeafNode).
 
     Args:
         text_node (TextNode): Text node to convert
+        rewrite_url (callable, optional): Applied to link and image URLs,
+            e.g. a urls.UrlRewriter for the site's base path. A rewriter
+            with an image_props() method also supplies extra <img>
+            attributes (intrinsic size, srcset, lazy loading).
 
     Returns:
         LeafNode: Corresponding HTML node
@@ -35,10 +42,15 @@ def text_node_to_html_node(text_node):
         case TextType.CODE:
             return LeafNode(tag="code", value=text_node.text)
         case TextType.LINK:
-            link_props = {"href": text_node.url}
+            url = text_node.url if rewrite_url is None else rewrite_url(text_node.url)
+            link_props = {"href": url}
             return LeafNode(tag="a", value=text_node.text, props=link_props)
         case TextType.IMAGE:
-            img_props = {"src": text_node.url, "alt": text_node.text}
+            url = text_node.url if rewrite_url is None else rewrite_url(text_node.url)
+            img_props = {"src": url, "alt": text_node.text}
+            image_props = getattr(rewrite_url, "image_props", None)
+            if image_props is not None:
+                img_props.update(image_props(text_node.url))
             return LeafNode(tag="img", value="", props=img_props)
         case _:
             raise Exception("Invalid text type")
@@ -73,6 +85,10 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
             node_list.append(old_node)
             continue
 
+        if delimiter not in old_node.text:
+            node_list.append(TextNode(text=old_node.text, text_type=TextType.TEXT))
+            continue
+
         split_parts = old_node.text.split(delimiter)
         if len(split_parts) % 2 == 0:
             raise Exception("Invalid Markdown syntax")
@@ -100,7 +116,9 @@ def extract_markdown_images(text):
         >>> extract_markdown_images("![cat](cat.jpg)")
         [('cat', 'cat.jpg')]
     """
-    return re.findall(r"!\[([^]]+)\]\(([^)]+)\)", text)
+    if "![" not in text:
+        return []
+    return _IMAGE_PATTERN.findall(text)
 
 
 def split_nodes_image(old_nodes):
@@ -163,7 +181,9 @@ def extract_markdown_links(text):
     Note:
         Uses negative lookbehind to exclude images (![...]).
     """
-    return re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    if "](" not in text:
+        return []
+    return _LINK_PATTERN.findall(text)
 
 
 def split_nodes_link(old_nodes):
@@ -210,6 +230,99 @@ def split_nodes_link(old_nodes):
     return node_list
 
 
+_INLINE_SPAN_PATTERN = re.compile(f"{_IMAGE_PATTERN.pattern}|{_LINK_PATTERN.pattern}")
+
+_INLINE_DELIMITERS = (
+    ("**", TextType.BOLD),
+    ("_", TextType.ITALIC),
+    ("`", TextType.CODE),
+)
+
+
+def _split_delimited_text(text, level, node_list):
+    """
+    Splits a plain-text span by the delimiters in _INLINE_DELIMITERS.
+
+    Applies the same rules as chaining split_nodes_delimiter for **, _ and `,
+    but emits TextNodes straight into `node_list` instead of building an
+    intermediate list per delimiter.
+
+    Raises:
+        Exception: If a delimiter is unpaired
+    """
+    if level == len(_INLINE_DELIMITERS):
+        node_list.append(TextNode(text=text, text_type=TextType.TEXT))
+        return
+
+    delimiter, text_type = _INLINE_DELIMITERS[level]
+    if delimiter not in text:
+        _split_delimited_text(text, level + 1, node_list)
+        return
+
+    split_parts = text.split(delimiter)
+    if len(split_parts) % 2 == 0:
+        raise Exception("Invalid Markdown syntax")
+
+    for index, part in enumerate(split_parts):
+        if index % 2 == 0:
+            _split_delimited_text(part, level + 1, node_list)
+        else:
+            node_list.append(TextNode(text=part, text_type=text_type))
+
+
+def tokenize_inline(text):
+    """
+    Single-pass inline scanner: converts markdown text to TextNodes.
+
+    Images and links are found in one left-to-right regex scan; the plain
+    text between them is split by **, _ and ` as it is reached. Runs in
+    linear time and produces the same nodes as chaining split_nodes_image,
+    split_nodes_link and split_nodes_delimiter.
+
+    Args:
+        text (str): Raw markdown text
+
+    Returns:
+        list[TextNode]: Fully parsed nodes
+
+    Raises:
+        Exception: If a delimiter is unpaired
+
+    Example:
+        >>> tokenize_inline("see [docs](/docs) for **more**")
+        [TextNode("see ", TEXT), TextNode("docs", LINK, "/docs"),
+         TextNode(" for ", TEXT), TextNode("more", BOLD), TextNode("", TEXT)]
+    """
+    node_list = []
+    if "](" not in text:
+        # Fast paths: no image or link can match, which is most prose.
+        if "**" not in text and "_" not in text and "`" not in text:
+            return [TextNode(text=text, text_type=TextType.TEXT)]
+        _split_delimited_text(text, 0, node_list)
+        return node_list
+
+    position = 0
+    for match in _INLINE_SPAN_PATTERN.finditer(text):
+        if match.start() > position:
+            _split_delimited_text(text[position : match.start()], 0, node_list)
+
+        img_alt, img_link, link_text, link_url = match.groups()
+        if img_link is not None:
+            node_list.append(
+                TextNode(text=img_alt, text_type=TextType.IMAGE, url=img_link)
+            )
+        else:
+            node_list.append(
+                TextNode(text=link_text, text_type=TextType.LINK, url=link_url)
+            )
+        position = match.end()
+
+    if position < len(text) or position == 0:
+        _split_delimited_text(text[position:], 0, node_list)
+
+    return node_list
+
+
 def text_to_textnodes(text):
     """
     Main function: converts markdown text to parsed TextNodes.
@@ -229,6 +342,10 @@ def text_to_textnodes(text):
         4. Italic (_)
         5. Code (`)
 
+    The work is done by tokenize_inline() in a single scan. The
+    split_nodes_* functions remain available for callers that process
+    node lists one syntax at a time.
+
     Example:
         >>> text_to_textnodes("**bold** and _italic_")
         [TextNode("bold", BOLD), TextNode(" and ", TEXT), TextNode("italic", ITALIC)]
@@ -236,13 +353,4 @@ def text_to_textnodes(text):
     Note:
         Order matters! Images/links first to avoid parsing URLs.
     """
-    nodes = [TextNode(text=text, text_type=TextType.TEXT)]
-
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
-
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-
-    return nodes
+    return tokenize_inline(text)
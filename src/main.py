@@ -1,10 +1,66 @@
+import argparse
+import json
 import os
 import shutil
 
-from gencontent import copy_directory_contents, generate_pages_recursive
+from assets import ASSET_MANIFEST_NAME, describe_static, write_asset_manifest
+from block_memo import DEFAULT_MEMO_ENTRIES, BlockMemo
+from buildio import DEFAULT_IO_WORKERS
+from devserver import serve_directory, watch
+from feeds import (
+    DEFAULT_FEED_SECTIONS,
+    PUBLISHED_DATES_NAME,
+    git_published_times,
+    section_pages,
+    update_published_dates,
+    write_feeds,
+    write_sitemaps,
+)
+from gencontent import (
+    collect_page_jobs,
+    generate_pages_buffered,
+    generate_pages_parallel,
+    generate_pages_recursive,
+    sync_directory_contents,
+)
+from images import ImagePipeline
+from manifest import DEFAULT_MANIFEST_PATH, BuildManifest
+from precompress import Precompressor, remove_precompressed
+from profiler import BuildProfiler, no_phase
+from render_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, RenderCache
+from search_index import build_search_index, search_state_path
+from shard import (
+    SHARD_MANIFEST,
+    find_shards,
+    merge_shards,
+    parse_shard,
+    partition_pages,
+    shard_dir,
+    write_shard_manifest,
+)
+from site_index import SiteIndex
 
 
-def main(base_path):
+def main(
+    base_path,
+    incremental=False,
+    jobs=1,
+    link_method="copy",
+    hash_assets=False,
+    profile=False,
+    profile_json=None,
+    render_cache=False,
+    render_cache_size=DEFAULT_MAX_ENTRIES,
+    block_memo_size=DEFAULT_MEMO_ENTRIES,
+    io_workers=DEFAULT_IO_WORKERS,
+    shard=None,
+    site_url=None,
+    feed_sections=DEFAULT_FEED_SECTIONS,
+    fingerprint=False,
+    minify=False,
+    precompress=False,
+    optimize_images=False,
+):
     """
     Entry point for the static site generator.
 
@@ -12,15 +68,71 @@ def main(base_path):
         base_path: The base URL path where the site will be served.
             - "/" for local development (root)
             - "/REPO_NAME/" for GitHub Pages under https://USERNAME.github.io/REPO_NAME/
+        incremental: Reuse the existing 'docs' directory and only regenerate
+            pages whose markdown, template or base_path changed since the
+            last build (see manifest.BuildManifest).
+        jobs: Number of worker processes used to render pages. 1 renders
+            in-process; 0 or None uses one worker per CPU.
+        link_method: How static files are placed in 'docs': "copy",
+            "hardlink" or "reflink" (falls back to copying when unsupported).
+        hash_assets: Compare static file contents, not just size and mtime,
+            before copying.
+        profile: Time every build phase of every page and the static copy,
+            and print the slowest pages and hottest phases at the end.
+        profile_json: Optional path to also dump the raw profile as JSON.
+        render_cache: Reuse rendered HTML of unchanged markdown blocks from
+            the persistent cache in .ssg-cache/render.sqlite.
+        render_cache_size: Maximum number of blocks kept in that cache.
+        block_memo_size: Rendered blocks kept in memory by each rendering
+            process, so blocks that repeat within and across pages are
+            rendered once (see block_memo.BlockMemo). 0 disables the memo.
+        io_workers: Threads that read sources ahead and write pages behind
+            while a single-process build renders (see buildio.BuildIO).
+            0 reads and writes every page synchronously.
+        shard: Optional (i, N): render only the i-th of N size-balanced
+            parts of 'content' into 'shards/shard-i-of-N' (no static
+            assets); see merge() to assemble 'docs' from all N shards.
+            Sitemaps, feeds and precompressed copies are written by the
+            merge, so `site_url` and `precompress` must not be given.
+        site_url: Origin the site is served from (e.g.
+            "https://fongfox.github.io"). When set, sitemap.xml and the
+            feeds of `feed_sections` are written; they need absolute URLs.
+        feed_sections: Content sections that get RSS and Atom feeds.
+        fingerprint: Write CSS, JS, images and fonts under content-hashed
+            names (index.3f2a9c1b.css) and link pages to those names, so
+            they can be served with immutable cache headers. The mapping is
+            written to 'docs/asset-manifest.json'.
+        minify: Render pages with whitespace and comments stripped from
+            their template (see minify.minify_html).
+        precompress: Write .gz (and .br with the brotli module) copies of
+            every changed page and text asset next to it, compressed in the
+            background while pages render (see precompress.Precompressor).
+        optimize_images: Decode PNG images to re-encode them and write
+            scaled-down variants. Without it they are only stripped of
+            metadata and recompressed; decoding runs in pure Python and
+            takes seconds per image the first time.
 
     Behavior:
-        - Deletes the existing 'docs' directory if it exists.
-        - Copies all static assets from 'static' into 'docs'.
+        - A full build renders every page again, but only writes the pages
+          whose content changed (see buildio.write_if_changed), and reports
+          how many did. Without a build manifest, the existing 'docs'
+          directory is deleted first.
+        - Syncs static assets from 'static' into 'docs', copying only new or
+          changed files and deleting ones removed from 'static'. PNG images
+          are recompressed on the way, and with `optimize_images` also
+          re-encoded and given scaled-down variants (see
+          images.ImagePipeline); pages give their <img> tags the image's
+          size, srcset and loading="lazy".
         - Recursively generates HTML pages from the 'content' directory
           using 'template.html'.
         - Rewrites internal href/src attributes to be prefixed with base_path.
         - Writes the generated HTML files into the 'docs' directory while
           preserving the content directory structure.
+        - Records the inputs of every page in the build manifest; an
+          incremental build also deletes pages whose source was removed.
+        - Writes the title, headings, links, images and word count of every
+          page to 'docs/site-index.jsonl' (see site_index.SiteIndex), and
+          a client-side search index to 'docs/search/' (see search_index).
     """
     # if os.path.exists("public"):
     #     shutil.rmtree("public")
@@ -29,20 +141,516 @@ def main(base_path):
 
     # generate_pages_recursive("content", "template.html", "public")
     #
-    if os.path.exists("docs"):
-        shutil.rmtree("docs")
+    dest_dir = "docs"
+    manifest_path = DEFAULT_MANIFEST_PATH
+    pages = None
+    if shard is not None and (site_url or precompress):
+        raise Exception(
+            "--site-url and --precompress apply to the whole site: "
+            "pass them to --merge instead of --shard"
+        )
+    if shard is not None:
+        index, count = shard
+        dest_dir = shard_dir(index, count)
+        manifest_path = os.path.join(
+            os.path.dirname(DEFAULT_MANIFEST_PATH),
+            f"manifest-shard-{index}-of-{count}.json",
+        )
+        all_pages = collect_page_jobs("content", dest_dir, "template.html")
+        pages = partition_pages(all_pages, count)[index - 1]
+        print(f"Shard {index}/{count}: {len(pages)} of {len(all_pages)} pages")
 
-    copy_directory_contents("static", "docs")
+    options = {}
+    if fingerprint:
+        options["fingerprint"] = True
+    if minify:
+        options["minify"] = True
+    if optimize_images:
+        options["optimize_images"] = True
+    manifest = BuildManifest.load(manifest_path, options)
+    if not incremental:
+        # Every page is rendered again, but the recorded outputs stay so
+        # that identical pages are not rewritten. Without a manifest there
+        # is no telling what in dest_dir is stale, so start from scratch.
+        manifest.stale = set(manifest.outputs)
+        if not manifest.outputs and os.path.exists(dest_dir):
+            shutil.rmtree(dest_dir)
 
-    generate_pages_recursive("content", "template.html", "docs", base_path)
+    images = ImagePipeline(optimize=optimize_images)
+    site_index = SiteIndex.load(dest_dir, base_path) if incremental else None
+    if site_index is None:
+        site_index = SiteIndex(dest_dir, base_path)
 
+    compressor = Precompressor() if precompress and shard is None else None
+    profiler = BuildProfiler() if profile or profile_json else None
+    phase = profiler.phase if profiler is not None else no_phase
 
-if __name__ == "__main__":
-    import sys
+    if shard is None:
+        with phase("static copy"):
+            synced = sync_directory_contents(
+                "static",
+                dest_dir,
+                manifest.assets,
+                hash_assets,
+                link_method,
+                images,
+                fingerprint,
+            )
+        manifest.assets = synced["files"]
+        assets = synced["assets"]
+        if compressor is not None:
+            for rel_path in synced["files"]:
+                if compressor.handles(rel_path):
+                    compressor.submit(os.path.join(dest_dir, rel_path))
+        print(
+            f"Synced static assets: {synced['copied']} copied, "
+            f"{synced['unchanged']} unchanged, {synced['removed']} removed"
+        )
+    else:
+        with phase("static copy"):
+            assets = describe_static("static", images, fingerprint)
+    images.save()
+    sized = sum(1 for entry in assets.values() if "width" in entry)
+    print(
+        f"Images: {sized} with sizes, {images.processed} optimized, "
+        f"{images.reused} from cache"
+    )
+    if fingerprint and shard is None:
+        write_asset_manifest(assets, dest_dir)
+        print(f"Fingerprinted {len(assets)} static asset(s)")
+    elif os.path.exists(os.path.join(dest_dir, ASSET_MANIFEST_NAME)):
+        os.remove(os.path.join(dest_dir, ASSET_MANIFEST_NAME))
+
+    cache = RenderCache(DEFAULT_CACHE_PATH, render_cache_size) if render_cache else None
+    memo = BlockMemo(block_memo_size) if block_memo_size > 0 else None
 
-    if len(sys.argv) > 1:
-        base_path = sys.argv[1]
+    page_options = {
+        "profiler": profiler,
+        "render_cache": cache,
+        "site_index": site_index,
+        "assets": assets,
+        "minify": minify,
+        "precompress": compressor,
+        "block_memo": memo,
+    }
+    if jobs == 1 and (io_workers or pages is not None):
+        generate_pages_buffered(
+            "content",
+            "template.html",
+            dest_dir,
+            base_path,
+            manifest,
+            io_workers=io_workers or 1,
+            pages=pages,
+            **page_options,
+        )
+    elif jobs == 1:
+        generate_pages_recursive(
+            "content", "template.html", dest_dir, base_path, manifest, **page_options
+        )
     else:
-        base_path = "/"
+        generate_pages_parallel(
+            "content",
+            "template.html",
+            dest_dir,
+            base_path,
+            manifest,
+            jobs=jobs,
+            pages=pages,
+            **page_options,
+        )
+
+    if cache is not None:
+        cache.evict()
+        cache.close()
+        print(f"Render cache: {cache.hits} hits, {cache.misses} misses")
+    if memo is not None:
+        print(
+            f"Block memo: {memo.hits} hits, {memo.misses} misses "
+            f"({memo.hit_rate():.1f}% hit rate)"
+        )
+
+    for path in manifest.remove_orphans():
+        print(f"Removed orphaned page {path}")
+    manifest.save()
+    print(
+        f"Pages: {len(manifest.changed_outputs)} written, "
+        f"{len(manifest.outputs) - len(manifest.changed_outputs)} unchanged"
+    )
+
+    site_index.prune(manifest.outputs)
+    site_index.fill_missing(manifest.outputs)
+    site_index.save(terms=shard is not None)
+    if shard is None:
+        searched = build_search_index(
+            site_index,
+            dest_dir,
+            state_path=search_state_path(manifest_path),
+            pages=site_index.changed,
+        )
+        site_index.changed.clear()
+        print(
+            f"Search index: {searched['shards']} shards, "
+            f"{searched['encoded']} encoded, {searched['written']} file(s) written"
+        )
+        generated = []
+        if site_url:
+            generated = write_site_feeds(
+                site_index,
+                dest_dir,
+                site_url,
+                feed_sections,
+                assets,
+                minify,
+                manifest.published_times(),
+            )
+        previous = manifest.generated
+        for path in manifest.replace_generated(generated):
+            print(f"Removed stale {path}")
+        if manifest.generated != previous:
+            manifest.save()
+
+    if shard is not None:
+        os.makedirs(dest_dir, exist_ok=True)
+        write_shard_manifest(
+            dest_dir, index, count, base_path, options, manifest.outputs
+        )
+
+    if compressor is not None:
+        finish_precompress(compressor, dest_dir)
+    elif shard is None:
+        remove_precompressed(dest_dir)
+
+    if profiler is not None:
+        print(profiler.summary())
+        if profile_json:
+            profiler.dump_json(profile_json)
+
+
+def write_site_feeds(
+    site_index,
+    dest_dir,
+    site_url,
+    feed_sections,
+    assets=None,
+    minify=False,
+    published=None,
+):
+    """
+    Writes the sitemap and the feed of every section in `feed_sections`.
+
+    Feed entries are dated by 'content/published.json' (see
+    feeds.update_published_dates). Pages it does not list yet are added to
+    it, dated by the commit that added their source if git knows it, or
+    else by `published` (BuildManifest.published_times); the file has to
+    be committed for those dates to hold on other checkouts.
+
+    Returns:
+        list[str]: Paths of the files written
+    """
+    sources = [
+        record["source"]
+        for section in feed_sections
+        for record in section_pages(site_index, section)[1]
+    ]
+    dates_path = os.path.join("content", PUBLISHED_DATES_NAME)
+    dates, added = update_published_dates(
+        dates_path,
+        sources,
+        lambda: {**(published or {}), **git_published_times("content")},
+    )
+    if added:
+        print(f"Dated {len(added)} new page(s) in {dates_path}; commit it")
+    written = write_sitemaps(site_index, dest_dir, site_url)
+    for section in feed_sections:
+        written += write_feeds(
+            site_index,
+            dest_dir,
+            site_url,
+            section,
+            assets=assets,
+            minify=minify,
+            published=dates,
+        )
+    print(f"Wrote {len(written)} sitemap and feed file(s)")
+    return written
+
+
+def finish_precompress(compressor, dest_dir):
+    """Compresses the outputs not submitted yet and reports the results."""
+    compressor.sweep(dest_dir)
+    failures = compressor.flush()
+    compressor.close()
+    compressor.save()
+    for path, error in failures:
+        print(f"Failed to precompress {path}: {error}")
+    print(
+        f"Precompressed ({', '.join(compressor.suffixes)}): "
+        f"{compressor.compressed} compressed, {compressor.unchanged} unchanged"
+    )
+
+
+def merge(site_url=None, feed_sections=DEFAULT_FEED_SECTIONS, precompress=False):
+    """
+    Assembles 'docs' from the outputs of a sharded build.
+
+    Every shard under 'shards' must be present; conflicting outputs abort
+    the merge before 'docs' is touched (see shard.merge_shards). The
+    shards' build manifests are merged into the one of 'docs', so a later
+    incremental build only renders what changed. With a `site_url`, the
+    sitemap and feeds are written for the merged site; with `precompress`,
+    compressed copies of the merged site are written.
+    """
+    shard_dirs = find_shards()
+    with open(os.path.join(shard_dirs[0], SHARD_MANIFEST)) as f:
+        info = json.load(f)
+    options = info.get("options", {})
+    images = ImagePipeline(optimize=options.get("optimize_images", False))
+    merged = merge_shards(shard_dirs, "docs", "static", images, DEFAULT_MANIFEST_PATH)
+    print(f"Merged {merged} pages from shards into docs/")
+    fingerprint = options.get("fingerprint", False)
+    assets = describe_static("static", images, fingerprint)
+    images.save()
+    if fingerprint:
+        write_asset_manifest(assets, "docs")
+    manifest = BuildManifest.load(DEFAULT_MANIFEST_PATH)
+    if site_url:
+        site_index = SiteIndex.load("docs", info["base_path"])
+        manifest.replace_generated(
+            write_site_feeds(
+                site_index,
+                "docs",
+                site_url,
+                feed_sections,
+                assets,
+                options.get("minify", False),
+                manifest.published_times(),
+            )
+        )
+        manifest.save()
+    if precompress:
+        finish_precompress(Precompressor(), "docs")
 
-    main(base_path)
+
+def explain(page, manifest_path=DEFAULT_MANIFEST_PATH):
+    """
+    Prints why a page would or would not be rebuilt by an incremental build.
+
+    Args:
+        page: Output path (e.g. "docs/index.html") or markdown source
+            (e.g. "content/index.md") of the page.
+        manifest_path: Manifest written by the last build.
+
+    Returns:
+        int: Exit status, 1 if the page is not in the manifest.
+    """
+    manifest = BuildManifest.load(manifest_path)
+    dest_path = os.path.normpath(page)
+    if dest_path not in manifest.outputs:
+        for output, entry in manifest.outputs.items():
+            if os.path.normpath(entry["source"]) == dest_path:
+                dest_path = output
+                break
+        else:
+            print(f"{page} is not in the build manifest; run a build first")
+            return 1
+
+    for line in manifest.explain(dest_path):
+        print(line)
+    return 0
+
+
+def serve(base_path, port=8888, **build_options):
+    """
+    Development entry point: build, serve 'docs' and rebuild on change.
+
+    Runs an incremental build, serves 'docs' at http://localhost:PORT
+    under `base_path` (as GitHub Pages would) and then watches 'content',
+    'static' and 'template.html'. Only the pages and assets that changed
+    are rebuilt; a template change re-renders the pages that use it. Stops
+    on Ctrl+C.
+
+    Args:
+        base_path: The base URL path where the site will be served.
+        port: Port for the local HTTP server.
+        build_options: Keyword arguments of main() (fingerprint, minify,
+            jobs, ...) for the initial build; rebuilds on change keep its
+            fingerprint, minify and optimize_images settings.
+    """
+    main(base_path, incremental=True, **build_options)
+    manifest = BuildManifest.load(DEFAULT_MANIFEST_PATH)
+    site_index = SiteIndex.load("docs", base_path)
+    images = ImagePipeline(optimize=manifest.options.get("optimize_images", False))
+    fingerprint = manifest.options.get("fingerprint", False)
+    minify = manifest.options.get("minify", False)
+    assets = describe_static("static", images, fingerprint)
+
+    server = serve_directory("docs", port, base_path)
+    print(f"Serving docs/ at http://localhost:{server.server_address[1]}{base_path}")
+    try:
+        watch(
+            base_path,
+            manifest,
+            site_index=site_index,
+            images=images,
+            assets=assets,
+            fingerprint=fingerprint,
+            minify=minify,
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the static site into docs/")
+    parser.add_argument("base_path", nargs="?", default="/")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only regenerate pages whose inputs changed since the last build",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes for page rendering (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--link",
+        choices=["copy", "hardlink", "reflink"],
+        default="copy",
+        help="how static files are placed in docs/",
+    )
+    parser.add_argument(
+        "--hash-assets",
+        action="store_true",
+        help="compare static file contents instead of only size and mtime",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print per-phase timings, slowest pages and hottest phases",
+    )
+    parser.add_argument(
+        "--profile-json",
+        metavar="PATH",
+        help="also write the raw build profile to PATH as JSON",
+    )
+    parser.add_argument(
+        "--render-cache",
+        action="store_true",
+        help="reuse rendered HTML of unchanged blocks across builds",
+    )
+    parser.add_argument(
+        "--render-cache-size",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help="maximum number of blocks kept in the render cache",
+    )
+    parser.add_argument(
+        "--block-memo-size",
+        type=int,
+        default=DEFAULT_MEMO_ENTRIES,
+        help="rendered blocks kept in memory per process for reuse (0 = off)",
+    )
+    parser.add_argument(
+        "--io-workers",
+        type=int,
+        default=DEFAULT_IO_WORKERS,
+        help="threads reading and writing files while pages render (0 = synchronous)",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        type=parse_shard,
+        help="render only shard I of N into shards/shard-I-of-N",
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="combine all shard outputs and static assets into docs/",
+    )
+    parser.add_argument(
+        "--site-url",
+        metavar="URL",
+        help="origin the site is served from; enables sitemap.xml and feeds",
+    )
+    parser.add_argument(
+        "--feed",
+        metavar="SECTION",
+        action="append",
+        help="content section to publish RSS and Atom feeds for (default: blog)",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="serve docs/ locally and rebuild changed pages on save",
+    )
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="add content hashes to static asset names for immutable caching",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="strip insignificant whitespace and comments from pages",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="write .gz (and .br) copies of changed pages and text assets",
+    )
+    parser.add_argument(
+        "--optimize-images",
+        action="store_true",
+        help="re-encode PNG images and write scaled-down variants (slow)",
+    )
+    parser.add_argument(
+        "--explain",
+        metavar="PAGE",
+        help="show the recorded inputs of PAGE and whether it is stale, then exit",
+    )
+    args = parser.parse_args()
+    if args.feed is None:
+        args.feed = list(DEFAULT_FEED_SECTIONS)
+    if args.shard and (args.site_url or args.precompress):
+        parser.error("--site-url and --precompress go with --merge, not --shard")
+    if args.shard and args.serve:
+        parser.error("--serve builds the whole site, not a --shard")
+
+    build_options = {
+        "jobs": args.jobs,
+        "link_method": args.link,
+        "hash_assets": args.hash_assets,
+        "profile": args.profile,
+        "profile_json": args.profile_json,
+        "render_cache": args.render_cache,
+        "render_cache_size": args.render_cache_size,
+        "block_memo_size": args.block_memo_size,
+        "io_workers": args.io_workers,
+        "site_url": args.site_url,
+        "feed_sections": args.feed,
+        "fingerprint": args.fingerprint,
+        "minify": args.minify,
+        "precompress": args.precompress,
+        "optimize_images": args.optimize_images,
+    }
+    if args.explain:
+        raise SystemExit(explain(args.explain))
+    if args.merge:
+        merge(args.site_url, args.feed, args.precompress)
+    elif args.serve:
+        serve(args.base_path, args.port, **build_options)
+    else:
+        main(
+            args.base_path,
+            incremental=args.incremental,
+            shard=args.shard,
+            **build_options,
+        )
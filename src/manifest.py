@@ -0,0 +1,412 @@
+import hashlib
+import json
+import os
+import time
+
+MANIFEST_VERSION = 4
+DEFAULT_MANIFEST_PATH = os.path.join(".ssg-cache", "manifest.json")
+
+
+def hash_file(path):
+    """
+    Returns the SHA-256 hex digest of a file's bytes.
+
+    Args:
+        path (str): Path of the file to hash
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """
+    Dependency graph of the build: every output and the inputs it was built from.
+
+    Each output path maps to its markdown source, its template, the
+    fingerprint (size, mtime, hash) of every input file (source, template
+    and any extra inputs such as partials) and the base_path it was
+    rendered with. An incremental build asks is_fresh() before calling
+    generate_page and skips pages whose inputs are unchanged; dependents()
+    answers which pages a changed file invalidates and explain() why a page
+    would be rebuilt.
+
+    The relative paths of the static assets copied into the output
+    directory are kept in `assets`, so files removed from static/ can be
+    deleted on the next sync. Site-wide files generated from the whole site
+    (sitemaps, feeds) are kept in `generated`, so a build that no longer
+    writes one deletes it (replace_generated()).
+
+    Each output also keeps the fingerprint of the file that was written
+    (previous_output()), so the next build can tell with a stat() whether
+    a re-rendered page actually changed and leave identical files alone,
+    and the time the page was first built (published_times()), which
+    later builds carry over.
+    The pages of the current build whose bytes changed are collected in
+    `changed_outputs`.
+
+    `options` are build settings that change every page's output without
+    being an input file (e.g. asset fingerprinting). When they differ from
+    the loaded manifest's, every recorded page is stale until it is
+    recorded again.
+
+    Hashes are only recomputed when a file's size or mtime differs from the
+    previous build, so an up-to-date tree costs one stat() per input.
+
+    Example:
+        >>> manifest = BuildManifest.load(".ssg-cache/manifest.json")
+        >>> if not manifest.is_fresh(dest, src, "template.html", "/"):
+        ...     generate_page(src, "template.html", dest, "/")
+        ...     manifest.record(dest, src, "template.html", "/")
+        >>> manifest.save()
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_MANIFEST_PATH,
+        outputs=None,
+        assets=None,
+        options=None,
+        generated=None,
+    ) -> None:
+        self.path = path
+        self.outputs = outputs if outputs is not None else {}
+        self.assets = assets if assets is not None else []
+        self.options = options or {}
+        self.generated = generated if generated is not None else []
+        self.seen = set()
+        self.stale = set()
+        self.changed_outputs = []
+        self._fingerprints = {}
+        self._recorded = None
+
+    @classmethod
+    def load(cls, path=DEFAULT_MANIFEST_PATH, options=None):
+        """
+        Loads a manifest from disk.
+
+        A missing, unreadable or outdated manifest yields an empty one,
+        which simply makes the next build a full build.
+
+        Args:
+            path (str): Manifest file
+            options (dict, optional): Options of the current build. Pages
+                recorded with other options are stale. None keeps the
+                recorded options (e.g. to inspect the last build).
+        """
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path, options=options)
+
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path, options=options)
+        recorded = data.get("options", {})
+        manifest = cls(
+            path,
+            data.get("outputs", {}),
+            data.get("assets", []),
+            recorded if options is None else options,
+            data.get("generated", []),
+        )
+        if manifest.options != recorded:
+            manifest.stale = set(manifest.outputs)
+        return manifest
+
+    def save(self):
+        """Writes the manifest to disk, creating its directory if needed."""
+        dir_path = os.path.dirname(self.path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "outputs": self.outputs,
+                    "assets": self.assets,
+                    "options": self.options,
+                    "generated": self.generated,
+                },
+                f,
+                sort_keys=True,
+            )
+        os.replace(tmp_path, self.path)
+
+    def _recorded_fingerprint(self, path):
+        """Returns the fingerprint of `path` from the loaded graph, if any."""
+        if self._recorded is None:
+            self._recorded = {}
+            for entry in self.outputs.values():
+                self._recorded.update(entry["inputs"])
+        return self._recorded.get(path)
+
+    def fingerprint(self, path):
+        """
+        Returns {"size", "mtime_ns", "sha256"} for a file.
+
+        The recorded hash is reused when size and mtime still match.
+        Results are memoized for the lifetime of the manifest, so a template
+        shared by every page is only inspected once per build.
+        """
+        if path in self._fingerprints:
+            return self._fingerprints[path]
+
+        st = os.stat(path)
+        previous = self._recorded_fingerprint(path)
+        if (
+            previous is not None
+            and previous["size"] == st.st_size
+            and previous["mtime_ns"] == st.st_mtime_ns
+        ):
+            sha = previous["sha256"]
+        else:
+            sha = hash_file(path)
+
+        result = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+        self._fingerprints[path] = result
+        return result
+
+    def _changed_input(self, entry):
+        """Returns the first input of `entry` that changed, or None."""
+        for path, recorded in entry["inputs"].items():
+            try:
+                current = self.fingerprint(path)
+            except FileNotFoundError:
+                return path
+            if current["sha256"] != recorded["sha256"]:
+                return path
+        return None
+
+    def is_fresh(
+        self, dest_path, source_path, template_path, base_path, extra_inputs=()
+    ):
+        """
+        Checks whether `dest_path` is up to date with its inputs.
+
+        Also marks `dest_path` as part of the current build so it is not
+        reported by orphans().
+
+        Args:
+            dest_path (str): Output page
+            source_path (str): Markdown source of the page
+            template_path (str): Template the page is rendered with
+            base_path (str): Base URL path the page is rendered with
+            extra_inputs (iterable[str]): Other files the page depends on
+
+        Returns:
+            bool: True if the output exists, was built from the same source,
+            template, extra inputs, base_path and options, and none of its
+            recorded inputs (including the assets passed to record())
+            changed
+        """
+        self.seen.add(dest_path)
+
+        entry = self.outputs.get(dest_path)
+        if entry is None or dest_path in self.stale or not os.path.exists(dest_path):
+            return False
+        if entry["base_path"] != base_path:
+            return False
+        if entry["source"] != source_path or entry["template"] != template_path:
+            return False
+        expected = {source_path, template_path, *extra_inputs, *entry.get("assets", ())}
+        if set(entry["inputs"]) != expected:
+            return False
+        return self._changed_input(entry) is None
+
+    def record(
+        self,
+        dest_path,
+        source_path,
+        template_path,
+        base_path,
+        extra_inputs=(),
+        assets=(),
+        output=None,
+        changed=True,
+    ):
+        """
+        Stores the inputs `dest_path` was just generated from.
+
+        `assets` are static files whose attributes were inlined into the
+        page (e.g. the size of an image). They are only known after the page
+        is rendered, so is_fresh() takes them from this entry instead of
+        from its caller.
+
+        `output` is the fingerprint of the written page and `changed`
+        whether its content differs from the last build (both as returned
+        by buildio.write_if_changed).
+        """
+        self.seen.add(dest_path)
+        self.stale.discard(dest_path)
+        previous = self.outputs.get(dest_path)
+        published = previous.get("published") if previous is not None else None
+        inputs = {
+            path: self.fingerprint(path)
+            for path in (source_path, template_path, *extra_inputs, *assets)
+        }
+        self.outputs[dest_path] = {
+            "source": source_path,
+            "template": template_path,
+            "inputs": inputs,
+            "base_path": base_path,
+            "published": published if published is not None else int(time.time()),
+        }
+        if assets:
+            self.outputs[dest_path]["assets"] = sorted(assets)
+        if output is not None:
+            self.outputs[dest_path]["output"] = output
+        if changed:
+            self.changed_outputs.append(dest_path)
+
+    def previous_output(self, dest_path):
+        """Returns the fingerprint recorded for the file at `dest_path`, if any."""
+        entry = self.outputs.get(dest_path)
+        return entry.get("output") if entry is not None else None
+
+    def published_times(self):
+        """
+        Returns {markdown source: unix time its page was first built}.
+
+        The time is recorded once and kept by later builds, so unlike the
+        source's mtime it survives checkouts, copies and edits.
+        """
+        return {
+            entry["source"]: entry["published"]
+            for entry in self.outputs.values()
+            if "published" in entry
+        }
+
+    def dependents(self, path):
+        """
+        Returns the outputs that depend on `path`, sorted.
+
+        Example:
+            >>> manifest.dependents("content/blog/template.html")
+            ['docs/blog/glorfindel/index.html', 'docs/blog/tom/index.html']
+        """
+        return sorted(
+            dest for dest, entry in self.outputs.items() if path in entry["inputs"]
+        )
+
+    def explain(self, dest_path):
+        """
+        Describes the recorded dependencies of an output.
+
+        Args:
+            dest_path (str): Output page (e.g. "docs/index.html")
+
+        Returns:
+            list[str]: Human readable lines; the first says whether the page
+            is up to date, followed by one line per input
+
+        Raises:
+            KeyError: If `dest_path` is not in the manifest
+        """
+        entry = self.outputs[dest_path]
+        lines = []
+        stale = False
+        for path, recorded in sorted(entry["inputs"].items()):
+            role = ""
+            if path == entry["source"]:
+                role = " (source)"
+            elif path == entry["template"]:
+                role = " (template)"
+            elif path in entry.get("assets", ()):
+                role = " (asset)"
+            try:
+                current = self.fingerprint(path)
+                state = (
+                    "unchanged"
+                    if current["sha256"] == recorded["sha256"]
+                    else "changed"
+                )
+            except FileNotFoundError:
+                state = "missing"
+            stale = stale or state != "unchanged"
+            lines.append(f"  {path}{role}: {state} [{recorded['sha256'][:12]}]")
+
+        if not os.path.exists(dest_path):
+            stale = True
+            lines.append("  output file is missing")
+        if dest_path in self.stale:
+            stale = True
+            lines.append("  build options changed")
+
+        status = "stale" if stale else "up to date"
+        header = f"{dest_path}: {status} (base_path {entry['base_path']!r})"
+        return [header] + lines
+
+    def invalidate(self, paths):
+        """
+        Discards memoized fingerprints so the given files are inspected again.
+
+        Needed when one manifest outlives a single build (e.g. in watch mode).
+        """
+        for path in paths:
+            self._fingerprints.pop(path, None)
+
+    def forget(self, dest_path):
+        """Drops `dest_path` from the manifest (its source was removed)."""
+        self.outputs.pop(dest_path, None)
+        self.seen.discard(dest_path)
+        self.stale.discard(dest_path)
+
+    def orphans(self):
+        """
+        Returns recorded outputs that were not part of the current build.
+
+        These are pages whose markdown source has been removed.
+        """
+        return sorted(path for path in self.outputs if path not in self.seen)
+
+    def remove_orphans(self):
+        """
+        Deletes orphaned outputs from disk and forgets them.
+
+        Empty parent directories left behind are removed as well.
+
+        Returns:
+            list[str]: The deleted output paths
+        """
+        removed = self.orphans()
+        for path in removed:
+            del self.outputs[path]
+            _remove_output(path)
+        return removed
+
+    def replace_generated(self, paths):
+        """
+        Records the site-wide files (sitemaps, feeds) this build wrote and
+        deletes the ones an earlier build wrote but this one did not.
+
+        Args:
+            paths (iterable[str]): Files written by this build
+
+        Returns:
+            list[str]: The deleted paths
+        """
+        paths = sorted(set(paths))
+        removed = sorted(set(self.generated).difference(paths))
+        for path in removed:
+            _remove_output(path)
+        self.generated = paths
+        return removed
+
+
+def _remove_output(path):
+    """Deletes an output file and the empty directories left above it."""
+    if os.path.exists(path):
+        os.remove(path)
+
+    dir_path = os.path.dirname(path)
+    while dir_path and os.path.isdir(dir_path) and not os.listdir(dir_path):
+        os.rmdir(dir_path)
+        dir_path = os.path.dirname(dir_path)
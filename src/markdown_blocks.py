@@ -1,8 +1,10 @@
+import itertools
 import re
 from enum import Enum
 
 from htmlnode import ParentNode
 from inline_markdown import text_node_to_html_node, text_to_textnodes
+from profiler import no_phase
 from textnode import TextNode, TextType
 
 
@@ -26,6 +28,150 @@ class BlockType(Enum):
     ORDERED_LIST = "ordered_list"
 
 
+class Block:
+    """
+    A markdown block produced by scan_blocks().
+
+    Args:
+        block_type (BlockType): Type of the block
+        lines (list[str]): Lines of the block; the block as a whole is
+            trimmed (leading whitespace of the first line, trailing
+            whitespace of the last line)
+        level (int): Number of leading # for headings, 0 otherwise
+
+    Example:
+        >>> Block(BlockType.HEADING, ["## Title"], 2)
+        Block(heading, ['## Title'], 2)
+    """
+
+    __slots__ = ("block_type", "lines", "level")
+
+    def __init__(self, block_type, lines, level=0) -> None:
+        self.block_type = block_type
+        self.lines = lines
+        self.level = level
+
+    @property
+    def text(self):
+        """The block as a single string (lines joined by \\n)."""
+        return "\n".join(self.lines)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Block):
+            return False
+        return (
+            self.block_type == other.block_type
+            and self.lines == other.lines
+            and self.level == other.level
+        )
+
+    def __repr__(self) -> str:
+        return f"Block({self.block_type.value}, {self.lines}, {self.level})"
+
+
+def _is_fence(line):
+    """Checks if a line opens or closes fenced code (indentation allowed)."""
+    return line.lstrip().startswith("```")
+
+
+def _classify_lines(lines):
+    """
+    Classifies the lines of a trimmed block.
+
+    Returns:
+        tuple[BlockType, int]: Block type and heading level (0 if not a
+        heading)
+    """
+    first_line = lines[0]
+    last_line = lines[-1]
+
+    if _is_fence(first_line) and _is_fence(last_line):
+        return BlockType.CODE, 0
+
+    if first_line.startswith("#"):
+        return BlockType.HEADING, len(first_line) - len(first_line.lstrip("#"))
+
+    if first_line.startswith(">"):
+        return BlockType.QUOTE, 0
+
+    if is_unordered_list(lines):
+        return BlockType.UNORDERED_LIST, 0
+
+    if is_ordered_list(lines):
+        return BlockType.ORDERED_LIST, 0
+
+    return BlockType.PARAGRAPH, 0
+
+
+def _make_block(lines, unterminated_fence=False):
+    lines[0] = lines[0].lstrip()
+    lines[-1] = lines[-1].rstrip()
+    if unterminated_fence:
+        return Block(BlockType.CODE, lines)
+    block_type, level = _classify_lines(lines)
+    return Block(block_type, lines, level)
+
+
+def scan_blocks(lines):
+    """
+    Single-pass, line-oriented block scanner.
+
+    Groups lines into blocks separated by blank (or whitespace-only) lines
+    and classifies each block as soon as it is complete. A ``` fence opened
+    at the start of a block runs until its closing fence, blank lines
+    included, so fenced code is never cut apart. Either fence may be
+    indented. A fence that is never closed runs to the end of the document
+    and still makes a CODE block.
+
+    Args:
+        lines (iterable[str]): Lines of the document, with or without their
+            line endings ("\\n" or "\\r\\n"); e.g. markdown.split("\\n") or
+            an open file
+
+    Yields:
+        Block: Classified blocks in document order
+
+    Example:
+        >>> list(scan_blocks("# Title\\n\\nText".split("\\n")))
+        [Block(heading, ['# Title'], 1), Block(paragraph, ['Text'], 0)]
+    """
+    current = []
+    in_fence = False
+
+    for line in lines:
+        if line.endswith("\n"):
+            line = line[:-1]
+        if line.endswith("\r"):
+            line = line[:-1]
+
+        if in_fence:
+            current.append(line)
+            if _is_fence(line):
+                in_fence = False
+                yield _make_block(current)
+                current = []
+            continue
+
+        if not line.strip():
+            if current:
+                yield _make_block(current)
+                current = []
+            continue
+
+        if not current:
+            stripped = line.strip()
+            if stripped.startswith("```"):
+                if len(stripped) >= 6 and stripped.endswith("```"):
+                    yield _make_block([line])
+                    continue
+                in_fence = True
+
+        current.append(line)
+
+    if current:
+        yield _make_block(current, unterminated_fence=in_fence)
+
+
 def markdown_to_blocks(markdown):
     """
     Splits markdown into blocks (separated by blank lines).
@@ -41,17 +187,10 @@ def markdown_to_blocks(markdown):
         ['# Title', 'Paragraph']
 
     Note:
-        Blocks separated by \\n\\n (double newline).
+        Uses scan_blocks(): whitespace-only lines separate blocks, \\r\\n
+        line endings are accepted and fenced code keeps its blank lines.
     """
-    str_list = []
-
-    temp_list = markdown.split("\n\n")
-    for item in temp_list:
-        new_item = item.strip()
-        if new_item != "":
-            str_list.append(new_item)
-
-    return str_list
+    return [block.text for block in scan_blocks(markdown.split("\n"))]
 
 
 def is_unordered_list(lines):
@@ -109,32 +248,8 @@ def block_to_block_type(md_txt_block):
         6. PARAGRAPH (default)
     """
     md_txt_block = md_txt_block.strip()
-    lines = md_txt_block.split("\n")
-    first_line = lines[0]
-    last_line = lines[-1]
-
-    if first_line.startswith("```") and last_line.startswith("```"):
-        return BlockType.CODE
-
-    if first_line.startswith("#"):
-        heading_counter = 0
-        for char in first_line:
-            if char == "#":
-                heading_counter += 1
-            else:
-                break
-        return BlockType.HEADING
-
-    if first_line.startswith(">"):
-        return BlockType.QUOTE
-
-    if is_unordered_list(lines):
-        return BlockType.UNORDERED_LIST
-
-    if is_ordered_list(lines):
-        return BlockType.ORDERED_LIST
-
-    return BlockType.PARAGRAPH
+    block_type, _ = _classify_lines(md_txt_block.split("\n"))
+    return block_type
 
 
 def convert_line_type_to_html_tag(line_type, line=None):
@@ -222,6 +337,9 @@ def handle_clean_line(line_type, line):
         return line
 
 
+_ORDERED_ITEM_PATTERN = re.compile(r"^\d+\.\s*(.*)$")
+
+
 def clean_inner_line(inner_line):
     """
     Removes list markers from line start.
@@ -235,15 +353,148 @@ def clean_inner_line(inner_line):
         return line[2:].strip()
 
     # xử lý dạng "1. text", "2. text"
-    match = re.match(r"^\d+\.\s*(.*)$", line)
-    if match:
-        return match.group(1).strip()
+    if line[:1].isdecimal():
+        match = _ORDERED_ITEM_PATTERN.match(line)
+        if match:
+            return match.group(1).strip()
 
     # nếu không khớp gì, trả lại như cũ
     return line.strip()
 
 
-def markdown_to_html_node(md):
+def _inline_texts(block):
+    """Returns the markdown of each inline run of a non-code block."""
+    block_type = block.block_type
+    if block_type == BlockType.UNORDERED_LIST or block_type == BlockType.ORDERED_LIST:
+        return [clean_inner_line(line) for line in block.lines]
+    if block_type == BlockType.PARAGRAPH:
+        return [" ".join(block.lines)]
+    return [handle_clean_line(block_type, block.text)]
+
+
+def _summarize(runs):
+    """
+    Builds a block summary from the TextNodes of its inline runs.
+
+    Returns:
+        tuple[str, list[str], list[list[str]]]: (plain text, link URLs,
+        [alt, src] of every image); URLs are as written in the markdown
+    """
+    plain = []
+    links = []
+    images = []
+    for nodes in runs:
+        for node in nodes:
+            if node.text_type == TextType.IMAGE:
+                images.append([node.text, node.url])
+                continue
+            if node.text_type == TextType.LINK:
+                links.append(node.url)
+            plain.append(node.text)
+        plain.append(" ")
+    return "".join(plain), links, images
+
+
+def block_summary(block):
+    """
+    Returns the summary convert_block() gives for `block`, without
+    rendering it (None for code blocks).
+    """
+    if block.block_type == BlockType.CODE:
+        return None
+    return _summarize(text_to_textnodes(text) for text in _inline_texts(block))
+
+
+def convert_block(block, rewrite_url=None, phase=no_phase):
+    """
+    Converts one scanned Block to its HTMLNode and summarizes its text.
+
+    The summary is taken from the TextNodes the block is rendered from, so
+    page metadata (site_index.PageMetadata) costs no second inline parse.
+
+    Args:
+        block (Block): Block from scan_blocks()
+        rewrite_url (callable, optional): Applied to link and image URLs
+        phase (callable, optional): PageProfile.phase, to attribute time to
+            block classification, inline parse and html tree build
+
+    Returns:
+        tuple[ParentNode, tuple | None]: The block element (<p>, <h1>...,
+        <pre>, <blockquote>, <ul> or <ol>) and the block's (plain text,
+        link URLs, images) summary, None for code blocks
+    """
+    block_type = block.block_type
+
+    if block_type == BlockType.CODE:
+        with phase("block classification"):
+            clean_text = handle_clean_line(block_type, block.text)
+        with phase("html tree build"):
+            text_node = TextNode(clean_text, TextType.TEXT)
+            code_html = text_node_to_html_node(text_node)
+            code_node = ParentNode(tag="code", children=[code_html])
+            return ParentNode(tag="pre", children=[code_node]), None
+
+    with phase("block classification"):
+        texts = _inline_texts(block)
+        if block_type == BlockType.UNORDERED_LIST:
+            tag = "ul"
+        elif block_type == BlockType.ORDERED_LIST:
+            tag = "ol"
+        elif block_type == BlockType.HEADING:
+            tag = f"h{block.level}"
+        else:
+            tag = convert_line_type_to_html_tag(block_type)
+
+    runs = []
+    for text in texts:
+        with phase("inline parse"):
+            runs.append(text_to_textnodes(text))
+    with phase("html tree build"):
+        children = [
+            [text_node_to_html_node(text_node, rewrite_url) for text_node in nodes]
+            for nodes in runs
+        ]
+        if tag == "ul" or tag == "ol":
+            items = [ParentNode(tag="li", children=item) for item in children]
+            node = ParentNode(tag=tag, children=items)
+        else:
+            node = ParentNode(tag=tag, children=children[0])
+    return node, _summarize(runs)
+
+
+def block_to_html_node(block, rewrite_url=None, phase=no_phase):
+    """
+    Converts one scanned Block to its HTMLNode.
+
+    Args:
+        block (Block): Block from scan_blocks()
+        rewrite_url (callable, optional): Applied to link and image URLs
+        phase (callable, optional): PageProfile.phase, to attribute time to
+            block classification, inline parse and html tree build
+
+    Returns:
+        ParentNode: The block element (<p>, <h1>..., <pre>, <blockquote>,
+        <ul> or <ol>)
+    """
+    return convert_block(block, rewrite_url, phase)[0]
+
+
+def _render_block(block, rewrite_url, phase, cache, memo=None):
+    """Returns (HTMLNode, summary) of a block, through `memo` and `cache`."""
+    if memo is not None:
+        return memo.render_block(
+            block, rewrite_url, lambda: _render_block(block, rewrite_url, phase, cache)
+        )
+    if cache is None:
+        return convert_block(block, rewrite_url, phase)
+    return cache.render_block(
+        block, rewrite_url, lambda: convert_block(block, rewrite_url, phase)
+    )
+
+
+def markdown_to_html_node(
+    md, rewrite_url=None, profile=None, cache=None, metadata=None, memo=None
+):
     """
     Main function: converts full markdown document to HTMLNode tree.
 
@@ -252,14 +503,24 @@ def markdown_to_html_node(md):
 
     Args:
         md (str): Complete markdown document
+        rewrite_url (callable, optional): Applied to every link and image
+            URL (see text_node_to_html_node)
+        profile (PageProfile, optional): Receives the time spent in block
+            split, block classification, inline parse and html tree build
+        cache (RenderCache, optional): Persistent block cache; blocks found
+            in it become raw-HTML LeafNodes instead of being re-rendered
+        metadata (site_index.PageMetadata, optional): Receives every block
+            and its summary, to collect the page's title, headings, links
+            and word count
+        memo (block_memo.BlockMemo, optional): In-process memo of rendered
+            blocks, checked before `cache`; repeated blocks share one node
 
     Returns:
         ParentNode: Root <div> containing all HTML
 
     Processing:
-        1. Split markdown into blocks
-        2. For each block:
-           - Detect type (heading, list, code, etc)
+        1. Scan markdown into classified blocks (scan_blocks)
+        2. For each block (convert_block):
            - Convert to appropriate HTML tag
            - Clean markdown syntax
            - Parse inline markdown (bold, links, etc)
@@ -279,60 +540,64 @@ def markdown_to_html_node(md):
 
     Note:
         This function ties together all the other modules:
-        - Uses markdown_to_blocks() to split
-        - Uses block_to_block_type() to classify
+        - Uses scan_blocks() to split and classify
         - Uses text_to_textnodes() for inline parsing
         - Uses text_node_to_html_node() to convert to HTML
         - Builds tree with ParentNode and LeafNode
     """
-    lines = markdown_to_blocks(md)
-    html_nodes = []
-
-    for line in lines:
-        line_type = block_to_block_type(line)
-        html_type = convert_line_type_to_html_tag(line_type, line)
-        clean_line = handle_clean_line(line_type, line)
+    phase = profile.phase if profile is not None else no_phase
 
-        if line_type == BlockType.CODE:
-            text_node = TextNode(clean_line, TextType.TEXT)
-            code_html = text_node_to_html_node(text_node)
+    with phase("block split"):
+        blocks = list(scan_blocks(md.split("\n")))
 
-            code_node = ParentNode(tag="code", children=[code_html])
-
-            parent_node = ParentNode(tag=html_type, children=[code_node])
-            html_nodes.append(parent_node)
-        elif (
-            line_type == BlockType.UNORDERED_LIST or line_type == BlockType.ORDERED_LIST
-        ):
-            inner_lines = line.splitlines()
-            li_nodes = []
+    html_nodes = []
+    for block in blocks:
+        node, summary = _render_block(block, rewrite_url, phase, cache, memo)
+        if metadata is not None:
+            metadata.add_block(block, summary)
+        html_nodes.append(node)
 
-            for inner_line in inner_lines:
-                cleaned_inner_line = clean_inner_line(inner_line)
-                text_node_list = text_to_textnodes(cleaned_inner_line)
-                children = []
+    return ParentNode(tag="div", children=html_nodes)
 
-                for text_node in text_node_list:
-                    html_node = text_node_to_html_node(text_node)
-                    children.append(html_node)
 
-                li_node = ParentNode(tag="li", children=children)
-                li_nodes.append(li_node)
+def iter_markdown_html(
+    lines, rewrite_url=None, profile=None, cache=None, metadata=None, memo=None
+):
+    """
+    Streams the HTML of a markdown document block by block.
 
-            parent_node = ParentNode(tag=html_type, children=li_nodes)
-            html_nodes.append(parent_node)
-        else:
-            text_node_list = text_to_textnodes(clean_line)
-            children = []
+    Produces exactly markdown_to_html_node(md).to_html(), but only one
+    block and its HTMLNode subtree are held in memory at a time, so the
+    document can come straight from an open file.
 
-            for text_node in text_node_list:
-                html_node = text_node_to_html_node(text_node)
-                children.append(html_node)
+    Args:
+        lines (iterable[str]): Lines of the document (e.g. an open file)
+        rewrite_url (callable, optional): Applied to link and image URLs
+        profile (PageProfile, optional): Receives per-block phase timings
+        cache (RenderCache, optional): Persistent block cache
+        metadata (site_index.PageMetadata, optional): Receives every block
+        memo (block_memo.BlockMemo, optional): In-process block memo
 
-            parent_node = ParentNode(tag=html_type, children=children)
-            html_nodes.append(parent_node)
+    Yields:
+        str: Consecutive fragments of the HTML output
 
-    return ParentNode(tag="div", children=html_nodes)
+    Raises:
+        ValueError: If the document has no blocks (like an empty ParentNode)
+    """
+    phase = profile.phase if profile is not None else no_phase
+
+    blocks = scan_blocks(lines)
+    first = next(blocks, None)
+    if first is None:
+        raise ValueError("Must have children value")
+
+    yield "<div>"
+    for block in itertools.chain((first,), blocks):
+        node, summary = _render_block(block, rewrite_url, phase, cache, memo)
+        if metadata is not None:
+            metadata.add_block(block, summary)
+        yield from node.iter_html()
+    yield "</div>"
 
 
 if __name__ == "__main__":
@@ -0,0 +1,123 @@
+import re
+
+_TOKEN_PATTERN = re.compile(
+    r"(<!--.*?-->)"
+    r"|(<(pre|textarea|script|style)\b.*?</\3\s*>)"
+    r"|(<[!/]?[a-zA-Z][^>]*>)"
+    r"|([^<]+|<)",
+    re.S | re.I,
+)
+_TAG_NAME_PATTERN = re.compile(r"<[!/]?([a-zA-Z0-9]+)")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Elements that start on their own line: whitespace next to their tags is
+# never rendered, so it can be dropped instead of collapsed to one space.
+_BLOCK_TAGS = {
+    "!doctype",
+    "address",
+    "article",
+    "aside",
+    "base",
+    "blockquote",
+    "body",
+    "br",
+    "dd",
+    "details",
+    "div",
+    "dl",
+    "dt",
+    "fieldset",
+    "figcaption",
+    "figure",
+    "footer",
+    "form",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "head",
+    "header",
+    "hr",
+    "html",
+    "li",
+    "link",
+    "main",
+    "meta",
+    "nav",
+    "noscript",
+    "ol",
+    "option",
+    "p",
+    "pre",
+    "script",
+    "section",
+    "style",
+    "summary",
+    "table",
+    "tbody",
+    "td",
+    "tfoot",
+    "th",
+    "thead",
+    "title",
+    "tr",
+    "ul",
+}
+
+
+def _tag_name(tag):
+    return _TAG_NAME_PATTERN.match(tag).group(1).lower()
+
+
+def minify_html(html):
+    """
+    Removes the whitespace and comments of an HTML document that a browser
+    would not render.
+
+    <pre>, <textarea>, <script> and <style> elements are kept byte for
+    byte, as are tags and their attributes and conditional comments
+    (<!--[if ...]>). In text, runs of whitespace become one space, and are
+    dropped entirely next to the tags of block-level elements.
+
+    Example:
+        >>> minify_html("<ul>\\n  <li>a  <b>b</b></li>\\n</ul>\\n<pre> x\\n</pre>")
+        '<ul><li>a <b>b</b></li></ul><pre> x\\n</pre>'
+    """
+    parts = []
+    names = []
+    text = []
+
+    def end_text():
+        if text:
+            parts.append(_WHITESPACE_PATTERN.sub(" ", "".join(text)))
+            names.append(None)
+            text.clear()
+
+    for match in _TOKEN_PATTERN.finditer(html):
+        comment, raw, _, tag, chars = match.groups()
+        if chars is not None:
+            text.append(chars)
+        elif comment is not None:
+            if comment.startswith("<!--[if"):
+                end_text()
+                parts.append(comment)
+                names.append("")
+        else:
+            end_text()
+            parts.append(raw or tag)
+            names.append(_tag_name(raw or tag))
+    end_text()
+
+    out = []
+    for index, part in enumerate(parts):
+        if names[index] is None:
+            before = names[index - 1] if index > 0 else "html"
+            after = names[index + 1] if index + 1 < len(parts) else "html"
+            if before in _BLOCK_TAGS:
+                part = part.lstrip(" ")
+            if after in _BLOCK_TAGS:
+                part = part.rstrip(" ")
+        out.append(part)
+    return "".join(out)
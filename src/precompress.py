@@ -0,0 +1,239 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PRECOMPRESS_INDEX_PATH = os.path.join(".ssg-cache", "precompress.json")
+COMPRESSIBLE_EXTENSIONS = {
+    ".css",
+    ".html",
+    ".js",
+    ".json",
+    ".jsonl",
+    ".mjs",
+    ".svg",
+    ".txt",
+    ".xml",
+}
+# Below this size a compressed copy saves less than a network packet.
+MIN_SIZE = 256
+DEFAULT_COMPRESS_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_MAX_PENDING = 64
+
+
+def is_compressible(path):
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def compressed_suffixes():
+    """Returns the suffixes of the precompressed copies that are written."""
+    return (".gz", ".br") if brotli is not None else (".gz",)
+
+
+class Precompressor:
+    """
+    Writes gzip (and, if the brotli module is installed, brotli) copies of
+    the site's text files next to them: page.html.gz, page.html.br.
+
+    A web server can then send those to clients that accept the encoding
+    without compressing anything per request (nginx gzip_static/
+    brotli_static, Caddy precompressed, ...).
+
+    Files are compressed by a thread pool while the build goes on; zlib and
+    brotli release the GIL, so this overlaps with rendering. submit() blocks
+    while `max_pending` files are queued, so pages handed over in memory
+    do not pile up. The hash of every compressed file is kept in an index,
+    so files that are unchanged since the last build are not compressed
+    again. Compressed copies that would not be smaller, or files under
+    MIN_SIZE bytes, are not written.
+
+    Args:
+        index_path (str): Index of compressed content hashes
+        workers (int): Number of compression threads
+        max_pending (int): Maximum number of queued files
+
+    Example:
+        >>> precompress = Precompressor()
+        >>> precompress.submit("docs/index.html")
+        >>> precompress.sweep("docs")
+        >>> failures = precompress.flush()
+        >>> precompress.close()
+        >>> precompress.save()
+    """
+
+    def __init__(
+        self,
+        index_path=PRECOMPRESS_INDEX_PATH,
+        workers=DEFAULT_COMPRESS_WORKERS,
+        max_pending=DEFAULT_MAX_PENDING,
+    ) -> None:
+        self.index_path = index_path
+        self.suffixes = compressed_suffixes()
+        self.compressed = 0
+        self.unchanged = 0
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="precompress"
+        )
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._futures = []
+        self._submitted = set()
+        try:
+            with open(index_path) as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+
+    def handles(self, path):
+        return is_compressible(path)
+
+    def submit(self, path, data=None):
+        """
+        Queues `path` to be compressed.
+
+        Args:
+            path (str): Output file
+            data (str | bytes, optional): Content of the file, if the caller
+                has it in memory (the file may still be being written);
+                otherwise it is read from disk
+        """
+        if path in self._submitted:
+            return
+        self._submitted.add(path)
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(self._compress, path, data)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._futures.append((path, future))
+
+    def _compress(self, path, data):
+        try:
+            self._compress_file(path, data)
+        finally:
+            self._slots.release()
+
+    def _compress_file(self, path, data):
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        elif isinstance(data, str):
+            data = data.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        encodings = list(self.suffixes)
+
+        with self._lock:
+            entry = self._index.get(path)
+        if (
+            entry is not None
+            and entry["sha256"] == digest
+            and entry["encodings"] == encodings
+            and all(os.path.exists(path + suffix) for suffix in entry["written"])
+        ):
+            with self._lock:
+                self.unchanged += 1
+            return
+
+        written = []
+        for suffix in encodings:
+            sibling = path + suffix
+            content = None
+            if len(data) >= MIN_SIZE:
+                if suffix == ".gz":
+                    content = gzip.compress(data, compresslevel=9, mtime=0)
+                else:
+                    content = brotli.compress(data)
+            if content is None or len(content) >= len(data):
+                if os.path.exists(sibling):
+                    os.remove(sibling)
+                continue
+            tmp_path = sibling + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, sibling)
+            written.append(suffix)
+
+        with self._lock:
+            self._index[path] = {
+                "sha256": digest,
+                "encodings": encodings,
+                "written": written,
+            }
+            self.compressed += 1
+
+    def sweep(self, dest_dir):
+        """
+        Queues every compressible file under `dest_dir` that was not
+        submitted yet, and deletes compressed copies whose file is gone.
+        """
+        for dir_path, _, names in os.walk(dest_dir):
+            present = set(names)
+            for name in names:
+                path = os.path.join(dir_path, name)
+                base, suffix = os.path.splitext(name)
+                if suffix in (".gz", ".br"):
+                    if self.handles(base) and base not in present:
+                        os.remove(path)
+                elif self.handles(name):
+                    self.submit(path)
+
+    def flush(self):
+        """
+        Waits for every queued file.
+
+        Returns:
+            list[tuple[str, Exception]]: Files that could not be compressed
+        """
+        failures = []
+        for path, future in self._futures:
+            error = future.exception()
+            if error is not None:
+                failures.append((path, error))
+        self._futures = []
+        return failures
+
+    def close(self):
+        """Waits for queued files and stops the worker threads."""
+        self._pool.shutdown(wait=True)
+
+    def save(self):
+        """Writes the index, dropping files that no longer exist."""
+        index = {
+            path: entry for path, entry in self._index.items() if os.path.exists(path)
+        }
+        dir_path = os.path.dirname(self.index_path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+
+def remove_precompressed(dest_dir, index_path=PRECOMPRESS_INDEX_PATH):
+    """
+    Deletes the compressed copies left by an earlier build that used a
+    Precompressor, which would otherwise be served instead of newer files.
+
+    Returns:
+        int: Number of files deleted
+    """
+    if not os.path.exists(index_path):
+        return 0
+    removed = 0
+    for dir_path, _, names in os.walk(dest_dir):
+        for name in names:
+            base, suffix = os.path.splitext(name)
+            if suffix in (".gz", ".br") and is_compressible(base):
+                os.remove(os.path.join(dir_path, name))
+                removed += 1
+    os.remove(index_path)
+    return removed
@@ -0,0 +1,165 @@
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+PAGE_PHASES = (
+    "read",
+    "block split",
+    "block classification",
+    "inline parse",
+    "html tree build",
+    "serialization",
+    "template fill",
+    "write",
+)
+
+_NO_PHASE = nullcontext()
+
+
+def no_phase(name):
+    """Stand-in for PageProfile.phase when profiling is disabled."""
+    return _NO_PHASE
+
+
+class PageProfile:
+    """
+    Wall time and allocation counts per build phase for one page.
+
+    Phases may be entered many times (e.g. once per markdown block); their
+    measurements are summed. Allocations are the net number of memory
+    blocks allocated by the interpreter (sys.getallocatedblocks) during the
+    phase, which is cheap enough to sample around every block.
+
+    Instances are plain data and can be returned from pool workers.
+
+    Args:
+        path (str): Source path of the page
+
+    Example:
+        >>> profile = PageProfile("content/index.md")
+        >>> with profile.phase("read"):
+        ...     markdown = f.read()
+    """
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Measures the enclosed code and adds it to phase `name`."""
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            allocated = sys.getallocatedblocks() - blocks
+            totals = self.phases.setdefault(name, [0.0, 0])
+            totals[0] += elapsed
+            totals[1] += allocated
+
+    @property
+    def total(self):
+        """Total seconds spent in all phases of this page."""
+        return sum(seconds for seconds, _ in self.phases.values())
+
+
+class BuildProfiler:
+    """
+    Collects PageProfiles and build-wide phases and reports on them.
+
+    Example:
+        >>> profiler = BuildProfiler()
+        >>> with profiler.phase("static copy"):
+        ...     sync_directory_contents("static", "docs")
+        >>> print(profiler.summary())
+    """
+
+    def __init__(self) -> None:
+        self.pages = []
+        self.build = PageProfile("<build>")
+
+    def page(self, path):
+        """Starts and returns the profile of a page rendered in-process."""
+        profile = PageProfile(path)
+        self.pages.append(profile)
+        return profile
+
+    def add(self, profile):
+        """Adds a profile recorded elsewhere (e.g. in a pool worker)."""
+        self.pages.append(profile)
+
+    def phase(self, name):
+        """Measures a build-wide phase such as the static asset copy."""
+        return self.build.phase(name)
+
+    def phase_totals(self):
+        """
+        Returns per-phase totals over all pages, slowest first.
+
+        Returns:
+            list[tuple[str, float, int]]: (phase, seconds, allocated blocks)
+        """
+        totals = {}
+        for profile in self.pages:
+            for name, (seconds, allocated) in profile.phases.items():
+                entry = totals.setdefault(name, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += allocated
+        return sorted(
+            (
+                (name, seconds, allocated)
+                for name, (seconds, allocated) in totals.items()
+            ),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+    def slowest_pages(self, count=10):
+        """Returns the `count` pages with the highest total time."""
+        return sorted(self.pages, key=lambda p: p.total, reverse=True)[:count]
+
+    def summary(self, count=10):
+        """
+        Formats a human readable report.
+
+        Returns:
+            str: Build phases, hottest page phases and slowest pages
+        """
+        lines = ["Build profile"]
+        for name, (seconds, allocated) in self.build.phases.items():
+            lines.append(
+                f"  {name:<22} {seconds * 1000:10.2f} ms {allocated:>10} blocks"
+            )
+
+        page_total = sum(p.total for p in self.pages)
+        lines.append(
+            f"Page phases ({len(self.pages)} pages, {page_total * 1000:.2f} ms)"
+        )
+        for name, seconds, allocated in self.phase_totals():
+            share = seconds / page_total * 100 if page_total else 0.0
+            lines.append(
+                f"  {name:<22} {seconds * 1000:10.2f} ms {share:5.1f}% {allocated:>10} blocks"
+            )
+
+        lines.append("Slowest pages")
+        for profile in self.slowest_pages(count):
+            hottest = max(profile.phases.items(), key=lambda item: item[1][0])[0]
+            lines.append(
+                f"  {profile.total * 1000:10.2f} ms  {profile.path} (mostly {hottest})"
+            )
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """Returns the raw measurements as JSON-serializable data."""
+        return {
+            "build": self.build.phases,
+            "pages": {profile.path: profile.phases for profile in self.pages},
+        }
+
+    def dump_json(self, path):
+        """Writes to_dict() to `path` for tracking builds over time."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
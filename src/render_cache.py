@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from htmlnode import LeafNode
+
+# Bump whenever block rendering changes, so stale fragments are never reused.
+PARSER_VERSION = "2"
+DEFAULT_CACHE_PATH = os.path.join(".ssg-cache", "render.sqlite")
+DEFAULT_MAX_ENTRIES = 200_000
+
+_open_caches = {}
+
+
+class RenderCache:
+    """
+    Persistent cache of rendered HTML fragments, one per markdown block.
+
+    Keys are a hash of (parser version, block type, heading level, block
+    text, URL rewriter), values the block's HTML and the summary the site
+    index collects from it. The cache lives in a sqlite file under
+    .ssg-cache/, so warm rebuilds skip inline parsing and serialization for
+    every block that did not change, even when the whole page has to be
+    re-rendered (e.g. after a template change).
+
+    Lookups and inserts are buffered and written in one transaction by
+    flush(). evict() keeps the cache at `max_entries`, dropping the least
+    recently used fragments first.
+
+    Pool workers share one instance per process through for_process().
+
+    Args:
+        path (str): sqlite file
+        max_entries (int): Entries kept by evict()
+    """
+
+    def __init__(
+        self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pending = {}
+        self._touched = set()
+
+    @classmethod
+    def for_process(cls, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        """Returns this process's cache for `path`, opening it on first use."""
+        cache = _open_caches.get(path)
+        if cache is None:
+            cache = cls(path, max_entries)
+            _open_caches[path] = cache
+        return cache
+
+    def _connect(self):
+        if self._conn is None:
+            dir_path = os.path.dirname(self.path)
+            if dir_path:
+                os.makedirs(dir_path, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = [
+                row[1] for row in self._conn.execute("PRAGMA table_info(fragments)")
+            ]
+            if columns and "summary" not in columns:
+                # Written by a version that did not keep block summaries.
+                self._conn.execute("DROP TABLE fragments")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fragments ("
+                "key TEXT PRIMARY KEY, html TEXT NOT NULL, summary TEXT, "
+                "last_used REAL NOT NULL)"
+            )
+        return self._conn
+
+    @staticmethod
+    def key(block, rewrite_url=None):
+        """
+        Returns the cache key of a scanned Block.
+
+        The URL rewriter is part of the key because link and image URLs in
+        the fragment depend on it.
+        """
+        digest = hashlib.sha256()
+        header = f"{PARSER_VERSION}\0{block.block_type.value}\0{block.level}\0"
+        digest.update(header.encode())
+        digest.update(repr(rewrite_url).encode())
+        digest.update(b"\0")
+        digest.update(block.text.encode())
+        return digest.hexdigest()
+
+    def _lookup(self, key):
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = (
+                self._connect()
+                .execute("SELECT html, summary FROM fragments WHERE key = ?", (key,))
+                .fetchone()
+            )
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._touched.add(key)
+        return entry
+
+    def get(self, key):
+        """Returns the cached HTML for `key`, or None."""
+        entry = self._lookup(key)
+        return entry[0] if entry is not None else None
+
+    def put(self, key, html, summary=None):
+        """
+        Stores the HTML for `key` (written on the next flush()), with the
+        block's summary from markdown_blocks.convert_block.
+        """
+        self._pending[key] = (html, json.dumps(summary))
+
+    def flush(self):
+        """Writes buffered inserts and last-used times in one transaction."""
+        if not self._pending and not self._touched:
+            return
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO fragments (key, html, summary, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (key, html, summary, now)
+                    for key, (html, summary) in self._pending.items()
+                ),
+            )
+            conn.executemany(
+                "UPDATE fragments SET last_used = ? WHERE key = ?",
+                ((now, key) for key in self._touched),
+            )
+        self._pending.clear()
+        self._touched.clear()
+
+    def evict(self):
+        """
+        Drops least recently used fragments beyond `max_entries`.
+
+        Returns:
+            int: Number of fragments removed
+        """
+        self.flush()
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM fragments WHERE key IN ("
+                "SELECT key FROM fragments ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        return cursor.rowcount
+
+    def close(self):
+        """Flushes and closes the sqlite connection."""
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def render_block(self, block, rewrite_url, render):
+        """
+        Returns the block's HTML as a LeafNode, rendering it on a miss.
+
+        Args:
+            block (Block): Block from scan_blocks()
+            rewrite_url (callable): URL rewriter used for the block
+            render (callable): Called with no arguments on a miss; must
+                return the block's (HTMLNode, summary), as
+                markdown_blocks.convert_block does
+
+        Returns:
+            tuple[LeafNode, tuple | None]: Raw HTML node (no tag) holding
+            the fragment, and the block's summary
+        """
+        key = RenderCache.key(block, rewrite_url)
+        entry = self._lookup(key)
+        if entry is None:
+            node, summary = render()
+            html = node.to_html()
+            self.put(key, html, summary)
+            return LeafNode(None, html), summary
+        html, summary = entry
+        summary = json.loads(summary) if summary is not None else None
+        return LeafNode(None, html), summary
@@ -0,0 +1,418 @@
+import json
+import os
+
+from buildio import write_if_changed
+from site_index import collect_metadata
+
+SEARCH_DIR_NAME = "search"
+SEARCH_STATE_NAME = "search-terms.json"
+SEARCH_INDEX_VERSION = 1
+PREFIX_LENGTH = 2
+
+SEARCH_JS = """\
+// Client-side search over the index written by search_index.py.
+// Usage: <script src="/search/search.js"></script>
+//        ssgSearch("balrog wizard").then(results => ...)  // [{url, title}]
+(function () {
+  var base = new URL(".", document.currentScript.src);
+  var index = null;
+  var shards = {};
+
+  function fetchIndex() {
+    if (!index) {
+      index = fetch(new URL("index.json", base)).then(function (r) {
+        return r.json();
+      });
+    }
+    return index;
+  }
+
+  function shardName(term, prefixLength) {
+    var prefix = Array.from(term).slice(0, prefixLength).join("");
+    return Array.from(new TextEncoder().encode(prefix), function (b) {
+      return b.toString(16).padStart(2, "0");
+    }).join("");
+  }
+
+  function readVarint(bytes, state) {
+    var value = 0, shift = 0, b;
+    do {
+      b = bytes[state.pos++];
+      value += (b & 0x7f) * Math.pow(2, shift);
+      shift += 7;
+    } while (b & 0x80);
+    return value;
+  }
+
+  function decodeShard(buffer) {
+    var bytes = new Uint8Array(buffer), state = {pos: 0};
+    var decoder = new TextDecoder(), terms = {};
+    while (state.pos < bytes.length) {
+      var length = readVarint(bytes, state);
+      var term = decoder.decode(bytes.subarray(state.pos, state.pos + length));
+      state.pos += length;
+      var count = readVarint(bytes, state), doc = 0, postings = new Map();
+      for (var i = 0; i < count; i++) {
+        doc += readVarint(bytes, state);
+        postings.set(doc, readVarint(bytes, state));
+      }
+      terms[term] = postings;
+    }
+    return terms;
+  }
+
+  function loadShard(name) {
+    if (!shards[name]) {
+      shards[name] = fetch(new URL(name + ".bin", base))
+        .then(function (r) { return r.ok ? r.arrayBuffer() : new ArrayBuffer(0); })
+        .then(decodeShard);
+    }
+    return shards[name];
+  }
+
+  window.ssgSearch = function (query) {
+    var terms = (query.toLowerCase().match(/[\\p{L}\\p{N}_]+/gu) || []);
+    return fetchIndex().then(function (idx) {
+      if (!terms.length) return [];
+      return Promise.all(terms.map(function (term) {
+        var name = shardName(term, idx.prefix);
+        if (idx.shards.indexOf(name) < 0) return new Map();
+        return loadShard(name).then(function (t) { return t[term] || new Map(); });
+      })).then(function (lists) {
+        var scores = new Map(lists[0]);
+        lists.slice(1).forEach(function (postings) {
+          scores.forEach(function (score, doc) {
+            if (postings.has(doc)) scores.set(doc, score + postings.get(doc));
+            else scores.delete(doc);
+          });
+        });
+        return Array.from(scores)
+          .sort(function (a, b) { return b[1] - a[1] || a[0] - b[0]; })
+          .map(function (entry) {
+            var doc = idx.docs[entry[0]];
+            return {url: doc[0], title: doc[1]};
+          });
+      });
+    });
+  };
+})();
+"""
+
+
+def encode_varint(value, out):
+    """Appends `value` to the bytearray `out` as an unsigned LEB128 varint."""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, pos):
+    """
+    Reads an unsigned LEB128 varint.
+
+    Returns:
+        tuple[int, int]: (value, position after the varint)
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def shard_name(term, prefix_length=PREFIX_LENGTH):
+    """
+    Returns the shard a term belongs to: the hex UTF-8 of its first characters.
+
+    Example:
+        >>> shard_name("balrog")
+        '6261'
+    """
+    return term[:prefix_length].encode("utf-8").hex()
+
+
+def encode_shard(terms):
+    """
+    Encodes the postings of one shard.
+
+    Each term is written as varint byte length, UTF-8 bytes, varint posting
+    count, then (doc id delta, term frequency) varint pairs with doc ids in
+    ascending order.
+
+    Args:
+        terms (dict[str, dict[int, int]]): term -> {doc id: frequency}
+
+    Returns:
+        bytes: The shard file contents
+    """
+    out = bytearray()
+    for term in sorted(terms):
+        encoded = term.encode("utf-8")
+        encode_varint(len(encoded), out)
+        out += encoded
+        postings = terms[term]
+        encode_varint(len(postings), out)
+        previous = 0
+        for doc in sorted(postings):
+            encode_varint(doc - previous, out)
+            encode_varint(postings[doc], out)
+            previous = doc
+    return bytes(out)
+
+
+def decode_shard(data):
+    """Inverse of encode_shard."""
+    terms = {}
+    pos = 0
+    while pos < len(data):
+        length, pos = decode_varint(data, pos)
+        term = data[pos : pos + length].decode("utf-8")
+        pos += length
+        count, pos = decode_varint(data, pos)
+        postings = {}
+        doc = 0
+        for _ in range(count):
+            delta, pos = decode_varint(data, pos)
+            doc += delta
+            postings[doc], pos = decode_varint(data, pos)
+        terms[term] = postings
+    return terms
+
+
+def _read_shard(path):
+    """Returns the decoded shard at `path`, or None if it cannot be read."""
+    try:
+        with open(path, "rb") as f:
+            return decode_shard(f.read())
+    except (OSError, IndexError, UnicodeDecodeError):
+        return None
+
+
+def _load_state(index_path, state_path, prefix_length):
+    """
+    Returns (docs, shards, terms) of the previous build: the doc list and
+    shard names of its index.json, and the terms of every doc URL from its
+    state file. terms is None when the state file is missing or does not
+    belong to that index.json, and everything is empty without one.
+    """
+    try:
+        with open(index_path) as f:
+            previous = json.load(f)
+        if (
+            previous.get("version") != SEARCH_INDEX_VERSION
+            or previous.get("prefix") != prefix_length
+        ):
+            return [], set(), None
+        docs, shards = previous["docs"], set(previous["shards"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return [], set(), None
+
+    if state_path is None:
+        return docs, shards, None
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+        if state.get("docs") != docs or state.get("prefix") != prefix_length:
+            return docs, shards, None
+        return docs, shards, state["terms"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        return docs, shards, None
+
+
+def build_search_index(
+    site_index, dest_dir, prefix_length=PREFIX_LENGTH, state_path=None, pages=None
+):
+    """
+    Writes a client-side full-text search index for the site.
+
+    The inverted index is built from the "terms" that site_index.PageMetadata
+    collected while each page was parsed, so no HTML is read. Output, in
+    `dest_dir`/search/:
+      * index.json: {"version", "prefix", "docs": [[url, title] | null],
+        "shards": [shard names]}
+      * <shard>.bin: postings of every term sharing a prefix (encode_shard)
+      * search.js: loader exposing ssgSearch(query) -> [{url, title}]
+
+    Doc ids are kept from the previous index.json and freed ids are reused,
+    so editing one page only changes the shards of the terms it contains.
+    The terms of every page are kept in the build-only `state_path` (they
+    are not published with the site index). With it, the terms of each doc
+    are compared with the previous build's and only the shards of terms
+    that changed are decoded, patched and encoded again; pages whose record
+    has no terms (an incremental build did not render them) keep the terms
+    stored there. Without a usable state file every shard is rebuilt.
+    Given `pages`, only those pages' terms are compared; the other pages
+    are taken to be as the state file has them.
+    Files whose bytes did not change are not rewritten. The function runs
+    once in the parent process after all pages are rendered, which keeps it
+    safe with --jobs.
+
+    Args:
+        site_index (SiteIndex): Metadata of every page
+        dest_dir (str): Output directory of the site
+        prefix_length (int): Characters of a term that select its shard
+        state_path (str, optional): Build-only file holding every page's
+            terms (see search_state_path)
+        pages (set[str], optional): Output paths of the pages added,
+            regenerated or removed since the state file was written
+            (SiteIndex.changed); None compares every page
+
+    Returns:
+        dict: {"shards": number of shards, "encoded": shards encoded,
+        "written": files rewritten}
+    """
+    search_dir = os.path.join(dest_dir, SEARCH_DIR_NAME)
+    os.makedirs(search_dir, exist_ok=True)
+    index_path = os.path.join(search_dir, "index.json")
+
+    previous_docs, previous_shards, previous_terms = _load_state(
+        index_path, state_path, prefix_length
+    )
+    incremental = previous_terms is not None
+
+    records = sorted(site_index.records.items(), key=lambda item: item[1]["path"])
+    ids = {}
+    urls = {record["url"] for _, record in records}
+    docs = [
+        doc if doc is not None and doc[0] in urls else None for doc in previous_docs
+    ]
+    for doc_id, doc in enumerate(docs):
+        if doc is not None:
+            ids.setdefault(doc[0], doc_id)
+    free = (doc_id for doc_id, doc in enumerate(docs) if doc is None)
+
+    doc_terms = {}
+    candidates = set()
+    for dest_path, record in records:
+        doc_id = ids.get(record["url"])
+        if doc_id is None:
+            doc_id = next(free, None)
+            if doc_id is None:
+                doc_id = len(docs)
+                docs.append(None)
+            ids[record["url"]] = doc_id
+        docs[doc_id] = [record["url"], record["title"]]
+        candidate = (
+            pages is None
+            or dest_path in pages
+            or doc_id >= len(previous_docs)
+            or previous_docs[doc_id] is None
+            or previous_docs[doc_id][0] != record["url"]
+        )
+        terms = record.get("terms") if candidate or not incremental else None
+        if terms is None and incremental:
+            terms = previous_terms.get(record["url"], record.get("terms"))
+        if terms is None:
+            terms = collect_metadata(record["source"]).terms
+        doc_terms[doc_id] = terms
+        if candidate:
+            candidates.add(doc_id)
+    while docs and docs[-1] is None:
+        docs.pop()
+
+    if incremental:
+        # Docs of removed pages.
+        candidates.update(
+            doc_id
+            for doc_id, doc in enumerate(previous_docs)
+            if doc is not None and doc[0] not in urls
+        )
+        old_terms = {
+            doc_id: previous_terms.get(previous_docs[doc_id][0], {})
+            for doc_id in candidates
+            if doc_id < len(previous_docs) and previous_docs[doc_id] is not None
+        }
+        changed = {
+            doc_id
+            for doc_id in candidates
+            if old_terms.get(doc_id) != doc_terms.get(doc_id)
+        }
+        shards = set(previous_shards)
+    else:
+        old_terms = {}
+        changed = set(doc_terms)
+        shards = set()
+
+    # Postings that changed, by shard and term (None: posting removed).
+    changes = {}
+    for doc_id in changed:
+        old = old_terms.get(doc_id, {})
+        new = doc_terms.get(doc_id, {})
+        for term, frequency in new.items():
+            if old.get(term) != frequency:
+                name = shard_name(term, prefix_length)
+                changes.setdefault(name, {}).setdefault(term, {})[doc_id] = frequency
+        for term in old:
+            if term not in new:
+                name = shard_name(term, prefix_length)
+                changes.setdefault(name, {}).setdefault(term, {})[doc_id] = None
+
+    encoded = written = 0
+    for name in sorted(changes):
+        path = os.path.join(search_dir, name + ".bin")
+        terms = {}
+        if name in shards:
+            terms = _read_shard(path)
+            if terms is None:
+                terms = {}
+                for doc_id, page_terms in doc_terms.items():
+                    for term, frequency in page_terms.items():
+                        if shard_name(term, prefix_length) == name:
+                            terms.setdefault(term, {})[doc_id] = frequency
+        for term, postings in changes[name].items():
+            term_postings = terms.setdefault(term, {})
+            for doc_id, frequency in postings.items():
+                if frequency is None:
+                    term_postings.pop(doc_id, None)
+                else:
+                    term_postings[doc_id] = frequency
+        terms = {term: postings for term, postings in terms.items() if postings}
+
+        if terms:
+            shards.add(name)
+            encoded += 1
+            written += write_if_changed(path, encode_shard(terms))[0]
+        else:
+            shards.discard(name)
+    for entry in os.listdir(search_dir):
+        if entry.endswith(".bin") and entry[:-4] not in shards:
+            os.remove(os.path.join(search_dir, entry))
+            written += 1
+
+    index = {
+        "version": SEARCH_INDEX_VERSION,
+        "prefix": prefix_length,
+        "docs": docs,
+        "shards": sorted(shards),
+    }
+    written += write_if_changed(
+        index_path, json.dumps(index, separators=(",", ":")).encode("utf-8")
+    )[0]
+    written += write_if_changed(
+        os.path.join(search_dir, "search.js"), SEARCH_JS.encode("utf-8")
+    )[0]
+
+    if state_path is not None:
+        os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+        state = {
+            "prefix": prefix_length,
+            "docs": docs,
+            "terms": {
+                doc[0]: doc_terms[doc_id] for doc_id, doc in enumerate(docs) if doc
+            },
+        }
+        write_if_changed(
+            state_path,
+            json.dumps(state, sort_keys=True, separators=(",", ":")).encode("utf-8"),
+        )
+    return {"shards": len(shards), "encoded": encoded, "written": written}
+
+
+def search_state_path(manifest_path):
+    """Returns the search state file kept next to a build manifest."""
+    return os.path.join(os.path.dirname(manifest_path), SEARCH_STATE_NAME)
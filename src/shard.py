@@ -0,0 +1,234 @@
+import heapq
+import json
+import os
+import shutil
+
+from gencontent import sync_directory_contents
+from manifest import BuildManifest, hash_file
+from search_index import build_search_index, search_state_path
+from site_index import SITE_INDEX_NAME, SiteIndex
+
+DEFAULT_SHARD_ROOT = "shards"
+SHARD_MANIFEST = ".shard.json"
+
+
+def parse_shard(spec):
+    """
+    Parses a shard specification such as "2/4".
+
+    Shards are numbered from 1 to N.
+
+    Returns:
+        tuple[int, int]: (index, count)
+
+    Raises:
+        ValueError: If the specification is malformed or out of range
+    """
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {spec!r}, expected i/N (e.g. 1/4)")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {spec!r}, need 1 <= i <= N")
+    return index, count
+
+
+def shard_dir(index, count, root=DEFAULT_SHARD_ROOT):
+    """Returns the output directory of shard `index` of `count`."""
+    return os.path.join(root, f"shard-{index}-of-{count}")
+
+
+def partition_pages(pages, count):
+    """
+    Splits page jobs into `count` shards of about the same total size.
+
+    Uses the greedy longest-processing-time rule: pages are taken from the
+    largest source to the smallest and each goes to the shard with the
+    fewest bytes so far. Sizes come from a stat() pre-scan of the sources.
+    Ties are broken by path and shard number, so every machine computes
+    the same partition from the same content tree.
+
+    Args:
+        pages (list[tuple]): Jobs whose first item is the markdown path,
+            e.g. the output of gencontent.collect_page_jobs
+        count (int): Number of shards
+
+    Returns:
+        list[list[tuple]]: `count` lists of jobs, each sorted by path
+
+    Example:
+        >>> partition_pages(collect_page_jobs("content", "docs", "template.html"), 2)
+        [[...pages of shard 1...], [...pages of shard 2...]]
+    """
+    sized = sorted(
+        ((os.path.getsize(job[0]), job) for job in pages),
+        key=lambda item: (-item[0], item[1][0]),
+    )
+    shards = [[] for _ in range(count)]
+    totals = [(0, index) for index in range(count)]
+    for size, job in sized:
+        total, target = heapq.heappop(totals)
+        shards[target].append(job)
+        heapq.heappush(totals, (total + size, target))
+    for jobs in shards:
+        jobs.sort()
+    return shards
+
+
+def write_shard_manifest(dest_dir, index, count, base_path, options=None, outputs=None):
+    """
+    Records the files of a finished shard for merge_shards.
+
+    Written to SHARD_MANIFEST inside the shard's output directory, with the
+    hash of every file so the merge can tell real conflicts from identical
+    duplicates, the build options the pages were rendered with (see
+    manifest.BuildManifest), e.g. whether they link fingerprinted assets,
+    and the shard's build manifest entries (`outputs`), from which the
+    merge writes the manifest of the whole site.
+    """
+    files = {}
+    for dir_path, _, names in os.walk(dest_dir):
+        for name in names:
+            path = os.path.join(dir_path, name)
+            rel_path = os.path.relpath(path, dest_dir)
+            if rel_path != SHARD_MANIFEST:
+                files[rel_path] = hash_file(path)
+
+    with open(os.path.join(dest_dir, SHARD_MANIFEST), "w") as f:
+        json.dump(
+            {
+                "shard": index,
+                "count": count,
+                "base_path": base_path,
+                "options": options or {},
+                "outputs": outputs or {},
+                "files": files,
+            },
+            f,
+            sort_keys=True,
+        )
+
+
+def find_shards(root=DEFAULT_SHARD_ROOT):
+    """Returns the shard output directories under `root`, sorted."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        os.path.join(root, name)
+        for name in os.listdir(root)
+        if os.path.isfile(os.path.join(root, name, SHARD_MANIFEST))
+    )
+
+
+def merge_shards(
+    shard_dirs, dest_dir="docs", static_dir="static", images=None, manifest_path=None
+):
+    """
+    Combines shard outputs and static assets into the final site.
+
+    Every check runs before anything is written:
+      * all shards come from the same split (same N, base_path and build
+        options) and each of the N shards is present exactly once
+      * no output path is produced by two shards with different content
+      * no page overwrites a static asset
+
+    The site indexes of the shards are combined into one, from which the
+    search index is built, and so are their build manifests, so that the
+    next incremental build of `dest_dir` only renders what changed.
+
+    Args:
+        shard_dirs (list[str]): Output directories of the shard builds
+        dest_dir (str): Final output directory (replaced)
+        static_dir (str): Static assets copied next to the pages
+        images (images.ImagePipeline, optional): Optimizes the images of
+            static_dir, as in a normal build
+        manifest_path (str, optional): Where to write the merged build
+            manifest (see manifest.BuildManifest)
+
+    Returns:
+        int: Number of pages merged
+
+    Raises:
+        Exception: If a shard is missing, duplicated or from another split,
+            or if outputs conflict. All conflicts are listed.
+    """
+    shards = []
+    for path in shard_dirs:
+        with open(os.path.join(path, SHARD_MANIFEST)) as f:
+            shards.append((path, json.load(f)))
+    if not shards:
+        raise Exception("No shard outputs to merge")
+
+    count = shards[0][1]["count"]
+    base_path = shards[0][1]["base_path"]
+    options = shards[0][1].get("options", {})
+    for path, info in shards:
+        if (
+            info["count"] != count
+            or info["base_path"] != base_path
+            or info.get("options", {}) != options
+        ):
+            raise Exception(f"Shard {path} comes from a different build split")
+    indexes = sorted(info["shard"] for _, info in shards)
+    if indexes != list(range(1, count + 1)):
+        raise Exception(f"Expected shards 1..{count}, got {indexes}")
+
+    owners = {}
+    conflicts = []
+    for path, info in shards:
+        for rel_path, digest in info["files"].items():
+            if rel_path == SITE_INDEX_NAME:
+                continue
+            previous = owners.setdefault(rel_path, (path, digest))
+            if previous[1] != digest:
+                conflicts.append(f"{rel_path}: {previous[0]} and {path} differ")
+    if os.path.isdir(static_dir):
+        for dir_path, _, names in os.walk(static_dir):
+            for name in names:
+                rel_path = os.path.relpath(os.path.join(dir_path, name), static_dir)
+                if rel_path in owners:
+                    conflicts.append(
+                        f"{rel_path}: {owners[rel_path][0]} overwrites a static asset"
+                    )
+    if conflicts:
+        raise Exception("Shard merge conflicts:\n  " + "\n  ".join(sorted(conflicts)))
+
+    if os.path.exists(dest_dir):
+        shutil.rmtree(dest_dir)
+    os.makedirs(dest_dir)
+    static_files = []
+    if os.path.isdir(static_dir):
+        static_files = sync_directory_contents(
+            static_dir,
+            dest_dir,
+            images=images,
+            fingerprint=options.get("fingerprint", False),
+        )["files"]
+
+    for rel_path, (path, _) in sorted(owners.items()):
+        dest_path = os.path.join(dest_dir, rel_path)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        shutil.copy2(os.path.join(path, rel_path), dest_path)
+
+    site_index = SiteIndex(dest_dir, base_path)
+    for path, _ in shards:
+        shard_index = SiteIndex.load(path, base_path)
+        if shard_index is None:
+            continue
+        for record in shard_index:
+            site_index.records[os.path.join(dest_dir, record["path"])] = record
+    site_index.save()
+    build_search_index(
+        site_index,
+        dest_dir,
+        state_path=search_state_path(manifest_path) if manifest_path else None,
+    )
+
+    if manifest_path is not None:
+        outputs = {}
+        for path, info in shards:
+            for output, entry in info.get("outputs", {}).items():
+                rel_path = os.path.relpath(output, path)
+                outputs[os.path.join(dest_dir, rel_path)] = entry
+        BuildManifest(manifest_path, outputs, static_files, options).save()
+    return len(owners)
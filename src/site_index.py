@@ -0,0 +1,266 @@
+import json
+import os
+import re
+
+from buildio import output_file
+from markdown_blocks import BlockType, block_summary, scan_blocks
+
+SITE_INDEX_NAME = "site-index.jsonl"
+
+_TERM_PATTERN = re.compile(r"\w+")
+
+
+class PageMetadata:
+    """
+    Metadata of one page, collected from its blocks while it is parsed.
+
+    markdown_to_html_node and iter_markdown_html call add_block() for every
+    block they scan, with the summary of its text taken from the inline
+    parse that rendered it (or that the render cache or block memo kept),
+    so collecting costs no extra pass over the markdown. Instances are
+    plain data and can be returned from pool workers.
+
+    A `title_only` instance only looks for the title, which every page
+    needs; use it when neither a site index nor asset dependencies are
+    recorded.
+
+    Attributes:
+        title (str | None): Text of the first "# " line, as extract_title
+            finds it
+        headings (list[list]): [level, plain text] of every heading
+        links (list[str]): Link URLs, as written in the markdown
+        images (list[list[str]]): [alt, src] of every image
+        words (int): Number of words outside code blocks
+        terms (dict[str, int]): Lowercased search terms of the page's text
+            (outside code blocks) and how often each occurs
+
+    Args:
+        title_only (bool): Skip everything but the title
+
+    Example:
+        >>> metadata = PageMetadata()
+        >>> markdown_to_html_node(md, metadata=metadata)
+        >>> metadata.title
+        'Tolkien Fan Club'
+    """
+
+    __slots__ = (
+        "title",
+        "headings",
+        "links",
+        "images",
+        "words",
+        "terms",
+        "title_only",
+    )
+
+    def __init__(self, title_only=False) -> None:
+        self.title_only = title_only
+        self.title = None
+        self.headings = []
+        self.links = []
+        self.images = []
+        self.words = 0
+        self.terms = {}
+
+    def add_block(self, block, summary=None):
+        """
+        Adds the metadata of one Block from markdown_blocks.scan_blocks.
+
+        Args:
+            block (Block): The block
+            summary (tuple, optional): Its summary from
+                markdown_blocks.convert_block; computed here if missing
+        """
+        block_type = block.block_type
+
+        if self.title is None:
+            for line in block.lines:
+                line = line.lstrip()
+                if line.startswith("# "):
+                    self.title = line[2:].strip()
+                    break
+
+        if self.title_only or block_type == BlockType.CODE:
+            return
+
+        if summary is None:
+            summary = block_summary(block)
+        plain, links, images = summary
+        self.links.extend(links)
+        self.images.extend([alt, src] for alt, src in images)
+
+        if block_type == BlockType.HEADING:
+            self.headings.append([block.level, plain.strip()])
+        self.words += len(plain.split())
+        terms = self.terms
+        for term in _TERM_PATTERN.findall(plain.lower()):
+            terms[term] = terms.get(term, 0) + 1
+
+    def to_dict(self):
+        return {
+            "title": self.title,
+            "headings": self.headings,
+            "links": self.links,
+            "images": self.images,
+            "words": self.words,
+            "terms": self.terms,
+        }
+
+
+def collect_metadata(source_path):
+    """
+    Collects the metadata of a markdown file without rendering it.
+
+    Used for pages that an incremental build skipped but whose record is
+    missing from the index.
+    """
+    metadata = PageMetadata()
+    with open(source_path, "r") as f:
+        for block in scan_blocks(f):
+            metadata.add_block(block)
+    return metadata
+
+
+def page_url(rel_path, base_path=None):
+    """
+    Returns the public URL of an output file.
+
+    Example:
+        >>> page_url("blog/tom/index.html", "/repo/")
+        '/repo/blog/tom/'
+    """
+    base_path = base_path or "/"
+    if not base_path.endswith("/"):
+        base_path += "/"
+    rel_path = rel_path.replace(os.sep, "/")
+    if rel_path == "index.html":
+        rel_path = ""
+    elif rel_path.endswith("/index.html"):
+        rel_path = rel_path[: -len("index.html")]
+    return base_path + rel_path
+
+
+class SiteIndex:
+    """
+    Per-page metadata of the whole site, written as JSON lines.
+
+    One record per page, sorted by output path:
+        {"path": "blog/tom/index.html", "url": "/blog/tom/",
+         "source": "content/blog/tom/index.md", "title": ..., "headings": ...,
+         "links": ..., "images": ..., "words": ...}
+
+    The file lives next to the pages (SITE_INDEX_NAME in the output
+    directory), so navigation, sitemaps and search can be generated from it
+    without parsing any HTML. Incremental builds load the previous index and
+    only replace the records of the pages they regenerate.
+
+    Records of pages generated in this process also carry the page's search
+    "terms". They are only needed to build the search index, which keeps
+    them in its own build-only state (search_index.build_search_index), so
+    the published file leaves them out.
+
+    The published line of every record is kept once it is known, so save()
+    only encodes the records that add() replaced; records must not be
+    changed in place. `changed` holds the output paths added, replaced or
+    dropped since the index was created or loaded, for consumers that
+    update incrementally (the search index); they clear it once done.
+
+    Args:
+        dest_dir (str): Output directory of the build
+        base_path (str, optional): Base URL path of the site
+        records (dict, optional): Output path -> record
+    """
+
+    def __init__(self, dest_dir, base_path=None, records=None) -> None:
+        self.dest_dir = dest_dir
+        self.base_path = base_path
+        self.records = records if records is not None else {}
+        self.changed = set()
+        self._lines = {}
+
+    @property
+    def path(self):
+        return os.path.join(self.dest_dir, SITE_INDEX_NAME)
+
+    @classmethod
+    def load(cls, dest_dir, base_path=None):
+        """
+        Loads the index written by the previous build into `dest_dir`.
+
+        Returns:
+            SiteIndex | None: None if there is no readable index
+        """
+        records = {}
+        lines = {}
+        try:
+            with open(os.path.join(dest_dir, SITE_INDEX_NAME)) as f:
+                for line in f:
+                    record = json.loads(line)
+                    dest_path = os.path.join(dest_dir, record["path"])
+                    records[dest_path] = record
+                    if "terms" not in record:
+                        lines[dest_path] = line.rstrip("\n")
+        except (OSError, ValueError, KeyError):
+            return None
+        site_index = cls(dest_dir, base_path, records)
+        site_index._lines = lines
+        return site_index
+
+    def add(self, dest_path, source_path, metadata):
+        """Stores the metadata of a page that was just generated."""
+        rel_path = os.path.relpath(dest_path, self.dest_dir).replace(os.sep, "/")
+        record = {"path": rel_path, "url": page_url(rel_path, self.base_path)}
+        record["source"] = source_path
+        record.update(metadata.to_dict())
+        self.records[dest_path] = record
+        self._lines.pop(dest_path, None)
+        self.changed.add(dest_path)
+
+    def fill_missing(self, outputs):
+        """
+        Adds records for built pages the index does not know yet.
+
+        Args:
+            outputs (dict): BuildManifest.outputs (output path -> entry)
+        """
+        for dest_path, entry in outputs.items():
+            if dest_path not in self.records:
+                self.add(dest_path, entry["source"], collect_metadata(entry["source"]))
+
+    def prune(self, dest_paths):
+        """Drops the records of pages not in `dest_paths`."""
+        for dest_path in list(self.records):
+            if dest_path not in dest_paths:
+                del self.records[dest_path]
+                self._lines.pop(dest_path, None)
+                self.changed.add(dest_path)
+
+    def __iter__(self):
+        """Yields the records sorted by output path."""
+        for _, record in sorted(self.records.items(), key=lambda item: item[1]["path"]):
+            yield record
+
+    def save(self, terms=False):
+        """
+        Writes the index atomically to SITE_INDEX_NAME in dest_dir, leaving
+        the file alone if it did not change.
+
+        Args:
+            terms (bool): Keep the records' search terms, for indexes that
+                are not published (shard outputs, merged later)
+        """
+        os.makedirs(self.dest_dir, exist_ok=True)
+        records = sorted(self.records.items(), key=lambda item: item[1]["path"])
+        with output_file(self.path) as f:
+            for dest_path, record in records:
+                line = None if terms else self._lines.get(dest_path)
+                if line is None:
+                    if not terms and "terms" in record:
+                        record = dict(record)
+                        del record["terms"]
+                    line = json.dumps(record, sort_keys=True, separators=(",", ":"))
+                    if not terms:
+                        self._lines[dest_path] = line
+                f.write(line)
+                f.write("\n")
@@ -0,0 +1,155 @@
+import os
+import re
+
+from minify import minify_html
+
+_TEMPLATE_TOKEN_PATTERN = re.compile(r'\{\{\s*(\w+)\s*\}\}|((?:href|src)=")(/[^"]*)')
+
+_template_cache = {}
+
+
+class Template:
+    """
+    An HTML template parsed once into static chunks, slots and URLs.
+
+    Slots are written as {{ Name }}. Root-relative href="/..." and
+    src="/..." attributes are kept as separate URL parts so they can be
+    rewritten for the base path while rendering, instead of running a
+    search and replace over every finished page.
+
+    Args:
+        text (str): Template source
+
+    Example:
+        >>> template = Template('<title>{{ Title }}</title><a href="/">home</a>')
+        >>> template.render({"Title": "Hi"}, UrlRewriter("/repo/"))
+        '<title>Hi</title><a href="/repo/">home</a>'
+    """
+
+    TEXT = "text"
+    SLOT = "slot"
+    URL = "url"
+
+    def __init__(self, text) -> None:
+        self.parts = []
+        position = 0
+
+        for match in _TEMPLATE_TOKEN_PATTERN.finditer(text):
+            slot_name, attr_prefix, url = match.groups()
+            if slot_name is not None:
+                self._add_text(text[position : match.start()])
+                self.parts.append((Template.SLOT, slot_name, match.group(0)))
+            else:
+                self._add_text(text[position : match.start()] + attr_prefix)
+                self.parts.append((Template.URL, url, url))
+            position = match.end()
+
+        self._add_text(text[position:])
+
+    def _add_text(self, chunk):
+        if not chunk:
+            return
+        if self.parts and self.parts[-1][0] == Template.TEXT:
+            merged = self.parts[-1][1] + chunk
+            self.parts[-1] = (Template.TEXT, merged, merged)
+        else:
+            self.parts.append((Template.TEXT, chunk, chunk))
+
+    @property
+    def urls(self):
+        """Root-relative URLs in the template's href/src attributes."""
+        return [value for kind, value, _ in self.parts if kind == Template.URL]
+
+    def iter_render(self, values, rewrite_url=None):
+        """
+        Yields the rendered template as string fragments.
+
+        Args:
+            values (dict): Slot name -> str, or an iterable of str fragments
+                (e.g. HTMLNode.iter_html()) which is streamed as-is.
+                Slots without a value are left untouched.
+            rewrite_url (callable, optional): Applied to every root-relative
+                href/src URL in the template.
+
+        Yields:
+            str: Consecutive fragments of the page
+        """
+        return _render_parts(self.parts, values, rewrite_url)
+
+    def render_around(self, slot, values, rewrite_url=None):
+        """
+        Renders the parts of the template before and after one slot.
+
+        Lets callers locate a slot's value inside a page that was rendered
+        with the same values, e.g. to reuse the content of a finished page.
+
+        Returns:
+            tuple[str, str] | None: (before, after), or None unless the
+            template contains `slot` exactly once
+        """
+        positions = [
+            index
+            for index, (kind, value, _) in enumerate(self.parts)
+            if kind == Template.SLOT and value == slot
+        ]
+        if len(positions) != 1:
+            return None
+        position = positions[0]
+        before = _render_parts(self.parts[:position], values, rewrite_url)
+        after = _render_parts(self.parts[position + 1 :], values, rewrite_url)
+        return "".join(before), "".join(after)
+
+    def render(self, values, rewrite_url=None):
+        """
+        Renders the template to a single string with one join.
+
+        See iter_render() for the arguments.
+        """
+        return "".join(self.iter_render(values, rewrite_url))
+
+
+def _render_parts(parts, values, rewrite_url):
+    for kind, value, source in parts:
+        if kind == Template.TEXT:
+            yield value
+        elif kind == Template.URL:
+            yield rewrite_url(value) if rewrite_url is not None else value
+        elif value not in values:
+            yield source
+        elif isinstance(values[value], str):
+            yield values[value]
+        else:
+            yield from values[value]
+
+
+def load_template(template_path, minify=False):
+    """
+    Returns the parsed Template for a file, caching it by path and mtime.
+
+    The file is only read and parsed again when its mtime or size changes,
+    so rendering thousands of pages reads the template once per process.
+
+    Args:
+        template_path (str): Path to the HTML template file
+        minify (bool): Strip the template's insignificant whitespace and
+            comments first (see minify.minify_html). Content rendered from
+            markdown has no formatting whitespace, so pages rendered with
+            the minified template come out minified.
+
+    Returns:
+        Template: The parsed template
+    """
+    st = os.stat(template_path)
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    key = (template_path, minify)
+    cached = _template_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with open(template_path, "r") as f:
+        text = f.read()
+    template = Template(minify_html(text) if minify else text)
+
+    _template_cache[key] = (stamp, template)
+    return template
@@ -0,0 +1,130 @@
+import json
+import os
+import tempfile
+import unittest
+
+from assets import (
+    ASSET_MANIFEST_NAME,
+    describe_static,
+    fingerprinted_path,
+    write_asset_manifest,
+)
+from gencontent import generate_pages_recursive, sync_directory_contents
+from manifest import BuildManifest, hash_file
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.content = os.path.join(root, "content")
+        self.dest = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(self.static)
+        os.makedirs(self.content)
+        self.css = os.path.join(self.static, "index.css")
+        self.write(self.css, "body {}")
+        self.write(os.path.join(self.static, "robots.txt"), "User-agent: *")
+        self.write(
+            self.template,
+            '<link href="/index.css" rel="stylesheet">{{ Content }}',
+        )
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def css_name(self):
+        return fingerprinted_path("index.css", hash_file(self.css))
+
+    def test_fingerprinted_path(self):
+        self.assertEqual(
+            fingerprinted_path("images/tom.png", "3f2a9c1b7d0e"),
+            "images/tom.3f2a9c1b.png",
+        )
+
+    def test_sync_renames_fingerprinted_files_only(self):
+        synced = sync_directory_contents(self.static, self.dest, fingerprint=True)
+        self.assertEqual(synced["files"], [self.css_name(), "robots.txt"])
+        self.assertEqual(
+            synced["assets"],
+            {"/index.css": {"source": self.css, "url": "/" + self.css_name()}},
+        )
+        self.assertEqual(
+            describe_static(self.static, fingerprint=True), synced["assets"]
+        )
+
+        old_name = self.css_name()
+        self.write(self.css, "body { color: red }")
+        second = sync_directory_contents(
+            self.static, self.dest, synced["files"], fingerprint=True
+        )
+        self.assertNotEqual(self.css_name(), old_name)
+        self.assertEqual(second["removed"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, old_name)))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, self.css_name())))
+
+    def test_pages_link_and_depend_on_fingerprinted_files(self):
+        manifest_path = os.path.join(self.tmp.name, "manifest.json")
+        page = os.path.join(self.dest, "index.html")
+
+        def build():
+            synced = sync_directory_contents(self.static, self.dest, fingerprint=True)
+            manifest = BuildManifest.load(manifest_path)
+            generate_pages_recursive(
+                self.content,
+                self.template,
+                self.dest,
+                "/repo/",
+                manifest,
+                assets=synced["assets"],
+            )
+            manifest.save()
+            with open(page) as f:
+                return f.read(), manifest
+
+        html, manifest = build()
+        self.assertIn(f'href="/repo/{self.css_name()}"', html)
+        self.assertEqual(manifest.dependents(self.css), [page])
+
+        self.write(self.css, "body { color: red }")
+        manifest = BuildManifest.load(manifest_path)
+        src = os.path.join(self.content, "index.md")
+        self.assertFalse(manifest.is_fresh(page, src, self.template, "/repo/"))
+        html, _ = build()
+        self.assertIn(f'href="/repo/{self.css_name()}"', html)
+
+    def test_write_asset_manifest(self):
+        assets = {
+            "/index.css": {"source": self.css, "url": "/index.0123abcd.css"},
+            "/images/a.png": {
+                "source": "static/images/a.png",
+                "url": "/images/a.89ef4567.png",
+                "srcset": [
+                    ["/images/a-480w.01234567.png", 480],
+                    ["/images/a.89ef4567.png", 928],
+                ],
+            },
+            "/images/b.png": {"source": "static/images/b.png", "srcset": []},
+        }
+        os.makedirs(self.dest)
+        path = write_asset_manifest(assets, self.dest)
+        self.assertEqual(path, os.path.join(self.dest, ASSET_MANIFEST_NAME))
+        with open(path) as f:
+            self.assertEqual(
+                json.load(f),
+                {
+                    "/images/a-480w.png": "/images/a-480w.01234567.png",
+                    "/images/a.png": "/images/a.89ef4567.png",
+                    "/index.css": "/index.0123abcd.css",
+                },
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
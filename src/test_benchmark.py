@@ -0,0 +1,44 @@
+import unittest
+
+from benchmark import compare_to_baseline, generate_corpus, generate_prose_corpus
+from markdown_blocks import markdown_to_html_node
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus_is_deterministic(self):
+        self.assertEqual(
+            generate_corpus(pages=3, seed=7), generate_corpus(pages=3, seed=7)
+        )
+        self.assertNotEqual(
+            generate_corpus(pages=3, seed=7), generate_corpus(pages=3, seed=8)
+        )
+
+    def test_corpus_options(self):
+        docs = generate_corpus(pages=2, blocks=10, code_share=1.0)
+        self.assertEqual(len(docs), 2)
+        self.assertEqual(docs[0].count("```"), 20)
+
+    def test_corpus_renders(self):
+        for doc in generate_corpus(pages=5, link_density=0.3, image_density=0.1):
+            html = markdown_to_html_node(doc).to_html()
+            self.assertTrue(html.startswith("<div><h1>"))
+
+    def test_prose_corpus_has_no_inline_markup(self):
+        docs = generate_prose_corpus(pages=3, blocks=20)
+        self.assertEqual(len(docs), 3)
+        for doc in docs:
+            self.assertFalse(set(doc) & set("[]()*_`"))
+            self.assertTrue(
+                markdown_to_html_node(doc).to_html().startswith("<div><h1>")
+            )
+
+    def test_compare_to_baseline(self):
+        baseline = {"results": {"to_html": 1.0, "build": 2.0}}
+        current = {"results": {"to_html": 1.05, "build": 3.0, "new": 1.0}}
+        self.assertEqual(
+            compare_to_baseline(current, baseline, 0.1), [("build", 2.0, 3.0)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
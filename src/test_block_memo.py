@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+from block_memo import BlockMemo
+from markdown_blocks import Block, BlockType, iter_markdown_html, markdown_to_html_node
+from render_cache import RenderCache
+from site_index import PageMetadata
+from urls import UrlRewriter
+
+
+class TestBlockMemo(unittest.TestCase):
+    md = "# Title\n\nSee [home](/x)\n\n- a\n- b\n\nSee [home](/x)\n\n```\ncode\n```"
+
+    def test_memoized_render_matches_plain(self):
+        rewrite_url = UrlRewriter("/repo/")
+        expected = markdown_to_html_node(self.md, rewrite_url).to_html()
+
+        memo = BlockMemo()
+        self.assertEqual(
+            markdown_to_html_node(self.md, rewrite_url, memo=memo).to_html(), expected
+        )
+        self.assertEqual((memo.hits, memo.misses), (1, 4))
+        self.assertEqual(
+            "".join(iter_markdown_html(self.md.split("\n"), rewrite_url, memo=memo)),
+            expected,
+        )
+        self.assertEqual((memo.hits, memo.misses), (6, 4))
+        self.assertEqual(memo.hit_rate(), 60.0)
+
+    def test_repeated_blocks_share_one_node(self):
+        memo = BlockMemo()
+        root = markdown_to_html_node(self.md, memo=memo)
+        self.assertIs(root.children[1], root.children[3])
+
+    def test_hits_still_fill_metadata(self):
+        memo = BlockMemo()
+        markdown_to_html_node(self.md, memo=memo)
+        metadata = PageMetadata()
+        markdown_to_html_node(self.md, memo=memo, metadata=metadata)
+        self.assertEqual(metadata.title, "Title")
+        self.assertEqual(memo.misses, 4)
+
+    def test_key_depends_on_url_rewriter_and_type(self):
+        block = Block(BlockType.PARAGRAPH, ["[a](/b)"])
+        memo = BlockMemo()
+        root = memo.render_block(
+            block, UrlRewriter("/"), lambda: (LeafStub("/b"), None)
+        )[0]
+        other = memo.render_block(
+            block, UrlRewriter("/repo/"), lambda: (LeafStub("/repo/b"), None)
+        )[0]
+        self.assertNotEqual(root.to_html(), other.to_html())
+        heading = Block(BlockType.HEADING, ["[a](/b)"], 1)
+        self.assertNotEqual(BlockMemo.key(block), BlockMemo.key(heading))
+
+    def test_evicts_least_recently_used(self):
+        memo = BlockMemo(max_entries=2)
+        blocks = [Block(BlockType.PARAGRAPH, [str(i)]) for i in range(3)]
+        for block in blocks[:2]:
+            memo.render_block(block, None, lambda: (LeafStub("x"), None))
+        memo.render_block(blocks[0], None, lambda: (LeafStub("x"), None))
+        memo.render_block(blocks[2], None, lambda: (LeafStub("x"), None))
+        self.assertEqual(len(memo), 2)
+        self.assertIn(BlockMemo.key(blocks[0]), memo._nodes)
+        self.assertNotIn(BlockMemo.key(blocks[1]), memo._nodes)
+
+    def test_misses_fall_through_to_render_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = RenderCache(os.path.join(tmp, "render.sqlite"))
+            memo = BlockMemo()
+            markdown_to_html_node(self.md, cache=cache, memo=memo)
+            markdown_to_html_node(self.md, cache=cache, memo=memo)
+            cache.close()
+        self.assertEqual((cache.hits, cache.misses), (0, 4))
+        self.assertEqual((memo.hits, memo.misses), (6, 4))
+
+
+class LeafStub:
+    def __init__(self, html):
+        self.html = html
+
+    def to_html(self):
+        return self.html
+
+
+if __name__ == "__main__":
+    unittest.main()
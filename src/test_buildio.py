@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+from buildio import BuildIO, replace_if_changed, write_if_changed
+
+
+class TestBuildIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_prefetch_keeps_order(self):
+        paths = []
+        for i in range(10):
+            path = os.path.join(self.root, f"{i}.md")
+            with open(path, "w") as f:
+                f.write(f"page {i}")
+            paths.append(path)
+        paths.append(os.path.join(self.root, "missing.md"))
+
+        with BuildIO(workers=3, max_pending=2) as io:
+            results = list(io.prefetch(paths))
+        self.assertEqual([path for path, _ in results], paths)
+        self.assertEqual(results[4][1].result(), "page 4")
+        with self.assertRaises(FileNotFoundError):
+            results[-1][1].result()
+
+    def test_write_creates_directories_once(self):
+        dest = os.path.join(self.root, "docs", "blog")
+        with BuildIO(workers=4, max_pending=2) as io:
+            for i in range(20):
+                io.write(os.path.join(dest, f"{i}.html"), f"<p>{i}</p>")
+            self.assertEqual(io.flush(), [])
+            self.assertEqual(io._dirs, {dest})
+        with open(os.path.join(dest, "7.html")) as f:
+            self.assertEqual(f.read(), "<p>7</p>")
+
+    def test_flush_reports_failed_writes(self):
+        blocker = os.path.join(self.root, "file")
+        with open(blocker, "w") as f:
+            f.write("")
+        bad = os.path.join(blocker, "page.html")
+        with BuildIO() as io:
+            io.write(bad, "x")
+            io.write(os.path.join(self.root, "ok.html"), "ok")
+            failures = io.flush()
+        self.assertEqual([path for path, _ in failures], [bad])
+        self.assertTrue(os.path.exists(os.path.join(self.root, "ok.html")))
+
+    def test_write_if_changed(self):
+        path = os.path.join(self.root, "page.html")
+        written, first = write_if_changed(path, "<p>a</p>")
+        self.assertTrue(written)
+        os.utime(path, ns=(0, first["mtime_ns"] - 10**9))
+        stamp = os.stat(path).st_mtime_ns
+
+        # Without a recorded fingerprint the file is hashed; with a stale
+        # one (mtime moved) as well.
+        self.assertFalse(write_if_changed(path, "<p>a</p>")[0])
+        self.assertFalse(write_if_changed(path, b"<p>a</p>", first)[0])
+        self.assertEqual(os.stat(path).st_mtime_ns, stamp)
+
+        written, second = write_if_changed(path, "<p>b</p>", first)
+        self.assertTrue(written)
+        self.assertNotEqual(second["sha256"], first["sha256"])
+        self.assertEqual(os.listdir(self.root), ["page.html"])
+
+    def test_replace_if_changed(self):
+        path = os.path.join(self.root, "page.html")
+        tmp_path = path + ".tmp"
+        _, previous = write_if_changed(path, "same")
+        with open(tmp_path, "w") as f:
+            f.write("same")
+        self.assertEqual(
+            replace_if_changed(tmp_path, path, previous), (False, previous)
+        )
+        self.assertFalse(os.path.exists(tmp_path))
+
+    def test_write_reports_outputs(self):
+        path = os.path.join(self.root, "page.html")
+        with BuildIO() as io:
+            io.write(path, "x")
+            io.flush()
+            io.write(path, "x", io.outputs[path][1])
+            io.flush()
+        self.assertFalse(io.outputs[path][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
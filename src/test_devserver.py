@@ -0,0 +1,327 @@
+import os
+import tempfile
+import time
+import types
+import unittest
+import urllib.error
+import urllib.request
+
+import devserver
+from assets import describe_static
+from devserver import (
+    diff_snapshots,
+    rebuild_changed,
+    serve_directory,
+    snapshot_tree,
+    watch,
+)
+from gencontent import generate_pages_recursive
+from images import ImagePipeline, PngImage, encode_png
+from manifest import BuildManifest
+from site_index import SiteIndex
+
+
+class TestDevServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.dest = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        os.makedirs(self.dest)
+        self.write(self.template, "{{ Title }}|{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post")
+        self.manifest = BuildManifest(os.path.join(root, "manifest.json"))
+        generate_pages_recursive(
+            self.content, self.template, self.dest, "/", self.manifest
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def rebuild(self, changed, removed):
+        return rebuild_changed(
+            changed,
+            removed,
+            "/",
+            self.manifest,
+            self.content,
+            self.static,
+            self.template,
+            self.dest,
+        )
+
+    def test_diff_snapshots(self):
+        before = snapshot_tree(self.content)
+        post = os.path.join(self.content, "blog", "post.md")
+        new = os.path.join(self.content, "new.md")
+        os.remove(os.path.join(self.content, "index.md"))
+        self.write(new, "# New")
+        self.write(post, "# Post, but longer")
+        changed, removed = diff_snapshots(before, snapshot_tree(self.content))
+        self.assertEqual(changed, sorted([post, new]))
+        self.assertEqual(removed, [os.path.join(self.content, "index.md")])
+
+    def test_rebuild_only_changed_page(self):
+        index_html = os.path.join(self.dest, "index.html")
+        post = os.path.join(self.content, "blog", "post.md")
+        self.write(index_html, "untouched")
+        self.write(post, "# Edited")
+        self.assertEqual(self.rebuild([post], []), 1)
+        self.assertEqual(self.read(index_html), "untouched")
+        self.assertEqual(
+            self.read(os.path.join(self.dest, "blog", "post.html")),
+            "Edited|<div><h1>Edited</h1></div>",
+        )
+
+    def test_template_change_rebuilds_every_page(self):
+        self.write(self.template, "<{{ Title }}>")
+        self.assertEqual(self.rebuild([self.template], []), 2)
+        self.assertEqual(self.read(os.path.join(self.dest, "index.html")), "<Home>")
+
+    def test_directory_template_rebuilds_only_dependents(self):
+        blog_template = os.path.join(self.content, "blog", "template.html")
+        index_html = os.path.join(self.dest, "index.html")
+        post_html = os.path.join(self.dest, "blog", "post.html")
+        self.write(blog_template, "[{{ Content }}]")
+        self.assertEqual(self.rebuild([blog_template], []), 1)
+        self.assertEqual(self.read(post_html), "[<div><h1>Post</h1></div>]")
+
+        self.write(index_html, "untouched")
+        self.write(blog_template, "({{ Content }})")
+        self.assertEqual(self.rebuild([blog_template], []), 1)
+        self.assertEqual(self.read(post_html), "(<div><h1>Post</h1></div>)")
+        self.assertEqual(self.read(index_html), "untouched")
+
+        os.remove(blog_template)
+        self.assertEqual(self.rebuild([], [blog_template]), 1)
+        self.assertEqual(self.read(post_html), "Post|<div><h1>Post</h1></div>")
+
+    def test_rebuild_updates_site_index(self):
+        site_index = SiteIndex(self.dest, "/")
+        post = os.path.join(self.content, "blog", "post.md")
+        self.write(post, "# Edited\n\n## Part")
+        rebuild_changed(
+            [post],
+            [],
+            "/",
+            self.manifest,
+            self.content,
+            self.static,
+            self.template,
+            self.dest,
+            site_index,
+        )
+        records = list(SiteIndex.load(self.dest))
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["headings"], [[1, "Edited"], [2, "Part"]])
+
+        os.remove(post)
+        rebuild_changed(
+            [],
+            [post],
+            "/",
+            self.manifest,
+            self.content,
+            self.static,
+            self.template,
+            self.dest,
+            site_index,
+        )
+        self.assertEqual(list(SiteIndex.load(self.dest)), [])
+
+    def test_rebuild_keeps_build_options(self):
+        self.write(self.template, "<p>\n  {{ Title }}\n</p>")
+        post = os.path.join(self.content, "blog", "post.md")
+        rebuild_changed(
+            [self.template, post],
+            [],
+            "/",
+            self.manifest,
+            self.content,
+            self.static,
+            self.template,
+            self.dest,
+            minify=True,
+        )
+        self.assertEqual(
+            self.read(os.path.join(self.dest, "blog", "post.html")), "<p>Post</p>"
+        )
+
+    def test_watch_retries_failed_rebuilds(self):
+        index = os.path.join(self.content, "index.md")
+        post = os.path.join(self.content, "blog", "post.md")
+        edits = {1: (post, "# Broken"), 3: (index, "# Home, edited")}
+        calls = []
+        sleeps = []
+
+        def sleep(interval):
+            sleeps.append(interval)
+            if len(sleeps) in edits:
+                self.write(*edits[len(sleeps)])
+            if len(sleeps) > 4:
+                raise KeyboardInterrupt
+
+        def rebuild(changed, removed, *args):
+            calls.append(changed)
+            if len(calls) == 1:
+                raise Exception("broken page")
+            return len(changed)
+
+        clock = types.SimpleNamespace(sleep=sleep, perf_counter=time.perf_counter)
+        saved = devserver.time, devserver.rebuild_changed
+        devserver.time, devserver.rebuild_changed = clock, rebuild
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                watch("/", self.manifest, 0, self.content, self.static, self.template)
+        finally:
+            devserver.time, devserver.rebuild_changed = saved
+        # Not retried until something else changed, then rebuilt with it.
+        self.assertEqual(calls, [[post], sorted([index, post])])
+
+    def test_removed_sources_and_assets(self):
+        asset = os.path.join(self.static, "style.css")
+        self.write(asset, "body {}")
+        self.rebuild([asset], [])
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "style.css")))
+
+        os.remove(asset)
+        post = os.path.join(self.content, "blog", "post.md")
+        os.remove(post)
+        self.rebuild([], [asset, post])
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "style.css")))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "post.html")))
+
+    def test_changed_image_rebuilds_pages_showing_it(self):
+        image = os.path.join(self.static, "a.png")
+        with open(image, "wb") as f:
+            f.write(encode_png(PngImage(2, 1, 1, [b"\x00\xff"])))
+        images = ImagePipeline(os.path.join(self.tmp.name, "cache"))
+        assets = describe_static(self.static, images)
+        post = os.path.join(self.content, "blog", "post.md")
+        post_html = os.path.join(self.dest, "blog", "post.html")
+        self.write(post, "# Post\n\n![a](/a.png)")
+        rebuild_changed(
+            [post],
+            [],
+            "/",
+            self.manifest,
+            self.content,
+            self.static,
+            self.template,
+            self.dest,
+            images=images,
+            assets=assets,
+        )
+        self.assertIn('width="2" height="1"', self.read(post_html))
+
+        with open(image, "wb") as f:
+            f.write(encode_png(PngImage(3, 1, 1, [b"\x00\x80\xff"])))
+        index_html = os.path.join(self.dest, "index.html")
+        self.write(index_html, "untouched")
+        rebuild_changed(
+            [image],
+            [],
+            "/",
+            self.manifest,
+            self.content,
+            self.static,
+            self.template,
+            self.dest,
+            images=images,
+            assets=assets,
+        )
+        self.assertIn('width="3" height="1"', self.read(post_html))
+        self.assertEqual(self.read(index_html), "untouched")
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "a.png")))
+
+    def test_fingerprinted_asset_changes_update_pages(self):
+        template = os.path.join(self.tmp.name, "styled.html")
+        self.write(template, '<link href="/style.css">{{ Content }}')
+        index_html = os.path.join(self.dest, "index.html")
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+        generate_pages_recursive(self.content, template, self.dest, "/", self.manifest)
+        assets = {}
+
+        def rebuild(changed, removed):
+            return rebuild_changed(
+                changed,
+                removed,
+                "/",
+                self.manifest,
+                self.content,
+                self.static,
+                template,
+                self.dest,
+                assets=assets,
+                fingerprint=True,
+            )
+
+        css = os.path.join(self.static, "style.css")
+        self.write(css, "body {}")
+        rebuild([css], [])
+        first = assets["/style.css"]["url"]
+        self.assertIn(f'href="{first}"', self.read(index_html))
+        self.assertEqual(self.manifest.assets, [first.lstrip("/")])
+        self.assertIn(index_html, self.manifest.dependents(css))
+
+        self.write(css, "body { color: red }")
+        rebuild([css], [])
+        second = assets["/style.css"]["url"]
+        self.assertNotEqual(first, second)
+        self.assertIn(f'href="{second}"', self.read(index_html))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, first.lstrip("/"))))
+        self.assertEqual(self.manifest.assets, [second.lstrip("/")])
+
+        os.remove(css)
+        rebuild([], [css])
+        self.assertEqual(assets, {})
+        self.assertEqual(self.manifest.assets, [])
+        self.assertIn('href="/style.css"', self.read(index_html))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, second.lstrip("/"))))
+
+    def test_serve_directory(self):
+        server = serve_directory(self.dest, 0)
+        try:
+            port = server.server_address[1]
+            url = f"http://127.0.0.1:{port}/index.html"
+            with urllib.request.urlopen(url) as response:
+                self.assertEqual(
+                    response.read().decode(), "Home|<div><h1>Home</h1></div>"
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_serve_directory_under_base_path(self):
+        server = serve_directory(self.dest, 0, "/repo/")
+        try:
+            root = f"http://127.0.0.1:{server.server_address[1]}"
+            with urllib.request.urlopen(root + "/repo/blog/post.html") as response:
+                self.assertEqual(
+                    response.read().decode(), "Post|<div><h1>Post</h1></div>"
+                )
+            with urllib.request.urlopen(root + "/") as response:
+                self.assertEqual(response.url, root + "/repo/")
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(root + "/index.html")
+            self.assertEqual(error.exception.code, 404)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,270 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from feeds import (
+    PUBLISHED_DATES_NAME,
+    git_published_times,
+    page_content,
+    update_published_dates,
+    write_feeds,
+    write_sitemaps,
+)
+from gencontent import generate_pages_recursive
+from manifest import BuildManifest
+from site_index import SiteIndex
+
+SITEMAP = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+ATOM = "{http://www.w3.org/2005/Atom}"
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+class TestFeeds(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.dest = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.dest)
+        self.write(
+            self.template, '<a href="/">{{ Title }}</a><main>{{ Content }}</main>'
+        )
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog")
+        for i, name in enumerate(("first", "second")):
+            path = os.path.join(self.content, "blog", f"{name}.md")
+            self.write(path, f"# Post {name}\n\n[home](/) & <more>")
+            os.utime(path, (1_700_000_000 + i, 1_700_000_000 + i))
+
+        self.site_index = SiteIndex(self.dest, "/repo/")
+        generate_pages_recursive(
+            self.content,
+            self.template,
+            self.dest,
+            "/repo/",
+            site_index=self.site_index,
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_sitemap(self):
+        written = write_sitemaps(self.site_index, self.dest, "https://example.com")
+        self.assertEqual(written, [os.path.join(self.dest, "sitemap.xml")])
+        locs = [loc.text for loc in ET.parse(written[0]).iter(SITEMAP + "loc")]
+        self.assertEqual(len(locs), 4)
+        self.assertIn("https://example.com/repo/blog/first.html", locs)
+
+    def test_sitemap_is_split_past_max_urls(self):
+        written = write_sitemaps(
+            self.site_index, self.dest, "https://example.com", max_urls=3
+        )
+        self.assertEqual(
+            [os.path.basename(path) for path in written],
+            ["sitemap-1.xml", "sitemap-2.xml", "sitemap.xml"],
+        )
+        root = ET.parse(written[-1]).getroot()
+        self.assertEqual(root.tag, SITEMAP + "sitemapindex")
+        self.assertEqual(
+            [loc.text for loc in root.iter(SITEMAP + "loc")],
+            [
+                "https://example.com/repo/sitemap-1.xml",
+                "https://example.com/repo/sitemap-2.xml",
+            ],
+        )
+
+        write_sitemaps(self.site_index, self.dest, "https://example.com")
+        self.assertFalse(os.path.exists(written[0]))
+
+    def test_page_content_reuses_rendered_html(self):
+        record = next(r for r in self.site_index if r["path"] == "blog/first.html")
+        expected = (
+            '<div><h1>Post first</h1><p><a href="/repo/">home</a> & <more></p></div>'
+        )
+        args = (record, self.dest, "/repo/", self.content, self.template)
+        self.assertEqual("".join(page_content(*args)), expected)
+
+        # A page that no longer matches its template is rendered again.
+        self.write(os.path.join(self.dest, "blog", "first.html"), "stale")
+        self.assertEqual("".join(page_content(*args)), expected)
+
+    def test_feeds(self):
+        rss, atom = write_feeds(
+            self.site_index,
+            self.dest,
+            "https://example.com",
+            "blog",
+            self.content,
+            self.template,
+        )
+        channel = ET.parse(rss).getroot().find("channel")
+        self.assertEqual(channel.findtext("title"), "Blog")
+        items = channel.findall("item")
+        self.assertEqual(
+            [item.findtext("link") for item in items],
+            [
+                "https://example.com/repo/blog/second.html",
+                "https://example.com/repo/blog/first.html",
+            ],
+        )
+        self.assertIn("<h1>Post second</h1>", items[0].findtext("description"))
+
+        feed = ET.parse(atom).getroot()
+        entries = feed.findall(ATOM + "entry")
+        self.assertEqual(entries[1].findtext(ATOM + "title"), "Post first")
+        self.assertTrue(
+            entries[1].findtext(ATOM + "content").endswith("& <more></p></div>")
+        )
+        self.assertEqual(
+            write_feeds(self.site_index, self.dest, "https://example.com", "nope"), []
+        )
+
+    def test_feeds_use_published_times(self):
+        blog = os.path.join(self.content, "blog")
+        published = {
+            os.path.join(blog, "first.md"): 1_600_000_100,
+            os.path.join(blog, "second.md"): 1_600_000_000,
+        }
+        args = (self.site_index, self.dest, "https://example.com", "blog")
+        rss, _ = write_feeds(*args, self.content, self.template, published=published)
+        with open(rss, "rb") as f:
+            before = f.read()
+        items = ET.parse(rss).getroot().find("channel").findall("item")
+        self.assertEqual(
+            items[0].findtext("link"), "https://example.com/repo/blog/first.html"
+        )
+        self.assertIn("2020", items[0].findtext("pubDate"))
+
+        # Touching the sources does not change the feed.
+        for name in ("first.md", "second.md"):
+            os.utime(os.path.join(blog, name))
+        write_feeds(*args, self.content, self.template, published=published)
+        with open(rss, "rb") as f:
+            self.assertEqual(f.read(), before)
+
+    def test_empty_section_removes_feeds(self):
+        args = (self.site_index, self.dest, "https://example.com", "blog")
+        written = write_feeds(*args, self.content, self.template)
+        for path in list(self.site_index.records):
+            if "/blog/" in path:
+                del self.site_index.records[path]
+        self.assertEqual(write_feeds(*args, self.content, self.template), [])
+        for path in written:
+            self.assertFalse(os.path.exists(path))
+
+    def test_published_dates_file(self):
+        path = os.path.join(self.content, PUBLISHED_DATES_NAME)
+        first = os.path.join(self.content, "blog", "first.md")
+        second = os.path.join(self.content, "blog", "second.md")
+        self.write(path, '{"blog/first.md": "2020-09-13"}')
+        calls = []
+
+        def fallback():
+            calls.append(True)
+            return {second: 1_600_000_100}
+
+        times, added = update_published_dates(path, [first, second], fallback)
+        self.assertEqual(times, {first: 1_599_955_200, second: 1_600_000_100})
+        self.assertEqual(added, [second])
+        with open(path) as f:
+            self.assertEqual(
+                json.load(f),
+                {
+                    "blog/first.md": "2020-09-13",
+                    "blog/second.md": "2020-09-13T12:28:20+00:00",
+                },
+            )
+
+        # Once recorded, the file alone dates the pages.
+        again = update_published_dates(path, [first, second], fallback)
+        self.assertEqual(again, (times, []))
+        self.assertEqual(len(calls), 1)
+
+        self.write(path, '{"blog/first.md": "yesterday"}')
+        with self.assertRaises(Exception):
+            update_published_dates(path, [first])
+
+    def test_manifest_keeps_first_published_time(self):
+        source = os.path.join(self.content, "index.md")
+        dest = os.path.join(self.dest, "index.html")
+        manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+        manifest.record(dest, source, self.template, "/")
+        manifest.outputs[dest]["published"] = 1_600_000_000
+        manifest.save()
+
+        manifest = BuildManifest.load(manifest.path)
+        manifest.record(dest, source, self.template, "/")
+        self.assertEqual(manifest.published_times(), {source: 1_600_000_000})
+
+    def test_git_published_times(self):
+        self.assertEqual(git_published_times(self.content), {})
+
+        def git(*args, date="1600000000 +0000"):
+            env = dict(os.environ, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+            subprocess.run(
+                ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+                cwd=self.content,
+                env=env,
+                check=True,
+                capture_output=True,
+            )
+
+        try:
+            git("init", "-q")
+        except (OSError, subprocess.CalledProcessError):
+            self.skipTest("git is not available")
+        git("add", "index.md", "blog/first.md")
+        git("commit", "-q", "-m", "first")
+        git("add", ".")
+        git("commit", "-q", "-m", "second", date="1600000100 +0000")
+        times = git_published_times(self.content)
+        self.assertEqual(
+            times[os.path.join(self.content, "blog", "first.md")], 1600000000
+        )
+        self.assertEqual(
+            times[os.path.join(self.content, "blog", "second.md")], 1600000100
+        )
+
+        # A shallow clone cannot tell when files were added.
+        clone = os.path.join(self.tmp.name, "clone")
+        git("clone", "-q", "--depth", "1", "file://" + self.content, clone)
+        self.assertEqual(git_published_times(clone), {})
+
+    def test_build_without_site_url_removes_sitemap_and_feeds(self):
+        root = self.tmp.name
+        os.makedirs(os.path.join(root, "static"))
+
+        def run(*args):
+            subprocess.run(
+                [sys.executable, MAIN, "/repo/", *args],
+                cwd=root,
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+
+        run("--site-url", "https://example.com")
+        generated = [
+            os.path.join(self.dest, "sitemap.xml"),
+            os.path.join(self.dest, "blog", "rss.xml"),
+            os.path.join(self.dest, "blog", "atom.xml"),
+        ]
+        for path in generated:
+            self.assertTrue(os.path.exists(path), path)
+        run()
+        for path in generated:
+            self.assertFalse(os.path.exists(path), path)
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "blog", "first.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,19 @@
+import functools
+import os
+import tempfile
 import unittest
 
-from gencontent import extract_title
+from block_memo import BlockMemo
+from gencontent import (
+    collect_pages,
+    extract_title,
+    extract_title_from_lines,
+    generate_page,
+    generate_pages_buffered,
+    generate_pages_parallel,
+    generate_pages_recursive,
+    sync_directory_contents,
+)
 
 
 class TestGenContent(unittest.TestCase):
@@ -26,3 +39,195 @@ class TestGenContent(unittest.TestCase):
         markdown = "## Not h1\nJust text"
         with self.assertRaises(Exception):
             extract_title(markdown)
+
+
+class TestGeneratePages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog", "post"))
+        self.write(
+            self.template, '<title>{{ Title }}</title><a href="/">{{ Content }}</a>'
+        )
+        self.write(
+            os.path.join(self.content, "index.md"), "# Home\n\n[post](/blog/post)"
+        )
+        self.write(
+            os.path.join(self.content, "blog", "post", "index.md"), "# Post\n\n- a\n- b"
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read_tree(self, root):
+        files = {}
+        for dir_path, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(dir_path, name)
+                with open(path) as f:
+                    files[os.path.relpath(path, root)] = f.read()
+        return files
+
+    def test_collect_pages_sorted(self):
+        dest = os.path.join(self.root, "docs")
+        self.assertEqual(
+            collect_pages(self.content, dest),
+            [
+                (
+                    os.path.join(self.content, "blog", "post", "index.md"),
+                    os.path.join(dest, "blog", "post", "index.html"),
+                ),
+                (
+                    os.path.join(self.content, "index.md"),
+                    os.path.join(dest, "index.html"),
+                ),
+            ],
+        )
+
+    def test_parallel_matches_sequential(self):
+        sequential = os.path.join(self.root, "sequential")
+        parallel = os.path.join(self.root, "parallel")
+        os.makedirs(sequential)
+        generate_pages_recursive(self.content, self.template, sequential, "/repo/")
+        generate_pages_parallel(self.content, self.template, parallel, "/repo/", jobs=2)
+        self.assertEqual(self.read_tree(sequential), self.read_tree(parallel))
+
+    def test_block_memo_matches_sequential(self):
+        sequential = os.path.join(self.root, "sequential")
+        os.makedirs(sequential)
+        generate_pages_recursive(self.content, self.template, sequential, "/repo/")
+        for name, build in (
+            ("parallel", functools.partial(generate_pages_parallel, jobs=2)),
+            ("buffered", generate_pages_buffered),
+        ):
+            memo = BlockMemo()
+            dest = os.path.join(self.root, name)
+            build(self.content, self.template, dest, "/repo/", block_memo=memo)
+            self.assertEqual(self.read_tree(sequential), self.read_tree(dest))
+            self.assertGreater(memo.misses, 0)
+
+    def test_parallel_reports_failures(self):
+        self.write(os.path.join(self.content, "broken.md"), "no title here")
+        dest = os.path.join(self.root, "docs")
+        with self.assertRaises(Exception):
+            generate_pages_parallel(self.content, self.template, dest, jobs=2)
+        self.assertTrue(os.path.exists(os.path.join(dest, "index.html")))
+
+    def test_buffered_matches_sequential(self):
+        sequential = os.path.join(self.root, "sequential")
+        buffered = os.path.join(self.root, "buffered")
+        os.makedirs(sequential)
+        generate_pages_recursive(self.content, self.template, sequential, "/repo/")
+        generate_pages_buffered(
+            self.content, self.template, buffered, "/repo/", io_workers=2
+        )
+        self.assertEqual(self.read_tree(sequential), self.read_tree(buffered))
+
+    def test_buffered_reports_failures(self):
+        self.write(os.path.join(self.content, "broken.md"), "no title here")
+        dest = os.path.join(self.root, "docs")
+        with self.assertRaises(Exception):
+            generate_pages_buffered(self.content, self.template, dest)
+        self.assertTrue(os.path.exists(os.path.join(dest, "index.html")))
+        self.assertFalse(os.path.exists(os.path.join(dest, "broken.html")))
+
+    def test_streaming_matches_in_memory(self):
+        src = os.path.join(self.content, "big.md")
+        blocks = ["# Big page", "```\ncode\n\nmore code\n```"]
+        blocks += [
+            f"Paragraph {i} with a [link](/x/{i}) and **bold**" for i in range(200)
+        ]
+        blocks += ["- a\n- b", "1. one\n2. two", "> quote"]
+        self.write(src, "\n\n".join(blocks))
+
+        in_memory = os.path.join(self.root, "a.html")
+        streamed = os.path.join(self.root, "b.html")
+        generate_page(
+            src, self.template, in_memory, "/repo/", verbose=False, stream=False
+        )
+        generate_page(
+            src, self.template, streamed, "/repo/", verbose=False, stream=True
+        )
+        self.assertEqual(
+            self.read_tree(self.root)["a.html"], self.read_tree(self.root)["b.html"]
+        )
+
+    def test_streaming_failure_leaves_no_partial_page(self):
+        src = os.path.join(self.content, "bad.md")
+        self.write(src, "# Title\n\nok\n\nbroken **bold")
+        dest = os.path.join(self.root, "bad.html")
+        with self.assertRaises(Exception):
+            generate_page(src, self.template, dest, verbose=False, stream=True)
+        self.assertEqual(os.listdir(self.root).count("bad.html"), 0)
+        self.assertEqual(os.listdir(self.root).count("bad.html.tmp"), 0)
+
+    def test_extract_title_from_lines_stops_at_title(self):
+        lines = iter(["intro", "# Title", "rest"])
+        self.assertEqual(extract_title_from_lines(lines), "Title")
+        self.assertEqual(next(lines), "rest")
+
+
+class TestSyncDirectoryContents(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "static")
+        self.dest = os.path.join(self.tmp.name, "docs")
+        os.makedirs(os.path.join(self.src, "images"))
+        self.write(os.path.join(self.src, "index.css"), "body {}")
+        self.write(os.path.join(self.src, "images", "a.png"), "png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_first_sync_copies_everything(self):
+        result = sync_directory_contents(self.src, self.dest)
+        self.assertEqual(
+            result["files"], [os.path.join("images", "a.png"), "index.css"]
+        )
+        self.assertEqual(result["copied"], 2)
+        with open(os.path.join(self.dest, "images", "a.png")) as f:
+            self.assertEqual(f.read(), "png")
+
+    def test_second_sync_copies_only_changes(self):
+        first = sync_directory_contents(self.src, self.dest)
+        self.write(os.path.join(self.src, "index.css"), "body { color: red }")
+        result = sync_directory_contents(self.src, self.dest, first["files"])
+        self.assertEqual((result["copied"], result["unchanged"]), (1, 1))
+
+    def test_stale_assets_removed_but_pages_kept(self):
+        first = sync_directory_contents(self.src, self.dest)
+        self.write(os.path.join(self.dest, "index.html"), "page")
+        os.remove(os.path.join(self.src, "images", "a.png"))
+        result = sync_directory_contents(self.src, self.dest, first["files"])
+        self.assertEqual(result["removed"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images", "a.png")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+
+    def test_hash_mode_skips_touched_but_identical_files(self):
+        first = sync_directory_contents(self.src, self.dest)
+        css = os.path.join(self.src, "index.css")
+        stat = os.stat(css)
+        os.utime(css, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        result = sync_directory_contents(self.src, self.dest, first["files"], True)
+        self.assertEqual(result["copied"], 0)
+
+    def test_hardlink_method(self):
+        sync_directory_contents(self.src, self.dest, method="hardlink")
+        src_stat = os.stat(os.path.join(self.src, "index.css"))
+        dest_stat = os.stat(os.path.join(self.dest, "index.css"))
+        self.assertEqual(src_stat.st_ino, dest_stat.st_ino)
+
+    def test_reflink_method_falls_back_to_copy(self):
+        sync_directory_contents(self.src, self.dest, method="reflink")
+        with open(os.path.join(self.dest, "index.css")) as f:
+            self.assertEqual(f.read(), "body {}")
@@ -1,3 +1,5 @@
+import io
+import pickle
 import unittest
 
 from htmlnode import HTMLNode, LeafNode, ParentNode
@@ -51,6 +53,46 @@ class TestHTMLNode(unittest.TestCase):
             "<div><span><b>grandchild</b></span></div>",
         )
 
+    def test_iter_html_matches_to_html(self):
+        node = ParentNode(
+            "div",
+            [
+                LeafNode(None, "text "),
+                ParentNode("p", [LeafNode("a", "link", {"href": "/x"})]),
+                LeafNode("img", "", {"src": "/i.png"}),
+            ],
+        )
+        self.assertEqual("".join(node.iter_html()), node.to_html())
+        self.assertEqual(
+            node.to_html(),
+            '<div>text <p><a href="/x">link</a></p><img src="/i.png"></img></div>',
+        )
+
+    def test_write_html(self):
+        node = ParentNode("ul", [ParentNode("li", [LeafNode("b", "one")])])
+        buffer = io.StringIO()
+        node.write_html(buffer)
+        self.assertEqual(buffer.getvalue(), "<ul><li><b>one</b></li></ul>")
+
+    def test_to_html_deep_tree_without_recursion_limit(self):
+        node = LeafNode(None, "x")
+        for _ in range(5000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span><span>"))
+        self.assertEqual(len(html), 5000 * len("<span></span>") + 1)
+
+    def test_to_html_invalid_child_raises(self):
+        node = ParentNode("div", [ParentNode("p", [])])
+        with self.assertRaises(ValueError):
+            node.to_html()
+
+    def test_compact_representation_pickles(self):
+        node = ParentNode("p", [LeafNode("a", "x", {"href": "/"})])
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertFalse(hasattr(node.children[0], "__dict__"))
+        self.assertEqual(pickle.loads(pickle.dumps(node)).to_html(), node.to_html())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,256 @@
+import os
+import random
+import struct
+import tempfile
+import unittest
+import zlib
+
+from gencontent import sync_directory_contents
+from images import (
+    PNG_SIGNATURE,
+    ImagePipeline,
+    PngImage,
+    decode_png,
+    encode_png,
+    optimize_png,
+    png_size,
+    read_chunks,
+    resize_image,
+)
+
+
+def gradient(width, height, channels=3):
+    rows = [
+        bytes(
+            (x * 7 + y * 3 + c * 50) % 256
+            for x in range(width)
+            for c in range(channels)
+        )
+        for y in range(height)
+    ]
+    return PngImage(width, height, channels, rows)
+
+
+def noise(width, height, seed=0):
+    rng = random.Random(seed)
+    rows = [rng.randbytes(width * 3) for _ in range(height)]
+    return PngImage(width, height, 3, rows)
+
+
+def chunk(chunk_type, payload):
+    body = chunk_type + payload
+    return struct.pack(">I", len(payload)) + body + struct.pack(">I", zlib.crc32(body))
+
+
+def raw_png(width, height, color_type, rows, filters, extra=b""):
+    """Encodes rows with the given filter types, like any other encoder."""
+    bpp = {0: 1, 2: 3, 4: 2, 6: 4}[color_type]
+    data = bytearray()
+    prev = bytes(len(rows[0]))
+    for row, filter_type in zip(rows, filters):
+        data.append(filter_type)
+        for i, value in enumerate(row):
+            left = row[i - bpp] if i >= bpp else 0
+            up = prev[i]
+            up_left = prev[i - bpp] if i >= bpp else 0
+            if filter_type == 1:
+                value -= left
+            elif filter_type == 2:
+                value -= up
+            elif filter_type == 3:
+                value -= (left + up) // 2
+            elif filter_type == 4:
+                p = left + up - up_left
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - up_left)
+                value -= left if pa <= pb and pa <= pc else up if pb <= pc else up_left
+            data.append(value % 256)
+        prev = row
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    return (
+        PNG_SIGNATURE
+        + chunk(b"IHDR", ihdr)
+        + extra
+        + chunk(b"IDAT", zlib.compress(bytes(data)))
+        + chunk(b"IEND", b"")
+    )
+
+
+class TestPng(unittest.TestCase):
+    def test_decode_every_filter_type(self):
+        image = gradient(9, 5)
+        data = raw_png(9, 5, 2, image.rows, [0, 1, 2, 3, 4])
+        self.assertEqual(png_size(data), (9, 5))
+        self.assertEqual(decode_png(data).rows, image.rows)
+
+    def test_encode_round_trip(self):
+        image = gradient(40, 12)
+        data = encode_png(image)
+        decoded = decode_png(data)
+        self.assertEqual((decoded.width, decoded.height), (40, 12))
+        self.assertEqual(decoded.rows, image.rows)
+
+    def test_opaque_alpha_is_dropped(self):
+        image = gradient(30, 4, channels=4)
+        image.rows = [
+            bytes(255 if i % 4 == 3 else b for i, b in enumerate(row))
+            for row in image.rows
+        ]
+        decoded = decode_png(encode_png(image))
+        self.assertEqual(decoded.channels, 3)
+        self.assertEqual(
+            decoded.rows,
+            [
+                bytes(row[i] for i in range(len(row)) if i % 4 != 3)
+                for row in image.rows
+            ],
+        )
+
+    def test_few_colors_become_a_palette(self):
+        colors = [b"\x10\x20\x30\x80", b"\xff\x00\x00\xff", b"\x00\x00\xff\xff"]
+        rows = [b"".join(colors[(x + y) % 3] for x in range(20)) for y in range(6)]
+        data = encode_png(PngImage(20, 6, 4, rows))
+        chunks = dict(read_chunks(data))
+        self.assertEqual(chunks[b"IHDR"][9], 3)
+        self.assertEqual(len(chunks[b"PLTE"]), 9)
+        self.assertEqual(chunks[b"tRNS"], b"\x80")
+        self.assertEqual(decode_png(data).rows, rows)
+
+    def test_resize_averages_covered_pixels(self):
+        image = PngImage(4, 2, 1, [bytes([0, 10, 20, 30]), bytes([40, 50, 60, 70])])
+        resized = resize_image(image, 2)
+        self.assertEqual((resized.width, resized.height), (2, 1))
+        self.assertEqual(resized.rows, [bytes([25, 45])])
+        self.assertEqual(resize_image(image, 2, smooth=False).rows, [bytes([50, 70])])
+
+    def test_optimize_strips_metadata_and_makes_variants(self):
+        image = noise(64, 16)
+        extra = chunk(b"sRGB", b"\x00") + chunk(b"tEXt", b"Comment\x00hello" * 100)
+        data = raw_png(64, 16, 2, image.rows, [4] * 16, extra)
+
+        optimized, width, height, variants = optimize_png(data, (16, 64, 128))
+        self.assertLess(len(optimized), len(data))
+        chunk_types = [chunk_type for chunk_type, _ in read_chunks(optimized)]
+        self.assertIn(b"sRGB", chunk_types)
+        self.assertNotIn(b"tEXt", chunk_types)
+        self.assertEqual(decode_png(optimized).rows, image.rows)
+        self.assertEqual((width, height), (64, 16))
+        self.assertEqual(list(variants), [16])
+        self.assertEqual(png_size(variants[16]), (16, 4))
+
+    def test_not_a_png(self):
+        with self.assertRaises(Exception):
+            read_chunks(b"GIF89a")
+
+
+class TestImagePipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.dest = os.path.join(root, "docs")
+        self.cache = os.path.join(root, "cache")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.image = os.path.join(self.static, "images", "a.png")
+        with open(self.image, "wb") as f:
+            f.write(raw_png(64, 16, 2, noise(64, 16).rows, [0] * 16))
+        with open(os.path.join(self.static, "index.css"), "w") as f:
+            f.write("body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sync(self, previous=None, optimize=True):
+        images = ImagePipeline(self.cache, widths=(16,), optimize=optimize)
+        synced = sync_directory_contents(
+            self.static, self.dest, previous, images=images
+        )
+        images.save()
+        return synced, images
+
+    def test_sync_optimizes_images(self):
+        synced, images = self.sync()
+        self.assertEqual(
+            synced["files"],
+            ["images/a-16w.png", "images/a.png", "index.css"],
+        )
+        self.assertEqual(
+            synced["assets"],
+            {
+                "/images/a.png": {
+                    "source": self.image,
+                    "width": 64,
+                    "height": 16,
+                    "srcset": [["/images/a-16w.png", 16], ["/images/a.png", 64]],
+                }
+            },
+        )
+        self.assertEqual(images.processed, 1)
+        with open(os.path.join(self.dest, "images", "a.png"), "rb") as f:
+            self.assertEqual(decode_png(f.read()).rows, noise(64, 16).rows)
+
+    def test_unchanged_images_come_from_the_cache(self):
+        first, _ = self.sync()
+        second, images = self.sync(first["files"])
+        self.assertEqual((images.processed, images.reused), (0, 1))
+        self.assertEqual((second["copied"], second["unchanged"]), (0, 3))
+        self.assertEqual(second["assets"], first["assets"])
+
+        # Same content under another name: processed once, by hash.
+        os.rename(self.image, os.path.join(self.static, "images", "b.png"))
+        third, images = self.sync(second["files"])
+        self.assertEqual(images.processed, 0)
+        self.assertEqual(list(third["assets"]), ["/images/b.png"])
+        self.assertEqual(third["removed"], 2)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images", "a-16w.png")))
+
+    def test_images_are_only_recompressed_by_default(self):
+        synced, _ = self.sync(optimize=False)
+        self.assertEqual(synced["files"], ["images/a.png", "index.css"])
+        self.assertEqual(
+            synced["assets"]["/images/a.png"]["srcset"], [["/images/a.png", 64]]
+        )
+        self.assertEqual(synced["assets"]["/images/a.png"]["width"], 64)
+        with open(os.path.join(self.dest, "images", "a.png"), "rb") as f:
+            self.assertEqual(decode_png(f.read()).rows, noise(64, 16).rows)
+
+        # The settings are part of the cache key.
+        synced, images = self.sync(synced["files"])
+        self.assertEqual(images.processed, 1)
+        self.assertIn("images/a-16w.png", synced["files"])
+
+    def test_save_evicts_removed_and_changed_sources(self):
+        self.sync()
+        first = sorted(os.listdir(self.cache))
+        self.assertEqual(len(first), 4)
+
+        with open(self.image, "wb") as f:
+            f.write(raw_png(64, 16, 2, noise(64, 16).rows[::-1], [0] * 16))
+        self.sync()
+        second = sorted(os.listdir(self.cache))
+        self.assertEqual(len(second), 4)
+        self.assertFalse(set(first) & set(second) - {"index.json"})
+
+        os.remove(self.image)
+        self.sync()
+        self.assertEqual(os.listdir(self.cache), ["index.json"])
+
+    def test_describe_matches_place(self):
+        images = ImagePipeline(self.cache, widths=(16,), optimize=True)
+        described = images.describe(self.image, "images/a.png", fingerprint=True)
+        self.assertFalse(os.path.exists(self.dest))
+        os.makedirs(os.path.join(self.dest, "images"))
+        placed = images.place(self.image, self.dest, "images/a.png", True)
+        self.assertEqual(placed[:3], described)
+
+        url, entry, outputs = described
+        self.assertEqual(url, "/images/a.png")
+        self.assertRegex(entry["url"], r"^/images/a\.[0-9a-f]{8}\.png$")
+        self.assertEqual(entry["srcset"][-1], [entry["url"], 64])
+        self.assertEqual(
+            ["/" + output for output in outputs[::-1]],
+            [variant for variant, _ in entry["srcset"]],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,6 +8,7 @@ from inline_markdown import (
     split_nodes_link,
     text_node_to_html_node,
     text_to_textnodes,
+    tokenize_inline,
 )
 from textnode import TextNode, TextType
 
@@ -109,6 +110,45 @@ class TestInlineMarkdown(unittest.TestCase):
         ]
         self.assertEqual(new_nodes, expected)
 
+    def test_tokenize_inline_matches_chained_passes(self):
+        samples = [
+            "",
+            "plain text",
+            "**bold** at start and `code` at end",
+            "_a_ ![img](/i.png)[link](/l) **b** ![x](y) tail",
+            "[empty]() and [](/no-text) and ![alt](u)![alt2](u2)",
+            "nested **bold _not italic_ here** and _it_",
+            "![a [b](c) and x![n](m) ! [q](r)",
+        ]
+        for text in samples:
+            nodes = [TextNode(text, TextType.TEXT)]
+            nodes = split_nodes_image(nodes)
+            nodes = split_nodes_link(nodes)
+            nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+            nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+            nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+            self.assertEqual(tokenize_inline(text), nodes, text)
+
+    def test_fast_paths_skip_plain_text(self):
+        self.assertEqual(extract_markdown_images("no images [here]"), [])
+        self.assertEqual(extract_markdown_links("no links ![here]"), [])
+        self.assertEqual(
+            tokenize_inline("just prose, nothing else"),
+            [TextNode("just prose, nothing else", TextType.TEXT)],
+        )
+        self.assertEqual(
+            tokenize_inline("prose with **bold** only"),
+            [
+                TextNode("prose with ", TextType.TEXT),
+                TextNode("bold", TextType.BOLD),
+                TextNode(" only", TextType.TEXT),
+            ],
+        )
+
+    def test_tokenize_inline_raises_on_unmatched_delimiter(self):
+        with self.assertRaises(Exception):
+            tokenize_inline("a [link](/x) then **unclosed")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,185 @@
+import os
+import tempfile
+import unittest
+
+from gencontent import generate_pages_recursive
+from manifest import BuildManifest, hash_file
+
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.dest = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.dest)
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def build(self, base_path="/"):
+        manifest = BuildManifest.load(self.manifest_path)
+        generate_pages_recursive(
+            self.content, self.template, self.dest, base_path, manifest
+        )
+        removed = manifest.remove_orphans()
+        manifest.save()
+        return manifest, removed
+
+    def test_unchanged_pages_are_fresh(self):
+        self.build()
+        manifest = BuildManifest.load(self.manifest_path)
+        src = os.path.join(self.content, "index.md")
+        dest = os.path.join(self.dest, "index.html")
+        self.assertTrue(manifest.is_fresh(dest, src, self.template, "/"))
+
+    def test_source_change_is_detected(self):
+        self.build()
+        src = os.path.join(self.content, "index.md")
+        self.write(src, "# Home, edited")
+        manifest = BuildManifest.load(self.manifest_path)
+        dest = os.path.join(self.dest, "index.html")
+        self.assertFalse(manifest.is_fresh(dest, src, self.template, "/"))
+
+    def test_template_and_base_path_changes_are_detected(self):
+        self.build()
+        src = os.path.join(self.content, "index.md")
+        dest = os.path.join(self.dest, "index.html")
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertFalse(manifest.is_fresh(dest, src, self.template, "/repo/"))
+
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertFalse(manifest.is_fresh(dest, src, self.template, "/"))
+
+    def test_removed_source_deletes_orphaned_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        _, removed = self.build()
+        self.assertEqual(removed, [os.path.join(self.dest, "blog", "post.html")])
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+
+    def test_directory_template_rebuilds_only_its_subtree(self):
+        blog_template = os.path.join(self.content, "blog", "template.html")
+        self.write(blog_template, "<article>{{ Content }}</article>")
+        manifest, _ = self.build()
+        post = os.path.join(self.dest, "blog", "post.html")
+        index = os.path.join(self.dest, "index.html")
+        self.assertEqual(manifest.dependents(blog_template), [post])
+        self.assertEqual(manifest.dependents(self.template), [index])
+
+        self.write(blog_template, "<section>{{ Content }}</section>")
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertFalse(
+            manifest.is_fresh(
+                post, manifest.outputs[post]["source"], blog_template, "/"
+            )
+        )
+        self.assertTrue(
+            manifest.is_fresh(
+                index, os.path.join(self.content, "index.md"), self.template, "/"
+            )
+        )
+
+    def test_explain(self):
+        manifest, _ = self.build()
+        post = os.path.join(self.dest, "blog", "post.html")
+        lines = manifest.explain(post)
+        self.assertEqual(lines[0], f"{post}: up to date (base_path '/')")
+        self.assertIn("(template): unchanged", lines[2])
+
+        self.write(self.template, "{{ Content }}")
+        manifest = BuildManifest.load(self.manifest_path)
+        lines = manifest.explain(post)
+        self.assertTrue(lines[0].endswith("stale (base_path '/')"))
+        self.assertIn(f"{self.template} (template): changed", lines[2])
+        with self.assertRaises(KeyError):
+            manifest.explain(os.path.join(self.dest, "nope.html"))
+
+    def test_assets_are_recorded_and_checked(self):
+        image = os.path.join(self.root, "a.png")
+        self.write(image, "png")
+        src = os.path.join(self.content, "index.md")
+        dest = os.path.join(self.dest, "index.html")
+        self.write(dest, "page")
+        manifest = BuildManifest(self.manifest_path)
+        manifest.record(dest, src, self.template, "/", assets=[image])
+        manifest.save()
+
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertTrue(manifest.is_fresh(dest, src, self.template, "/"))
+        self.assertEqual(manifest.dependents(image), [dest])
+        self.assertIn(f"{image} (asset): unchanged", manifest.explain(dest)[1])
+
+        self.write(image, "png, edited")
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertFalse(manifest.is_fresh(dest, src, self.template, "/"))
+
+    def test_changed_options_make_every_page_stale(self):
+        self.build()
+        src = os.path.join(self.content, "index.md")
+        dest = os.path.join(self.dest, "index.html")
+        manifest = BuildManifest.load(self.manifest_path, {"fingerprint": True})
+        self.assertFalse(manifest.is_fresh(dest, src, self.template, "/"))
+        self.assertIn("  build options changed", manifest.explain(dest))
+        manifest.record(dest, src, self.template, "/")
+        self.assertTrue(manifest.is_fresh(dest, src, self.template, "/"))
+        manifest.save()
+
+        for options in ({"fingerprint": True}, None):
+            manifest = BuildManifest.load(self.manifest_path, options)
+            self.assertTrue(manifest.is_fresh(dest, src, self.template, "/"))
+        manifest = BuildManifest.load(self.manifest_path, {})
+        self.assertFalse(manifest.is_fresh(dest, src, self.template, "/"))
+
+    def test_identical_pages_are_not_rewritten(self):
+        self.build()
+        page = os.path.join(self.dest, "index.html")
+        stamp = os.stat(page).st_mtime_ns
+
+        # Re-render everything, as a full build does.
+        manifest = BuildManifest.load(self.manifest_path)
+        manifest.stale = set(manifest.outputs)
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post, edited")
+        generate_pages_recursive(self.content, self.template, self.dest, "/", manifest)
+        self.assertEqual(
+            manifest.changed_outputs, [os.path.join(self.dest, "blog", "post.html")]
+        )
+        self.assertEqual(os.stat(page).st_mtime_ns, stamp)
+        self.assertEqual(manifest.previous_output(page)["sha256"], hash_file(page))
+
+    def test_generated_files_no_longer_written_are_removed(self):
+        sitemap = os.path.join(self.dest, "sitemap.xml")
+        feed = os.path.join(self.dest, "blog", "rss.xml")
+        os.makedirs(os.path.dirname(feed))
+        for path in (sitemap, feed):
+            self.write(path, "<xml/>")
+        manifest, _ = self.build()
+        self.assertEqual(manifest.replace_generated([feed, sitemap]), [])
+        manifest.save()
+
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertEqual(manifest.generated, sorted([feed, sitemap]))
+        self.assertEqual(manifest.replace_generated([sitemap]), [feed])
+        self.assertFalse(os.path.exists(feed))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "blog", "post.html")))
+        self.assertEqual(manifest.replace_generated([]), [sitemap])
+        self.assertFalse(os.path.exists(sitemap))
+
+    def test_missing_manifest_loads_empty(self):
+        manifest = BuildManifest.load(os.path.join(self.root, "nope.json"))
+        self.assertEqual(manifest.outputs, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from markdown_blocks import *
@@ -138,6 +139,84 @@ the **same** even with inline stuff
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
         )
 
+    def test_scan_blocks_classifies_while_reading(self):
+        md = "## Sub\n\n- a\n- b\n\n1. x\n2. y\n\n> quote\n\ntext"
+        self.assertEqual(
+            list(scan_blocks(md.split("\n"))),
+            [
+                Block(BlockType.HEADING, ["## Sub"], 2),
+                Block(BlockType.UNORDERED_LIST, ["- a", "- b"]),
+                Block(BlockType.ORDERED_LIST, ["1. x", "2. y"]),
+                Block(BlockType.QUOTE, ["> quote"]),
+                Block(BlockType.PARAGRAPH, ["text"]),
+            ],
+        )
+
+    def test_whitespace_only_lines_and_crlf_separate_blocks(self):
+        md = "first\r\nstill first\r\n   \r\nsecond\r\n\t\nthird"
+        self.assertEqual(
+            markdown_to_blocks(md), ["first\nstill first", "second", "third"]
+        )
+
+    def test_fenced_code_keeps_blank_lines(self):
+        md = "intro\n\n```\ndef f():\n\n    return 1\n```\nafter"
+        blocks = list(scan_blocks(md.split("\n")))
+        self.assertEqual(
+            [block.block_type for block in blocks],
+            [BlockType.PARAGRAPH, BlockType.CODE, BlockType.PARAGRAPH],
+        )
+        html = markdown_to_html_node(md).to_html()
+        self.assertIn("<pre><code>def f():\n\n    return 1\n</code></pre>", html)
+
+    def test_single_line_fence(self):
+        blocks = list(scan_blocks(["```x = 1```", "", "text"]))
+        self.assertEqual(blocks[0], Block(BlockType.CODE, ["```x = 1```"]))
+        self.assertEqual(blocks[1].block_type, BlockType.PARAGRAPH)
+
+    def test_indented_closing_fence(self):
+        md = "```\nx = 1\n  ```\n\ntext"
+        blocks = list(scan_blocks(md.split("\n")))
+        self.assertEqual(
+            [block.block_type for block in blocks],
+            [BlockType.CODE, BlockType.PARAGRAPH],
+        )
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><pre><code>x = 1\n</code></pre><p>text</p></div>",
+        )
+
+    def test_unterminated_fence_runs_to_end_as_code(self):
+        md = "intro\n\n```\nx = 1\n\n# not a heading"
+        blocks = list(scan_blocks(md.split("\n")))
+        self.assertEqual(
+            blocks[1], Block(BlockType.CODE, ["```", "x = 1", "", "# not a heading"])
+        )
+        self.assertEqual(len(blocks), 2)
+        self.assertIn(
+            "<pre><code>x = 1\n\n# not a heading\n</code></pre>",
+            markdown_to_html_node(md).to_html(),
+        )
+
+    def test_scan_blocks_from_file_lines(self):
+        lines = io.StringIO("# Title\n\nbody line\nmore\n")
+        self.assertEqual(
+            list(scan_blocks(lines)),
+            [
+                Block(BlockType.HEADING, ["# Title"], 1),
+                Block(BlockType.PARAGRAPH, ["body line", "more"]),
+            ],
+        )
+
+    def test_clean_inner_line(self):
+        self.assertEqual(clean_inner_line("- item"), "item")
+        self.assertEqual(clean_inner_line("12. twelfth"), "twelfth")
+        self.assertEqual(clean_inner_line("v1. release"), "v1. release")
+        self.assertEqual(clean_inner_line("  plain  "), "plain")
+
+    def test_heading_levels(self):
+        html = markdown_to_html_node("# One\n\n### Three\n\n###### Six").to_html()
+        self.assertEqual(html, "<div><h1>One</h1><h3>Three</h3><h6>Six</h6></div>")
+
 
 if __name__ == "__main__":
     unittest.main()
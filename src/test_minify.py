@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from gencontent import generate_page
+from minify import minify_html
+
+
+class TestMinifyHtml(unittest.TestCase):
+    def test_whitespace_between_blocks_is_dropped(self):
+        html = "<!doctype html>\n<html>\n  <head>\n    <title> T </title>\n  </head>\n</html>\n"
+        self.assertEqual(
+            minify_html(html),
+            "<!doctype html><html><head><title>T</title></head></html>",
+        )
+
+    def test_inline_whitespace_is_collapsed_not_removed(self):
+        self.assertEqual(
+            minify_html("<p>a \n <b>b</b>   <i>c</i>\td</p>"),
+            "<p>a <b>b</b> <i>c</i> d</p>",
+        )
+
+    def test_raw_elements_and_tags_are_kept(self):
+        html = (
+            "<pre>\n  x  = 1\n</pre> <textarea> a\n</textarea>"
+            '<script>if (a  <  b) {}\n</script><a  title="a  b">x</a>'
+        )
+        self.assertEqual(minify_html(html), html.replace("</pre> <", "</pre><"))
+
+    def test_comments(self):
+        self.assertEqual(
+            minify_html("<p>a <!-- note --> b</p><!--[if IE]><p>x</p><![endif]-->"),
+            "<p>a b</p><!--[if IE]><p>x</p><![endif]-->",
+        )
+
+    def test_minified_template_gives_minified_pages(self):
+        with tempfile.TemporaryDirectory() as root:
+            src = os.path.join(root, "index.md")
+            template = os.path.join(root, "template.html")
+            dest = os.path.join(root, "index.html")
+            with open(src, "w") as f:
+                f.write(
+                    "# Title\n\nSome text\nover lines\n\n```\ncode\n  indented\n```\n"
+                )
+            with open(template, "w") as f:
+                f.write(
+                    "<html>\n  <body>\n    <main>{{ Content }}</main>\n  </body>\n</html>\n"
+                )
+            generate_page(src, template, dest, verbose=False, minify=True)
+            with open(dest) as f:
+                page = f.read()
+        self.assertTrue(page.startswith("<html><body><main><div><h1>"))
+        self.assertIn("<pre><code>code\n  indented\n</code></pre>", page)
+        self.assertEqual(minify_html(page), page)
+
+
+if __name__ == "__main__":
+    unittest.main()
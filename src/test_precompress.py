@@ -0,0 +1,68 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from precompress import MIN_SIZE, Precompressor
+
+
+class TestPrecompressor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.index = os.path.join(self.tmp.name, "precompress.json")
+        os.makedirs(os.path.join(self.dest, "blog"))
+        self.page = os.path.join(self.dest, "index.html")
+        self.write(self.page, "<p>hello</p>" * 100)
+        self.write(os.path.join(self.dest, "blog", "small.css"), "a{}")
+        self.write(os.path.join(self.dest, "image.png"), "png" * 200)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def run_build(self, submitted=()):
+        compressor = Precompressor(self.index, workers=2)
+        for path, data in submitted:
+            compressor.submit(path, data)
+        compressor.sweep(self.dest)
+        self.assertEqual(compressor.flush(), [])
+        compressor.close()
+        compressor.save()
+        return compressor
+
+    def test_compresses_text_files_once(self):
+        first = self.run_build()
+        self.assertEqual((first.compressed, first.unchanged), (2, 0))
+        with gzip.open(self.page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 100)
+        for suffix in first.suffixes:
+            self.assertTrue(os.path.exists(self.page + suffix))
+        # Too small to be worth it; not a text format.
+        self.assertFalse(
+            os.path.exists(os.path.join(self.dest, "blog", "small.css.gz"))
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "image.png.gz")))
+
+        second = self.run_build()
+        self.assertEqual((second.compressed, second.unchanged), (0, 2))
+
+    def test_changed_and_removed_files(self):
+        self.run_build()
+        page = "<p>changed</p>" * MIN_SIZE
+        self.write(self.page, page)
+        again = self.run_build([(self.page, page)])
+        self.assertEqual((again.compressed, again.unchanged), (1, 1))
+        with gzip.open(self.page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), page)
+
+        os.remove(self.page)
+        self.run_build()
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import os
+import tempfile
+import unittest
+
+from markdown_blocks import markdown_to_html_node
+from profiler import BuildProfiler, PageProfile
+
+
+class TestProfiler(unittest.TestCase):
+    def test_phase_accumulates(self):
+        profile = PageProfile("page.md")
+        with profile.phase("read"):
+            pass
+        with profile.phase("read"):
+            pass
+        self.assertEqual(list(profile.phases), ["read"])
+        self.assertGreaterEqual(profile.phases["read"][0], 0.0)
+        self.assertEqual(profile.total, profile.phases["read"][0])
+
+    def test_markdown_phases_recorded(self):
+        profile = PageProfile("page.md")
+        markdown_to_html_node("# Title\n\n- **a**\n- b\n\ntext", profile=profile)
+        self.assertEqual(
+            set(profile.phases),
+            {"block split", "block classification", "inline parse", "html tree build"},
+        )
+
+    def test_summary_and_json(self):
+        profiler = BuildProfiler()
+        with profiler.phase("static copy"):
+            pass
+        for path in ("a.md", "b.md"):
+            with profiler.page(path).phase("write"):
+                pass
+
+        summary = profiler.summary()
+        self.assertIn("static copy", summary)
+        self.assertIn("Page phases (2 pages", summary)
+        self.assertEqual(profiler.phase_totals()[0][0], "write")
+
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "profile.json")
+            profiler.dump_json(path)
+            with open(path) as f:
+                data = json.load(f)
+        self.assertEqual(sorted(data["pages"]), ["a.md", "b.md"])
+        self.assertIn("static copy", data["build"])
+
+
+if __name__ == "__main__":
+    unittest.main()
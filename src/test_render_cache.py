@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from gencontent import generate_pages_buffered, generate_pages_recursive
+from markdown_blocks import BlockType, Block, markdown_to_html_node
+from render_cache import RenderCache
+from site_index import PageMetadata
+from urls import UrlRewriter
+
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "render.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cached_render_matches_uncached(self):
+        md = "# Title\n\nSome **bold** [link](/x)\n\n- a\n- b\n\n```\ncode\n```"
+        rewrite_url = UrlRewriter("/repo/")
+        expected = markdown_to_html_node(md, rewrite_url).to_html()
+
+        cache = RenderCache(self.path)
+        self.assertEqual(
+            markdown_to_html_node(md, rewrite_url, cache=cache).to_html(), expected
+        )
+        cache.close()
+        self.assertEqual((cache.hits, cache.misses), (0, 4))
+
+        warm = RenderCache(self.path)
+        self.assertEqual(
+            markdown_to_html_node(md, rewrite_url, cache=warm).to_html(), expected
+        )
+        self.assertEqual((warm.hits, warm.misses), (4, 0))
+        warm.close()
+
+    def test_hits_return_block_summaries(self):
+        md = "# Title\n\nSee [home](/x) and ![logo](/l.png)\n\n```\ncode\n```"
+        expected = PageMetadata()
+        cache = RenderCache(self.path)
+        markdown_to_html_node(md, cache=cache, metadata=expected)
+        cache.close()
+
+        warm = RenderCache(self.path)
+        metadata = PageMetadata()
+        markdown_to_html_node(md, cache=warm, metadata=metadata)
+        warm.close()
+        self.assertEqual((warm.hits, warm.misses), (3, 0))
+        self.assertEqual(metadata.to_dict(), expected.to_dict())
+        self.assertEqual(metadata.links, ["/x"])
+
+    def test_cache_without_summaries_is_replaced(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute(
+            "CREATE TABLE fragments ("
+            "key TEXT PRIMARY KEY, html TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        conn.commit()
+        conn.close()
+
+        cache = RenderCache(self.path)
+        markdown_to_html_node("# Title", cache=cache)
+        cache.close()
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_key_depends_on_url_rewriter_and_type(self):
+        block = Block(BlockType.PARAGRAPH, ["[a](/b)"])
+        self.assertNotEqual(
+            RenderCache.key(block, UrlRewriter("/")),
+            RenderCache.key(block, UrlRewriter("/repo/")),
+        )
+        heading = Block(BlockType.HEADING, ["[a](/b)"], 1)
+        self.assertNotEqual(RenderCache.key(block), RenderCache.key(heading))
+
+    def test_single_process_builds_flush_every_page(self):
+        content = os.path.join(self.tmp.name, "content")
+        template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(content)
+        with open(template, "w") as f:
+            f.write("{{ Content }}")
+        with open(os.path.join(content, "index.md"), "w") as f:
+            f.write("# Home")
+
+        for build in (generate_pages_recursive, generate_pages_buffered):
+            path = os.path.join(self.tmp.name, f"{build.__name__}.sqlite")
+            cache = RenderCache(path)
+            dest = os.path.join(self.tmp.name, build.__name__)
+            build(content, template, dest, render_cache=cache)
+            # Written before close(), so a crash would not lose them.
+            warm = RenderCache(path)
+            markdown_to_html_node("# Home", UrlRewriter(None), cache=warm)
+            self.assertEqual((warm.hits, warm.misses), (1, 0))
+            warm.close()
+            cache.close()
+
+    def test_evict_keeps_most_recent(self):
+        cache = RenderCache(self.path, max_entries=2)
+        for i in range(3):
+            cache.put(f"k{i}", f"<p>{i}</p>")
+            cache.flush()
+        cache.get("k0")
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNone(cache.get("k1"))
+        self.assertEqual(cache.get("k0"), "<p>0</p>")
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+import unittest
+
+from search_index import (
+    build_search_index,
+    decode_shard,
+    decode_varint,
+    encode_shard,
+    encode_varint,
+    shard_name,
+)
+from site_index import PageMetadata, SiteIndex
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = self.tmp.name
+        self.site_index = SiteIndex(self.dest, "/")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_page(self, name, title, terms):
+        metadata = PageMetadata()
+        metadata.title = title
+        metadata.terms = terms
+        self.site_index.add(
+            os.path.join(self.dest, name, "index.html"), f"{name}.md", metadata
+        )
+
+    def load(self):
+        search_dir = os.path.join(self.dest, "search")
+        with open(os.path.join(search_dir, "index.json")) as f:
+            index = json.load(f)
+        terms = {}
+        for name in index["shards"]:
+            with open(os.path.join(search_dir, name + ".bin"), "rb") as f:
+                terms.update(decode_shard(f.read()))
+        return index, terms
+
+    def test_varint_round_trip(self):
+        out = bytearray()
+        values = [0, 1, 127, 128, 300, 2**35]
+        for value in values:
+            encode_varint(value, out)
+        self.assertEqual(out[:4], bytes([0, 1, 127, 0x80]))
+        pos = 0
+        for value in values:
+            decoded, pos = decode_varint(out, pos)
+            self.assertEqual(decoded, value)
+        self.assertEqual(pos, len(out))
+
+    def test_shard_round_trip(self):
+        terms = {"balrog": {0: 2, 5: 1, 900: 3}, "bäume": {3: 1}}
+        self.assertEqual(decode_shard(encode_shard(terms)), terms)
+        self.assertEqual(shard_name("balrog"), "6261")
+        self.assertEqual(shard_name("ä"), "c3a4")
+
+    def test_build_search_index(self):
+        self.add_page("tom", "Tom", {"tom": 3, "bombadil": 2})
+        self.add_page("glorfindel", "Glorfindel", {"balrog": 1, "tom": 1})
+        result = build_search_index(self.site_index, self.dest)
+        self.assertEqual(result["written"], 5)
+
+        index, terms = self.load()
+        self.assertEqual(
+            index["docs"], [["/glorfindel/", "Glorfindel"], ["/tom/", "Tom"]]
+        )
+        self.assertEqual(terms["tom"], {0: 1, 1: 3})
+        self.assertEqual(terms["balrog"], {0: 1})
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "search", "search.js")))
+
+        self.assertEqual(build_search_index(self.site_index, self.dest)["written"], 0)
+
+    def test_doc_ids_are_stable_across_builds(self):
+        self.add_page("b", "B", {"beta": 1})
+        self.add_page("c", "C", {"gamma": 1})
+        build_search_index(self.site_index, self.dest)
+
+        del self.site_index.records[os.path.join(self.dest, "b", "index.html")]
+        self.add_page("a", "A", {"alpha": 1})
+        result = build_search_index(self.site_index, self.dest)
+        index, terms = self.load()
+        self.assertEqual(index["docs"], [["/a/", "A"], ["/c/", "C"]])
+        self.assertEqual(terms, {"alpha": {0: 1}, "gamma": {1: 1}})
+        # alpha shard added, beta shard removed, index.json; gamma untouched
+        self.assertEqual(result["written"], 3)
+
+    def test_only_changed_shards_are_encoded(self):
+        state_path = os.path.join(self.dest, "cache", "search-terms.json")
+        self.add_page("tom", "Tom", {"tom": 3, "bombadil": 2})
+        self.add_page("glorfindel", "Glorfindel", {"balrog": 1, "tom": 1})
+        result = build_search_index(self.site_index, self.dest, state_path=state_path)
+        self.assertEqual(result["encoded"], 3)
+        self.site_index.save()
+
+        # Incremental build: records come back without terms, one page
+        # is rendered again with a new term.
+        self.site_index = SiteIndex.load(self.dest, "/")
+        for record in self.site_index:
+            self.assertNotIn("terms", record)
+        self.add_page("glorfindel", "Glorfindel", {"balrog": 1, "tom": 1, "bree": 1})
+        result = build_search_index(self.site_index, self.dest, state_path=state_path)
+        # The new "br" shard and index.json; "ba" and "to" are untouched.
+        self.assertEqual(result["encoded"], 1)
+        self.assertEqual(result["written"], 2)
+        index, terms = self.load()
+        self.assertEqual(terms["bree"], {0: 1})
+        self.assertEqual(terms["balrog"], {0: 1})
+        self.assertEqual(terms["tom"], {0: 1, 1: 3})
+
+        # Only the given pages are compared with the state file.
+        tom = os.path.join(self.dest, "tom", "index.html")
+        self.site_index.records[tom]["terms"] = {"ignored": 1}
+        result = build_search_index(
+            self.site_index, self.dest, state_path=state_path, pages=set()
+        )
+        self.assertEqual(result["encoded"], 0)
+
+        del self.site_index.records[tom]
+        result = build_search_index(
+            self.site_index, self.dest, state_path=state_path, pages={tom}
+        )
+        self.assertEqual(result["encoded"], 1)
+        index, terms = self.load()
+        self.assertEqual(index["docs"], [["/glorfindel/", "Glorfindel"]])
+        self.assertEqual(terms, {"balrog": {0: 1}, "bree": {0: 1}, "tom": {0: 1}})
+
+
+if __name__ == "__main__":
+    unittest.main()
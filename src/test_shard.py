@@ -0,0 +1,155 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from shard import (
+    SHARD_MANIFEST,
+    merge_shards,
+    parse_shard,
+    partition_pages,
+    write_shard_manifest,
+)
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+class TestShard(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read_tree(self, root):
+        files = {}
+        for dir_path, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(dir_path, name)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, root)] = f.read()
+        return files
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for spec in ("0/4", "5/4", "1", "a/b", "1/0"):
+            with self.assertRaises(ValueError):
+                parse_shard(spec)
+
+    def test_partition_is_balanced_and_complete(self):
+        pages = []
+        for i, size in enumerate([900, 500, 400, 300, 300, 200, 100, 100]):
+            path = os.path.join(self.root, f"p{i}.md")
+            self.write(path, "x" * size)
+            pages.append((path, path + ".html"))
+
+        shards = partition_pages(pages, 3)
+        self.assertEqual(sorted(job for jobs in shards for job in jobs), pages)
+        totals = [sum(os.path.getsize(job[0]) for job in jobs) for jobs in shards]
+        self.assertEqual(sorted(totals), [900, 900, 1000])
+        self.assertEqual(shards, partition_pages(list(reversed(pages)), 3))
+
+    def make_shard(self, name, index, count, files):
+        path = os.path.join(self.root, name)
+        for rel_path, text in files.items():
+            self.write(os.path.join(path, rel_path), text)
+        write_shard_manifest(path, index, count, "/")
+        return path
+
+    def test_merge_checks_conflicts_and_missing_shards(self):
+        static = os.path.join(self.root, "static")
+        dest = os.path.join(self.root, "docs")
+        self.write(os.path.join(static, "index.css"), "body {}")
+        a = self.make_shard("a", 1, 2, {"index.html": "home", "shared.html": "x"})
+        b = self.make_shard("b", 2, 2, {"blog/post.html": "post", "shared.html": "y"})
+
+        with self.assertRaises(Exception):
+            merge_shards([a], dest, static)
+        with self.assertRaises(Exception) as raised:
+            merge_shards([a, b], dest, static)
+        self.assertIn("shared.html", str(raised.exception))
+        self.assertFalse(os.path.exists(dest))
+
+        os.remove(os.path.join(b, "shared.html"))
+        write_shard_manifest(b, 2, 2, "/")
+        self.assertEqual(merge_shards([a, b], dest, static), 3)
+        merged = self.read_tree(dest)
+        self.assertEqual(
+            {path: merged[path] for path in merged if not path.startswith("search")},
+            {
+                "index.css": b"body {}",
+                "index.html": b"home",
+                "shared.html": b"x",
+                os.path.join("blog", "post.html"): b"post",
+                "site-index.jsonl": b"",
+            },
+        )
+        self.assertIn(os.path.join("search", "index.json"), merged)
+
+    def test_shard_processes_merge_to_full_build(self):
+        self.write(
+            os.path.join(self.root, "template.html"), "{{ Title }}|{{ Content }}"
+        )
+        self.write(os.path.join(self.root, "static", "index.css"), "body {}")
+        for i in range(7):
+            self.write(
+                os.path.join(self.root, "content", f"s{i % 3}", f"p{i}", "index.md"),
+                f"# Page {i}\n\n" + "words " * (i * 50),
+            )
+
+        def run(*args):
+            return subprocess.Popen(
+                [sys.executable, MAIN, "/site/", *args],
+                cwd=self.root,
+                stdout=subprocess.DEVNULL,
+            )
+
+        self.assertEqual(run().wait(), 0)
+        full = self.read_tree(os.path.join(self.root, "docs"))
+
+        shards = [run("--shard", f"{i}/3") for i in (1, 2, 3)]
+        self.assertEqual([proc.wait() for proc in shards], [0, 0, 0])
+        counts = []
+        for i in (1, 2, 3):
+            with open(
+                os.path.join(self.root, "shards", f"shard-{i}-of-3", SHARD_MANIFEST)
+            ) as f:
+                counts.append(len(json.load(f)["files"]) - 1)
+        self.assertEqual(sum(counts), 7)
+        self.assertNotIn(0, counts)
+
+        self.assertEqual(run("--merge").wait(), 0)
+        self.assertEqual(self.read_tree(os.path.join(self.root, "docs")), full)
+
+        # The merged manifest lets an incremental build skip every page.
+        with open(os.path.join(self.root, ".ssg-cache", "manifest.json")) as f:
+            outputs = json.load(f)["outputs"]
+        self.assertEqual(len(outputs), 7)
+        self.assertTrue(all(path.startswith("docs") for path in outputs))
+        incremental = subprocess.run(
+            [sys.executable, MAIN, "/site/", "--incremental"],
+            cwd=self.root,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(incremental.returncode, 0)
+        self.assertNotIn("Generating page", incremental.stdout)
+
+        rejected = subprocess.run(
+            [sys.executable, MAIN, "/site/", "--shard", "1/3", "--site-url", "x"],
+            cwd=self.root,
+            capture_output=True,
+        )
+        self.assertNotEqual(rejected.returncode, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
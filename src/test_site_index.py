@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+import unittest
+
+from gencontent import extract_title, generate_pages_recursive
+from manifest import BuildManifest
+from markdown_blocks import iter_markdown_html, markdown_to_html_node
+from site_index import PageMetadata, SiteIndex, collect_metadata, page_url
+
+MARKDOWN = """# The **One** Ring
+
+Forged by [Sauron](/villains/sauron) in ![fire](/images/doom.png) Mount Doom.
+
+## History
+
+- made in the [Second Age](https://example.com/age)
+- lost for _ages_
+
+```
+# not a heading [nor](/a-link)
+```
+
+### Bearers
+"""
+
+
+class TestSiteIndex(unittest.TestCase):
+    def test_metadata_collected_while_parsing(self):
+        metadata = PageMetadata()
+        markdown_to_html_node(MARKDOWN, metadata=metadata)
+        self.assertEqual(metadata.title, extract_title(MARKDOWN))
+        self.assertEqual(
+            metadata.headings,
+            [[1, "The One Ring"], [2, "History"], [3, "Bearers"]],
+        )
+        self.assertEqual(
+            metadata.links, ["/villains/sauron", "https://example.com/age"]
+        )
+        self.assertEqual(metadata.images, [["fire", "/images/doom.png"]])
+        self.assertEqual(metadata.words, 19)
+        self.assertEqual(metadata.terms["the"], 2)
+        self.assertEqual(metadata.terms["sauron"], 1)
+        self.assertNotIn("heading", metadata.terms)
+        self.assertNotIn("images", metadata.terms)
+
+        streamed = PageMetadata()
+        "".join(iter_markdown_html(MARKDOWN.splitlines(True), metadata=streamed))
+        self.assertEqual(streamed.to_dict(), metadata.to_dict())
+        self.assertEqual(
+            collect_metadata_from_text(MARKDOWN).to_dict(), metadata.to_dict()
+        )
+
+    def test_title_only_metadata(self):
+        metadata = PageMetadata(title_only=True)
+        markdown_to_html_node(MARKDOWN, metadata=metadata)
+        self.assertEqual(metadata.title, "The **One** Ring")
+        self.assertEqual((metadata.links, metadata.words), ([], 0))
+
+    def test_page_url(self):
+        self.assertEqual(page_url("index.html"), "/")
+        self.assertEqual(page_url("blog/tom/index.html", "/repo/"), "/repo/blog/tom/")
+        self.assertEqual(page_url("about.html", "/repo"), "/repo/about.html")
+
+    def test_index_round_trip_and_incremental_update(self):
+        with tempfile.TemporaryDirectory() as root:
+            content = os.path.join(root, "content")
+            dest = os.path.join(root, "docs")
+            template = os.path.join(root, "template.html")
+            os.makedirs(os.path.join(content, "blog"))
+            os.makedirs(dest)
+            with open(template, "w") as f:
+                f.write("{{ Title }}|{{ Content }}")
+            for path, text in (("index.md", "# Home"), ("blog/post.md", MARKDOWN)):
+                with open(os.path.join(content, path), "w") as f:
+                    f.write(text)
+
+            manifest = BuildManifest(os.path.join(root, "manifest.json"))
+            site_index = SiteIndex(dest, "/repo/")
+            generate_pages_recursive(
+                content, template, dest, "/repo/", manifest, site_index=site_index
+            )
+            site_index.save()
+
+            loaded = SiteIndex.load(dest, "/repo/")
+            records = list(loaded)
+            self.assertEqual(
+                [r["path"] for r in records], ["blog/post.html", "index.html"]
+            )
+            self.assertEqual(records[0]["url"], "/repo/blog/post.html")
+            self.assertEqual(records[0]["title"], "The **One** Ring")
+            self.assertEqual(records[1]["source"], os.path.join(content, "index.md"))
+            # Search terms are build-only state, not published.
+            self.assertNotIn("terms", records[0])
+
+            del loaded.records[os.path.join(dest, "index.html")]
+            loaded.fill_missing(manifest.outputs)
+            self.assertEqual(
+                loaded.records[os.path.join(dest, "index.html")]["terms"], {"home": 1}
+            )
+            loaded.save()
+            self.assertEqual(list(SiteIndex.load(dest, "/repo/")), records)
+            loaded.prune({os.path.join(dest, "index.html")})
+            self.assertEqual([r["path"] for r in loaded], ["index.html"])
+
+    def test_save_only_encodes_changed_records(self):
+        with tempfile.TemporaryDirectory() as dest:
+            lines = [
+                '{"path": "a.html", "source": "a.md", "title": "A", "url": "/a.html"}',
+                '{"path": "b.html", "source": "b.md", "title": "B", "url": "/b.html"}',
+            ]
+            with open(os.path.join(dest, "site-index.jsonl"), "w") as f:
+                f.write("\n".join(lines) + "\n")
+            site_index = SiteIndex.load(dest, "/")
+            self.assertEqual(site_index.changed, set())
+
+            metadata = PageMetadata()
+            markdown_to_html_node("# B, edited", metadata=metadata)
+            site_index.add(os.path.join(dest, "b.html"), "b.md", metadata)
+            site_index.save()
+            self.assertEqual(site_index.changed, {os.path.join(dest, "b.html")})
+            with open(os.path.join(dest, "site-index.jsonl")) as f:
+                saved = f.read().splitlines()
+            # The untouched record is written back as it was read.
+            self.assertEqual(saved[0], lines[0])
+            self.assertEqual(json.loads(saved[1])["title"], "B, edited")
+
+    def test_missing_index_loads_none(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.assertIsNone(SiteIndex.load(root))
+
+
+def collect_metadata_from_text(markdown):
+    with tempfile.NamedTemporaryFile("w", suffix=".md", delete=False) as f:
+        f.write(markdown)
+    try:
+        return collect_metadata(f.name)
+    finally:
+        os.remove(f.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from template import Template, load_template
+from urls import UrlRewriter
+
+
+class TestTemplate(unittest.TestCase):
+    def test_render_slots(self):
+        template = Template("<title>{{ Title }}</title><body>{{ Content }}</body>")
+        page = template.render({"Title": "Hi", "Content": "<p>x</p>"})
+        self.assertEqual(page, "<title>Hi</title><body><p>x</p></body>")
+
+    def test_render_streams_iterable_values(self):
+        template = Template("<article>{{ Content }}</article>")
+        page = template.render({"Content": iter(["<p>", "a", "</p>"])})
+        self.assertEqual(page, "<article><p>a</p></article>")
+
+    def test_unknown_slot_is_left_untouched(self):
+        template = Template("{{ Title }} {{ Missing }}")
+        self.assertEqual(template.render({"Title": "T"}), "T {{ Missing }}")
+
+    def test_root_relative_urls_are_rewritten(self):
+        template = Template(
+            '<link href="/index.css" /><img src="/a.png" /><a href="https://x.y/">'
+        )
+        page = template.render({}, UrlRewriter("/repo/"))
+        self.assertEqual(
+            page,
+            '<link href="/repo/index.css" /><img src="/repo/a.png" /><a href="https://x.y/">',
+        )
+
+    def test_urls(self):
+        template = Template('<link href="/index.css" />{{ Content }}<img src="/a.png">')
+        self.assertEqual(template.urls, ["/index.css", "/a.png"])
+
+    def test_slot_values_are_not_rewritten(self):
+        template = Template("{{ Content }}")
+        page = template.render({"Content": '<a href="/x">'}, UrlRewriter("/repo/"))
+        self.assertEqual(page, '<a href="/x">')
+
+    def test_render_around(self):
+        template = Template('<a href="/">{{ Title }}</a><main>{{ Content }}</main>')
+        self.assertEqual(
+            template.render_around("Content", {"Title": "T"}, UrlRewriter("/repo/")),
+            ('<a href="/repo/">T</a><main>', "</main>"),
+        )
+        self.assertIsNone(
+            Template("{{ Content }}{{ Content }}").render_around("Content", {})
+        )
+        self.assertIsNone(Template("{{ Title }}").render_around("Content", {}))
+
+    def test_load_template_is_cached_until_modified(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "template.html")
+            with open(path, "w") as f:
+                f.write("one {{ Title }}")
+            first = load_template(path)
+            self.assertIs(load_template(path), first)
+
+            with open(path, "w") as f:
+                f.write("two {{ Title }}")
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+            self.assertEqual(load_template(path).render({"Title": "T"}), "two T")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -19,6 +19,13 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is not a text node", TextType.BOLD)
         self.assertNotEqual(node, node2)
 
+    def test_compact_representation(self):
+        node = TextNode("This is a text node", TextType.LINK, "https://www.boot.dev")
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual(
+            repr(node), "TextNode(This is a text node, link, https://www.boot.dev)"
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,99 @@
+import pickle
+import unittest
+
+from assets import AssetTable
+from inline_markdown import text_node_to_html_node
+from textnode import TextNode, TextType
+from urls import UrlRewriter
+
+ASSETS = {
+    "/images/a.png": {
+        "source": "static/images/a.png",
+        "width": 928,
+        "height": 468,
+        "srcset": [["/images/a-480w.png", 480], ["/images/a.png", 928]],
+    }
+}
+
+
+class TestUrlRewriter(unittest.TestCase):
+    def test_default_base_path_keeps_urls(self):
+        self.assertEqual(UrlRewriter()("/images/a.png"), "/images/a.png")
+
+    def test_base_path_prefix(self):
+        rewrite_url = UrlRewriter("/repo/")
+        self.assertEqual(rewrite_url("/blog/tom"), "/repo/blog/tom")
+        self.assertEqual(rewrite_url("https://boot.dev"), "https://boot.dev")
+
+    def test_image_props(self):
+        rewrite_url = UrlRewriter("/repo/", ASSETS)
+        self.assertEqual(
+            rewrite_url.image_props("/images/a.png"),
+            {
+                "width": "928",
+                "height": "468",
+                "srcset": "/repo/images/a-480w.png 480w, /repo/images/a.png 928w",
+                "loading": "lazy",
+            },
+        )
+        self.assertEqual(rewrite_url.image_props("https://x.y/b.png"), {})
+
+        node = TextNode("A", TextType.IMAGE, "/images/a.png")
+        self.assertEqual(
+            text_node_to_html_node(node, rewrite_url).to_html(),
+            '<img src="/repo/images/a.png" alt="A" width="928" height="468" '
+            'srcset="/repo/images/a-480w.png 480w, /repo/images/a.png 928w" '
+            'loading="lazy"></img>',
+        )
+
+    def test_fingerprinted_urls(self):
+        assets = {
+            "/index.css": {"source": "static/index.css", "url": "/index.0123abcd.css"},
+            "/images/a.png": dict(
+                ASSETS["/images/a.png"],
+                url="/images/a.89ef4567.png",
+                srcset=[
+                    ["/images/a-480w.01234567.png", 480],
+                    ["/images/a.89ef4567.png", 928],
+                ],
+            ),
+        }
+        rewrite_url = UrlRewriter("/repo/", assets)
+        self.assertEqual(rewrite_url("/index.css"), "/repo/index.0123abcd.css")
+        self.assertEqual(
+            rewrite_url("/index.css?v=1#top"), "/repo/index.0123abcd.css?v=1#top"
+        )
+        self.assertEqual(rewrite_url("/blog/tom"), "/repo/blog/tom")
+        self.assertEqual(
+            rewrite_url.image_props("/images/a.png#x")["srcset"],
+            "/repo/images/a-480w.01234567.png 480w, "
+            "/repo/images/a.89ef4567.png 928w",
+        )
+
+    def test_assets_are_part_of_identity(self):
+        plain = UrlRewriter("/")
+        with_assets = UrlRewriter("/", ASSETS)
+        self.assertEqual(repr(plain), "UrlRewriter('/')")
+        self.assertNotEqual(repr(plain), repr(with_assets))
+        self.assertNotEqual(plain, with_assets)
+        self.assertEqual(with_assets, UrlRewriter("/", dict(ASSETS)))
+        self.assertEqual(hash(with_assets), hash(UrlRewriter("/", dict(ASSETS))))
+
+    def test_asset_table_digest_is_shared_until_modified(self):
+        table = AssetTable(ASSETS)
+        digest = table.digest()
+        self.assertEqual(digest, UrlRewriter("/", dict(ASSETS)).assets_digest())
+        self.assertEqual(repr(UrlRewriter("/", table)), repr(UrlRewriter("/", ASSETS)))
+
+        table._digest = "cached"
+        self.assertEqual(UrlRewriter("/", table).assets_digest(), "cached")
+        self.assertEqual(pickle.loads(pickle.dumps(table)).digest(), "cached")
+
+        table["/b.css"] = {"source": "static/b.css", "url": "/b.1234abcd.css"}
+        self.assertNotIn(table.digest(), ("cached", digest))
+        table.pop("/b.css")
+        self.assertEqual(table.digest(), digest)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -34,8 +34,14 @@ class TextNode:
     Example:
         >>> node = TextNode("Hello", TextType.BOLD)
         >>> node2 = TextNode("Click", TextType.LINK, "https://google.com")
+
+    Note:
+        Uses __slots__: large pages create hundreds of thousands of nodes,
+        and dropping the per-instance __dict__ keeps them compact.
     """
 
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None) -> None:
         self.text = text
         self.text_type = text_type
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import re
+
+from assets import AssetTable
+
+_SUFFIX_PATTERN = re.compile(r"[?#]")
+
+
+class UrlRewriter:
+    """
+    Rewrites root-relative URLs for the site's base path.
+
+    Used for template attributes and for the href/src of links and images
+    produced from markdown, so generated pages never need a search and
+    replace pass over their final HTML.
+
+    The rewriter also carries the site's asset table, so everything a
+    rendered fragment depends on besides its markdown is in one object
+    whose repr() the render cache keys on. The repr includes a digest of
+    the table; an assets.AssetTable computes it once for every rewriter
+    built on it, so creating a rewriter per page costs nothing.
+
+    Args:
+        base_path (str, optional): Base URL path the site is served from.
+            Defaults to "/".
+        assets (dict, optional): Root-relative URL of a static asset ->
+            entry, as returned by images.ImagePipeline.describe() or
+            assets.static_asset(): {"source", "width", "height",
+            "srcset": [[url, width], ...], "url"}. Assets with a "url"
+            (fingerprinted files) are linked under that URL instead.
+
+    Example:
+        >>> rewrite_url = UrlRewriter("/static-site-generator/")
+        >>> rewrite_url("/images/tom.png")
+        '/static-site-generator/images/tom.png'
+        >>> rewrite_url("https://example.com/")
+        'https://example.com/'
+    """
+
+    def __init__(self, base_path=None, assets=None) -> None:
+        if base_path is None:
+            base_path = "/"
+        self.base_path = base_path
+        self.assets = assets or {}
+        self._assets_digest = None
+
+    def __call__(self, url):
+        """
+        Returns `url` with a leading "/" replaced by the base path.
+
+        URLs of fingerprinted assets are replaced by their hashed URL first;
+        a query string or fragment is kept. URLs that are not root-relative
+        are returned unchanged.
+        """
+        if url is None or not url.startswith("/"):
+            return url
+        if self.assets:
+            path, suffix = _split_suffix(url)
+            entry = self.assets.get(path)
+            if entry is not None and "url" in entry:
+                url = entry["url"] + suffix
+        return self.base_path + url[1:]
+
+    def image_props(self, url):
+        """
+        Returns the extra <img> attributes for an image URL from markdown.
+
+        Images in the asset table get their intrinsic width and height (so
+        the browser can reserve their box before they load), a srcset of
+        their scaled-down variants and loading="lazy". Other images get
+        none.
+
+        Example:
+            >>> rewrite_url.image_props("/images/tom.png")
+            {'width': '928', 'height': '468', 'srcset':
+             '/images/tom-480w.png 480w, /images/tom.png 928w', 'loading': 'lazy'}
+        """
+        entry = self.assets.get(_split_suffix(url)[0])
+        if entry is None or "width" not in entry:
+            return {}
+        props = {"width": str(entry["width"]), "height": str(entry["height"])}
+        if len(entry["srcset"]) > 1:
+            props["srcset"] = ", ".join(
+                f"{self(variant)} {width}w" for variant, width in entry["srcset"]
+            )
+        props["loading"] = "lazy"
+        return props
+
+    def assets_digest(self):
+        """Returns a short hash of the asset table ("" if it is empty)."""
+        if isinstance(self.assets, AssetTable):
+            return self.assets.digest()
+        if self._assets_digest is None:
+            if not self.assets:
+                self._assets_digest = ""
+            else:
+                table = json.dumps(self.assets, sort_keys=True).encode()
+                self._assets_digest = hashlib.sha256(table).hexdigest()[:16]
+        return self._assets_digest
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, UrlRewriter):
+            return False
+        return self.base_path == other.base_path and self.assets == other.assets
+
+    def __hash__(self) -> int:
+        return hash((self.base_path, self.assets_digest()))
+
+    def __repr__(self) -> str:
+        if not self.assets:
+            return f"UrlRewriter({self.base_path!r})"
+        return f"UrlRewriter({self.base_path!r}, assets={self.assets_digest()!r})"
+
+
+def _split_suffix(url):
+    """Splits a URL into its path and its query string and/or fragment."""
+    match = _SUFFIX_PATTERN.search(url)
+    if match is None:
+        return url, ""
+    return url[: match.start()], url[match.start() :]